@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+analytics.py
+محرك تحليلات لصفحات التقارير (تجميع عمودي vectorized بـ pandas / NumPy)
+- ربحية المنتجات (ترتيب حسب صافي الربح / الإيراد)
+- إحصائيات العملاء وتكرار الشراء
+- سلاسل الإيراد بالساعة / اليوم / الشهر مع متوسط متحرك، ونمط ساعات اليوم
+الجدول يُقرأ على دفعات (chunks) وكل دفعة تُجمّع فوراً، فلا يُحمّل الجدول كاملاً في الذاكرة.
+يعمل على VIEW sales (سطر لكل صنف في طلب) المشترك بين تطبيق سطح المكتب و Streamlit،
+ثم على ملفات الأشهر المؤرشفة في الفترة (sales_archive.py) عموداً عموداً بدون المرور بـ SQLite.
+"""
+
+import numpy as np
+import pandas as pd
+
+from sales_archive import archived_columns
+from sales_search import search_clause
+
+# أسماء الأعمدة في كل مصدر؛ منذ الترحيل 6 الطلبات (orders / order_lines) تُقرأ من نفس VIEW sales
+_SALES = {"table": "sales", "ts": "sold_at", "product": "product_name", "customer": "customer_name",
+          "qty": "quantity", "total": "total", "profit": "net_profit"}
+SOURCES = {"sales": _SALES, "orders": _SALES}
+
+# طول بادئة النص الزمني لكل تجميع: 'YYYY-MM-DD HH' / 'YYYY-MM-DD' / 'YYYY-MM'
+BUCKETS = {"hour": 13, "day": 10, "month": 7}
+_COMBINE_EVERY = 16
+
+
+def _source_sql(source, date_from=None, date_to=None, q="", cur=None):
+    cfg = SOURCES[source]
+    profit = cfg["profit"] or "0"
+    sql = (f"SELECT {cfg['ts']} AS ts, {cfg['product']} AS product, {cfg['customer']} AS customer, "
+           f"IFNULL({cfg['qty']}, 0) AS qty, IFNULL({cfg['total']}, 0) AS total, IFNULL({profit}, 0) AS profit "
+           f"FROM {cfg['table']} WHERE 1=1")
+    params = []
+    if date_from:
+        sql += f" AND {cfg['ts']} >= ?"
+        params.append(date_from)
+    if date_to:
+        sql += f" AND {cfg['ts']} < ?"
+        params.append(date_to)
+    if q and q.strip():
+        # same search as the Reports tables (sales_fts); archived months use the same words in _chunks
+        clause, q_params = search_clause(cur, q)
+        sql += " AND " + clause
+        params += q_params
+    return sql, params
+
+
+def _chunks(conn, source, date_from, date_to, chunksize, q=""):
+    """دفعات DataFrame بأعمدة (ts, product, customer, qty, total, profit): الجدول الحي ثم الأرشيف."""
+    sql, params = _source_sql(source, date_from, date_to, q, conn.cursor())
+    yield from pd.read_sql_query(sql, conn, params=params, chunksize=chunksize)
+    cfg = SOURCES[source]
+    names = {"ts": cfg["ts"], "product": cfg["product"], "customer": cfg["customer"],
+             "qty": cfg["qty"], "total": cfg["total"], "profit": cfg["profit"]}
+    for cols in archived_columns(conn.cursor(), list(names.values()), date_from, date_to, q):
+        df = pd.DataFrame({k: cols[v] for k, v in names.items()})
+        yield df.fillna({"qty": 0.0, "total": 0.0, "profit": 0.0})
+
+
+class _Partial:
+    """نتائج جزئية تُدمج كل _COMBINE_EVERY دفعة حتى تبقى الذاكرة محدودة."""
+
+    def __init__(self, combine):
+        self.combine = combine
+        self.parts = []
+
+    def add(self, df):
+        self.parts.append(df)
+        if len(self.parts) >= _COMBINE_EVERY:
+            self.parts = [self.combine(pd.concat(self.parts))]
+
+    def result(self, empty):
+        return self.combine(pd.concat(self.parts)) if self.parts else empty
+
+
+def _sum_by_index(df):
+    return df.groupby(level=0, sort=False).sum()
+
+
+def _combine_customers(df):
+    g = df.groupby(level=0, sort=False)
+    return pd.DataFrame({"orders": g["orders"].sum(), "revenue": g["revenue"].sum(),
+                         "first": g["first"].min(), "last": g["last"].max()})
+
+
+def analyze(conn, source="sales", date_from=None, date_to=None, chunksize=250000, progress=None, q=""):
+    """
+    مسح واحد للجدول يعيد dict فيه:
+    products, customers, hour, day, month (DataFrames) و rows (عدد الصفوف).
+    date_from / date_to نصوص 'YYYY-MM-DD' (النهاية غير شاملة)؛ q: نص بحث بنفس قاعدة صفحة التقارير
+    (كل كلمة بعد التوحيد في المنتج / العميل / الهاتف / العنوان) على الجدول الحي والأرشيف.
+    """
+    products = _Partial(_sum_by_index)
+    customers = _Partial(_combine_customers)
+    series = {k: _Partial(_sum_by_index) for k in BUCKETS}
+    rows = 0
+    for df in _chunks(conn, source, date_from, date_to, chunksize, q):
+        rows += len(df)
+        df["ts"] = df["ts"].fillna("").astype(str)
+        df["product"] = df["product"].fillna("")
+        df["customer"] = df["customer"].fillna("")
+        vals = df[["qty", "total", "profit"]].astype("float64")
+        vals["ops"] = np.ones(len(df))
+        products.add(vals.groupby(df["product"].to_numpy(), sort=False).sum())
+        # first/last on datetime64 (min/max on text columns fall back to a Python loop)
+        when = pd.to_datetime(df["ts"], format="ISO8601", errors="coerce")
+        g = pd.DataFrame({"total": df["total"].to_numpy(), "when": when.to_numpy()}).groupby(df["customer"].to_numpy(), sort=False)
+        customers.add(pd.DataFrame({"orders": g.size(), "revenue": g["total"].sum(),
+                                    "first": g["when"].min(), "last": g["when"].max()}))
+        for name, width in BUCKETS.items():
+            key = df["ts"].str.slice(0, width).to_numpy()
+            series[name].add(vals[["total", "profit", "ops"]].groupby(key, sort=False).sum())
+        if progress:
+            progress(rows, None)
+
+    out = {"rows": rows}
+    prod = products.result(pd.DataFrame(columns=["qty", "total", "profit", "ops"], dtype="float64"))
+    prod.index.name = "product"
+    prod["margin"] = np.where(prod["total"] != 0, prod["profit"] / prod["total"].where(prod["total"] != 0, 1), 0.0)
+    out["products"] = prod.sort_values("profit", ascending=False)
+    cust = customers.result(pd.DataFrame({"orders": [], "revenue": [], "first": pd.to_datetime([]), "last": pd.to_datetime([])}))
+    cust.index.name = "customer"
+    out["customers"] = cust.sort_values("revenue", ascending=False)
+    for name in BUCKETS:
+        s = series[name].result(pd.DataFrame(columns=["total", "profit", "ops"], dtype="float64"))
+        s.index.name = name
+        out[name] = s[s.index != ""].sort_index()
+    return out
+
+
+# ---------- تقارير مشتقة ----------
+def top_products(result, n=20, by="profit"):
+    return result["products"].sort_values(by, ascending=False).head(n)
+
+
+def repeat_customer_stats(result):
+    """عدد العملاء، العملاء المتكررون (طلبين فأكثر)، نسبتهم، وحصتهم من الإيراد."""
+    cust = result["customers"]
+    cust = cust[cust.index != ""]
+    total = len(cust)
+    repeat = cust[cust["orders"] >= 2]
+    revenue = float(cust["revenue"].sum())
+    return {
+        "customers": total,
+        "repeat_customers": len(repeat),
+        "repeat_rate": len(repeat) / total if total else 0.0,
+        "repeat_revenue_share": float(repeat["revenue"].sum()) / revenue if revenue else 0.0,
+        "avg_orders_per_customer": float(cust["orders"].mean()) if total else 0.0,
+    }
+
+
+def revenue_series(result, bucket="day", window=7):
+    """الإيراد والربح لكل فترة مع متوسط متحرك بطول window فترة (الفترات الفارغة = صفر)."""
+    s = result[bucket]
+    if s.empty:
+        return s.assign(moving_avg=pd.Series(dtype="float64"))
+    idx = pd.to_datetime(s.index, format={"hour": "%Y-%m-%d %H", "day": "%Y-%m-%d", "month": "%Y-%m"}[bucket], errors="coerce")
+    s = s.set_axis(idx)
+    s = s[s.index.notna()]
+    freq = {"hour": "h", "day": "D", "month": "MS"}[bucket]
+    s = s.resample(freq).sum()
+    s["moving_avg"] = s["total"].rolling(window, min_periods=1).mean()
+    return s
+
+
+def hour_of_day_profile(result):
+    """مجموع الإيراد لكل ساعة من ساعات اليوم (0-23) عبر كل الأيام."""
+    s = result["hour"]
+    if s.empty:
+        return pd.Series(0.0, index=range(24))
+    hours = pd.to_numeric(s.index.str.slice(11, 13), errors="coerce")
+    return s["total"].groupby(hours).sum().reindex(range(24), fill_value=0.0)
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+api_server.py
+واجهة HTTP / JSON محلية لقاعدة store.sqlite3 (مكتبة Python القياسية فقط)
+حتى تشترك عدة نقاط بيع (tills) في نفس المتجر عبر الشبكة المحلية. المنطق كله في services.py.
+
+التشغيل:
+    python api_server.py [--host 0.0.0.0] [--port 8765] [--db store.sqlite3] [--readers 4]
+
+المسارات:
+    GET    /api/health
+    GET    /api/stats?from=YYYY-MM-DD&to=YYYY-MM-DD
+    GET    /api/products                POST /api/products
+    GET    /api/products/search?q=&limit=    GET /api/customers/search?q=&limit=  (إكمال تلقائي بالبادئة)
+    GET    /api/sales?q=&from=&to=&limit=&before=
+    POST   /api/sales                   {"product_id", "quantity", "customer_name", ...}
+    GET / PUT / DELETE /api/sales/<id>
+    GET    /api/orders/stats            POST /api/orders  {"customer", "product", "qty", "total"?}
+    POST   /api/orders  {"items": [{"product_id", "quantity", "unit_sell"?}], "customer_name", ...}  (طلب من عدة أصناف)
+    GET    /api/orders/<id>             (رأس الطلب + أصنافه)
+    GET    /api/inventory?limit=        (المخزون وقيمته + المنتجات الناقصة)
+    PUT    /api/products/<id>/reorder_level  {"reorder_level"}
+    GET    /api/changes?since=<seq>     (ما تغير منذ seq: الأسطر الجديدة / المعدلة، المحذوفة، وأرقام اليوم)
+"""
+
+import argparse
+import json
+import os
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import services
+
+MAX_BODY = 1 << 20
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _fields(body, *names):
+    return {n: body[n] for n in names if n in body}
+
+
+def _post_order(s, m, q, b):
+    if "items" in b:
+        order_id, line_ids = s.write(services.create_order, **_fields(
+            b, "items", "customer_name", "customer_phone", "customer_address", "sold_at", "external_id"))
+        return {"id": order_id, "lines": line_ids}
+    return dict(zip(("id", "total"), s.write(services.add_order, **_fields(b, "customer", "product", "qty", "total", "date"))))
+
+
+# (method, pattern, handler(store, match, query, body)) — الترتيب مهم
+ROUTES = [
+    ("GET", r"/api/health", lambda s, m, q, b: {"ok": True}),
+    ("GET", r"/api/stats", lambda s, m, q, b: s.read(services.sales_stats, q.get("from"), q.get("to"))),
+    ("GET", r"/api/products/search", lambda s, m, q, b: s.read(services.search_products, q.get("q", ""),
+                                                                 int(q.get("limit", 10)))),
+    ("GET", r"/api/customers/search", lambda s, m, q, b: s.read(services.search_customers, q.get("q", ""),
+                                                                  int(q.get("limit", 10)))),
+    ("GET", r"/api/products", lambda s, m, q, b: s.read(services.list_products)),
+    ("POST", r"/api/products", lambda s, m, q, b: {"id": s.write(services.add_product, **_fields(
+        b, "name", "price", "qty", "cost_price", "description", "image_path", "reorder_level"))}),
+    ("PUT", r"/api/products/(\d+)/reorder_level", lambda s, m, q, b: s.write(
+        services.set_reorder_level, int(m.group(1)), b.get("reorder_level")) or {"ok": True}),
+    ("GET", r"/api/inventory", lambda s, m, q, b: s.read(services.inventory_status, int(q.get("limit", 20)))),
+    ("GET", r"/api/sales", lambda s, m, q, b: s.read(services.list_sales, q.get("q", ""), q.get("from", ""),
+                                                     q.get("to", ""), int(q.get("limit", 50)), q.get("before"))),
+    ("POST", r"/api/sales", lambda s, m, q, b: {"id": s.write(services.add_sale, **_fields(
+        b, "product_id", "quantity", "customer_name", "customer_phone", "customer_address", "unit_sell", "sold_at"))}),
+    ("GET", r"/api/sales/(\d+)", lambda s, m, q, b: s.read(services.get_sale, int(m.group(1)))),
+    ("PUT", r"/api/sales/(\d+)", lambda s, m, q, b: s.write(services.update_sale, int(m.group(1)), **_fields(
+        b, "customer_name", "customer_phone", "customer_address", "quantity", "unit_sell")) or {"ok": True}),
+    ("DELETE", r"/api/sales/(\d+)", lambda s, m, q, b: s.write(services.delete_sale, int(m.group(1))) or {"ok": True}),
+    ("GET", r"/api/changes", lambda s, m, q, b: s.read(services.changes_since, int(q.get("since", 0)))),
+    ("GET", r"/api/orders/stats", lambda s, m, q, b: s.read(services.order_stats)),
+    ("GET", r"/api/orders/(\d+)", lambda s, m, q, b: s.read(services.get_order, int(m.group(1)))),
+    ("POST", r"/api/orders", _post_order),
+]
+ROUTES = [(method, re.compile(pattern + "$"), fn) for method, pattern, fn in ROUTES]
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: a till reuses one TCP connection
+    disable_nagle_algorithm = True  # headers and body are separate writes; avoid the 40 ms delayed-ACK stall
+    store = None                   # يُضبط في make_server
+
+    def _send(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            raise ApiError(413, "body too large")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise ApiError(400, "invalid JSON")
+        if not isinstance(body, dict):
+            raise ApiError(400, "JSON object expected")
+        return body
+
+    def _dispatch(self):
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            body = self._body() if self.command in ("POST", "PUT") else {}
+            allowed = False
+            for method, pattern, fn in ROUTES:
+                m = pattern.match(url.path)
+                if not m:
+                    continue
+                allowed = True
+                if method == self.command:
+                    status = 201 if method == "POST" else 200
+                    return self._send(status, fn(self.store, m, query, body))
+            raise ApiError(405 if allowed else 404, "method not allowed" if allowed else "not found")
+        except ApiError as e:
+            self._send(e.status, {"error": str(e)})
+        except services.NotFound as e:
+            self._send(404, {"error": f"not found: {e}"})
+        except (ValueError, TypeError) as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            self.log_error("%s %s failed: %r", self.command, url.path, e)
+            self._send(500, {"error": "internal error"})
+
+    do_GET = do_POST = do_PUT = do_DELETE = _dispatch
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(db_path, host="127.0.0.1", port=8765, readers=4, quiet=False):
+    handler = type("Handler", (ApiHandler,), {"store": services.Store(db_path, readers)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.quiet = quiet
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Bayt Alyasmeen store API")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "store.sqlite3"))
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--quiet", action="store_true")
+    args = ap.parse_args()
+
+    server = make_server(args.db, args.host, args.port, args.readers, args.quiet)
+    print(f"serving {args.db} on http://{args.host}:{server.server_port}/api/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.RequestHandlerClass.store.close()
+
+
+if __name__ == "__main__":
+    main()
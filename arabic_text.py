@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+arabic_text.py
+تجهيز النص العربي لملفات PDF (الفواتير في التطبيقين)
+- تسجيل خط TTF يدعم العربية مرة واحدة لكل عملية (من مجلد fonts بجانب التطبيق أو خطوط النظام)
+- وصل الحروف (arabic_reshaper) وترتيبها من اليمين لليسار (python-bidi) مع ذاكرة مؤقتة:
+  أسماء العملاء والمنتجات والعناوين الثابتة تتكرر في كل فاتورة فتُجهز مرة واحدة فقط
+"""
+
+import os
+import re
+from functools import lru_cache
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+try:
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+    SHAPING_AVAILABLE = True
+except ImportError:
+    SHAPING_AVAILABLE = False
+
+APP_DIR = os.path.abspath(os.path.dirname(__file__))
+FONT_NAME = "BaytArabic"
+FONT_NAME_BOLD = "BaytArabic-Bold"
+# (عادي، عريض) — أول زوج موجود يُستخدم؛ BAYT_ARABIC_FONT يحدد ملفاً بعينه
+FONT_CANDIDATES = [
+    (os.path.join(APP_DIR, "fonts", "Amiri-Regular.ttf"), os.path.join(APP_DIR, "fonts", "Amiri-Bold.ttf")),
+    (os.path.join(APP_DIR, "fonts", "NotoNaskhArabic-Regular.ttf"), os.path.join(APP_DIR, "fonts", "NotoNaskhArabic-Bold.ttf")),
+    ("C:\\Windows\\Fonts\\tahoma.ttf", "C:\\Windows\\Fonts\\tahomabd.ttf"),
+    ("C:\\Windows\\Fonts\\arial.ttf", "C:\\Windows\\Fonts\\arialbd.ttf"),
+    ("/usr/share/fonts/truetype/noto/NotoNaskhArabic-Regular.ttf", "/usr/share/fonts/truetype/noto/NotoNaskhArabic-Bold.ttf"),
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+    ("/Library/Fonts/Arial Unicode.ttf", None),
+]
+SHAPE_CACHE_SIZE = 8192
+_ARABIC = re.compile("[\u0600-\u06FF\u0750-\u077F\uFB50-\uFDFF\uFE70-\uFEFF]")
+_fonts = None
+
+
+def _candidates():
+    env = os.environ.get("BAYT_ARABIC_FONT")
+    return ([(env, os.environ.get("BAYT_ARABIC_FONT_BOLD"))] if env else []) + FONT_CANDIDATES
+
+
+def register_fonts():
+    """
+    يسجل الخط العربي في reportlab أول مرة فقط ويعيد (اسم الخط العادي، اسم الخط العريض).
+    بدون خط عربي متاح يعيد Helvetica (الحروف العربية لن تظهر) مع تحذير واحد.
+    """
+    global _fonts
+    if _fonts is None:
+        for regular, bold in _candidates():
+            if not regular or not os.path.exists(regular):
+                continue
+            try:
+                pdfmetrics.registerFont(TTFont(FONT_NAME, regular))
+                if bold and os.path.exists(bold):
+                    pdfmetrics.registerFont(TTFont(FONT_NAME_BOLD, bold))
+                    _fonts = (FONT_NAME, FONT_NAME_BOLD)
+                else:
+                    _fonts = (FONT_NAME, FONT_NAME)
+                break
+            except Exception as e:
+                print("font error:", regular, e)
+        else:
+            print("arabic_text: no Arabic TTF found (put one in fonts/ or set BAYT_ARABIC_FONT)")
+            _fonts = ("Helvetica", "Helvetica-Bold")
+    return _fonts
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def _shape(text):
+    return get_display(arabic_reshaper.reshape(text))
+
+
+def shape(text):
+    """النص جاهزاً للرسم (حروف موصولة وبترتيب العرض). النص بدون حروف عربية يعود كما هو."""
+    text = "" if text is None else str(text)
+    if not SHAPING_AVAILABLE or not _ARABIC.search(text):
+        return text
+    return _shape(text)
+
@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+backup.py
+نسخ احتياطي أثناء العمل (بدون إغلاق التطبيقين) ولقطات مضغوطة لملف store.sqlite3
+- النسخ بواجهة SQLite backup على دفعات من الصفحات (STEP_PAGES) داخل معاملة قراءة واحدة:
+  في وضع WAL لا تنتظر الكتابات (تطبيق سطح المكتب و Streamlit وخادم الـ API) هذه القراءة،
+  والنسخة لقطة متسقة لحظة البداية (بدونها يعيد SQLite النسخ من الأول بعد كل commit من اتصال آخر)
+- PRAGMA integrity_check على النسخة (لا على الملف الحي)، ثم ملف zip واحد لكل لقطة:
+  قاعدة البيانات (deflate سريع) + ملفات الأرشيف التي تشير إليها (sales_archive.py) + manifest.json (sha256)
+- تدوير: آخر KEEP لقطة في مجلد BACKUP_DIR بجانب قاعدة البيانات؛ start_backup_thread ينشئ لقطة كل EVERY_HOURS
+- verify_backup: CRC كل الملفات + sha256 + integrity_check؛ restore_backup: تحقق، ترقية مخطط اللقطة الأقدم
+  (migrate) ثم نسخ إلى الملف الحي بنفس الواجهة بعد لقطة "pre-restore" للحالي. الكتابة في الملف الحي متوقفة
+  طوال النسخ (ثوانٍ لكل مئات MB): أوقف Streamlit وخادم الـ API قبل الاستعادة، وأعد تشغيل التطبيقات بعدها.
+
+التشغيل:
+    python backup.py [--db store.sqlite3] [create | list | verify <zip> | restore <zip>]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime
+
+from db import connect, with_retry
+from migrations import SCHEMA_VERSION, migrate
+from sales_archive import ARCHIVE_DIR
+
+BACKUP_DIR = os.environ.get("BAYT_BACKUP_DIR", "backups")       # نسبي = بجانب ملف قاعدة البيانات
+KEEP = int(os.environ.get("BAYT_BACKUP_KEEP", 14))              # اللقطات المحفوظة (الأقدم تُحذف)
+EVERY_HOURS = float(os.environ.get("BAYT_BACKUP_HOURS", 24))    # لقطة تلقائية كل ... ساعة؛ 0 = بدون
+STEP_PAGES = 2048          # صفحات لكل خطوة نسخ (8 MB بصفحات 4 KB)
+STEP_SLEEP = 0.002         # ثوانٍ بين الخطوات حتى لا تأخذ النسخة كل القرص
+LEVEL = 1                  # ضغط deflate: 1 أسرع بكثير من 6 وحجمه قريب منه لملفات SQLite
+CHUNK = 4 << 20
+FORMAT = 1
+MANIFEST = "manifest.json"
+
+
+class BackupError(Exception):
+    pass
+
+
+def backup_dir(db_path):
+    base = os.path.dirname(os.path.abspath(db_path))
+    return os.path.join(base, BACKUP_DIR)
+
+
+def _db_name(db_path):
+    return os.path.basename(db_path)
+
+
+# ---------- الإنشاء ----------
+def _copy_db(db_path, dest, pages, sleep, progress):
+    """نسخة متسقة من db_path إلى dest على دفعات؛ الكتابات في الملف الحي تستمر أثناءها."""
+    src = connect(db_path, readonly=True, check_same_thread=False)
+    dst = sqlite3.connect(dest)
+    try:
+        # one read transaction for the whole copy: a WAL snapshot that other writers do not invalidate
+        src.execute("BEGIN")
+        src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        report = (lambda status, remaining, total: progress(total - remaining, total)) if progress else None
+        src.backup(dst, pages=pages, progress=report, sleep=sleep)
+        src.rollback()
+        # a self-contained file (no -wal) to compress, verify and restore from
+        dst.execute("PRAGMA journal_mode = DELETE")
+        problems = [r[0] for r in dst.execute("PRAGMA integrity_check").fetchall()]
+        if problems != ["ok"]:
+            raise BackupError("integrity_check: " + "; ".join(problems[:5]))
+        info = {"user_version": dst.execute("PRAGMA user_version").fetchone()[0],
+                "page_size": dst.execute("PRAGMA page_size").fetchone()[0],
+                "pages": dst.execute("PRAGMA page_count").fetchone()[0],
+                # archive files this copy refers to; files archived after the snapshot are not needed
+                "archive_files": [r[0] for r in dst.execute("SELECT file FROM sales_archive WHERE file != ''")]
+                if dst.execute("SELECT 1 FROM sqlite_master WHERE name = 'sales_archive'").fetchone() else []}
+    finally:
+        dst.close()
+        src.close()
+    return info
+
+
+def _add_file(zf, path, arcname, stored=False):
+    """يضيف path إلى zf على دفعات ويعيد sha256. stored: بدون ضغط."""
+    digest = hashlib.sha256()
+    if stored:
+        target = zipfile.ZipInfo.from_file(path, arcname)
+        target.compress_type = zipfile.ZIP_STORED
+    else:
+        target = arcname  # a plain name gets the archive's compression and LEVEL (a ZipInfo would get level 6)
+    with open(path, "rb") as f, zf.open(target, "w", force_zip64=True) as out:
+        while True:
+            block = f.read(CHUNK)
+            if not block:
+                break
+            digest.update(block)
+            out.write(block)
+    return digest.hexdigest()
+
+
+def create_backup(db_path, dest_dir=None, tag="", keep=KEEP, pages=STEP_PAGES, sleep=STEP_SLEEP, progress=None):
+    """
+    لقطة جديدة (zip) من db_path وملفات أرشيفه، ويحذف الأقدم من keep (None = بدون حذف).
+    يعيد manifest اللقطة ومعه path.
+    progress(الصفحات المنسوخة، كل الصفحات) أثناء النسخ.
+    """
+    dest_dir = dest_dir or backup_dir(db_path)
+    os.makedirs(dest_dir, exist_ok=True)
+    started = time.perf_counter()
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    name = f"{os.path.splitext(_db_name(db_path))[0]}-{stamp}{'-' + tag if tag else ''}.zip"
+    path = os.path.join(dest_dir, name)
+    raw = os.path.join(dest_dir, f".{name}.{os.getpid()}.sqlite3.tmp")
+    tmp = os.path.join(dest_dir, f".{name}.{os.getpid()}.tmp")
+    try:
+        info = _copy_db(db_path, raw, pages, sleep, progress)
+        copied = time.perf_counter()
+        archive = os.path.join(os.path.dirname(os.path.abspath(db_path)), ARCHIVE_DIR)
+        manifest = {"format": FORMAT, "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "db": _db_name(db_path), "db_bytes": os.path.getsize(raw), "integrity": "ok",
+                    "user_version": info["user_version"], "page_size": info["page_size"], "pages": info["pages"],
+                    "archive_files": {}, "missing_files": []}
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED, compresslevel=LEVEL) as zf:
+            manifest["sha256"] = _add_file(zf, raw, manifest["db"])
+            for f in info["archive_files"]:
+                src = os.path.join(archive, f)
+                if os.path.exists(src):
+                    # .npz files are already compressed
+                    manifest["archive_files"][f] = _add_file(zf, src, f"{ARCHIVE_DIR}/{f}", stored=True)
+                else:
+                    manifest["missing_files"].append(f)
+            manifest["copy_s"] = round(copied - started, 2)
+            manifest["total_s"] = round(time.perf_counter() - started, 2)
+            zf.writestr(MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=1))
+        os.replace(tmp, path)
+    finally:
+        for f in (raw, tmp):
+            if os.path.exists(f):
+                os.remove(f)
+    manifest["path"] = path
+    manifest["bytes"] = os.path.getsize(path)
+    if keep is not None:
+        rotate(dest_dir, keep)
+    return manifest
+
+
+def rotate(dest_dir, keep=KEEP):
+    """يحذف اللقطات الأقدم من آخر keep، وبقايا لقطات لم تكتمل عمرها أكثر من يوم."""
+    snapshots = sorted(f for f in os.listdir(dest_dir) if f.endswith(".zip"))
+    removed = []
+    for f in snapshots[:max(0, len(snapshots) - keep)]:
+        os.remove(os.path.join(dest_dir, f))
+        removed.append(f)
+    for f in os.listdir(dest_dir):
+        p = os.path.join(dest_dir, f)
+        if f.endswith(".tmp") and time.time() - os.path.getmtime(p) > 86400:
+            os.remove(p)
+    return removed
+
+
+# ---------- القراءة والتحقق ----------
+def read_manifest(path):
+    with zipfile.ZipFile(path) as zf:
+        return json.loads(zf.read(MANIFEST))
+
+
+def list_backups(db_path, dest_dir=None):
+    """اللقطات الأحدث أولاً: {name, path, bytes, created_at, db_bytes, archive_files}."""
+    dest_dir = dest_dir or backup_dir(db_path)
+    if not os.path.isdir(dest_dir):
+        return []
+    out = []
+    for f in sorted((f for f in os.listdir(dest_dir) if f.endswith(".zip")), reverse=True):
+        p = os.path.join(dest_dir, f)
+        try:
+            m = read_manifest(p)
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            m = {}
+        out.append({"name": f, "path": p, "bytes": os.path.getsize(p), "created_at": m.get("created_at", ""),
+                    "db_bytes": m.get("db_bytes"), "archive_files": len(m.get("archive_files", {}))})
+    return out
+
+
+def _extract_db(zf, manifest, dest):
+    """يستخرج قاعدة البيانات من اللقطة إلى dest ويعيد sha256 المحسوب."""
+    digest = hashlib.sha256()
+    with zf.open(manifest["db"]) as src, open(dest, "wb") as out:
+        while True:
+            block = src.read(CHUNK)
+            if not block:
+                break
+            digest.update(block)
+            out.write(block)
+    return digest.hexdigest()
+
+
+def verify_backup(path, keep_db=None, integrity=True):
+    """
+    {ok, problems, manifest, ms}: CRC ملفات الأرشيف، sha256 قاعدة البيانات و integrity_check عليها.
+    keep_db: مسار يُترك فيه ملف قاعدة البيانات المستخرج (للاستعادة)، وإلا يُحذف.
+    integrity=False: sha256 وحده (نفس بايتات النسخة التي نجحت في integrity_check عند إنشائها).
+    """
+    t0 = time.perf_counter()
+    problems = []
+    try:
+        zf = zipfile.ZipFile(path)
+    except (OSError, zipfile.BadZipFile) as e:
+        return {"ok": False, "problems": [str(e)], "manifest": None, "ms": 0}
+    with zf:
+        try:
+            manifest = json.loads(zf.read(MANIFEST))
+        except (KeyError, ValueError) as e:
+            return {"ok": False, "problems": [f"manifest: {e}"], "manifest": None, "ms": 0}
+        for name, digest in manifest["archive_files"].items():
+            try:
+                if hashlib.sha256(zf.read(f"{ARCHIVE_DIR}/{name}")).hexdigest() != digest:
+                    problems.append(f"{name}: sha256")
+            except (KeyError, zipfile.BadZipFile) as e:  # BadZipFile: CRC mismatch
+                problems.append(f"{name}: {e}")
+        problems += [f"missing in snapshot: {f}" for f in manifest.get("missing_files", [])]
+        fd, db = tempfile.mkstemp(suffix=".sqlite3.tmp", dir=os.path.dirname(os.path.abspath(keep_db or path)))
+        os.close(fd)
+        try:
+            try:
+                if _extract_db(zf, manifest, db) != manifest["sha256"]:
+                    problems.append(f"{manifest['db']}: sha256")
+            except zipfile.BadZipFile as e:
+                problems.append(f"{manifest['db']}: {e}")
+            if integrity and not problems:
+                conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+                try:
+                    result = [r[0] for r in conn.execute("PRAGMA integrity_check").fetchall()]
+                finally:
+                    conn.close()
+                if result != ["ok"]:
+                    problems.append("integrity_check: " + "; ".join(result[:5]))
+            if keep_db and not problems:
+                os.replace(db, keep_db)
+        finally:
+            if os.path.exists(db):
+                os.remove(db)
+    return {"ok": not problems, "problems": problems, "manifest": manifest,
+            "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+
+# ---------- الاستعادة ----------
+def restore_backup(path, db_path, safety=True, progress=None):
+    """
+    يتحقق من اللقطة ثم ينسخها فوق db_path بواجهة backup (الاتصالات المفتوحة ترى البيانات المستعادة)، ويعيد
+    ملفات الأرشيف. safety: لقطة "pre-restore" من الحالي أولاً. يرفع BackupError.
+    لقطة بمخطط أقدم تُرقّى (migrate) قبل النسخ، ولقطة من نسخة أحدث من البرنامج تُرفض.
+    قفل الكتابة على db_path يبقى طوال النسخ (SQLite يحجز الملف الهدف حتى آخر خطوة، على دفعات أو بدونها):
+    كتابات التطبيقات الأخرى تنتظر busy_timeout ثم تفشل، فأوقفها قبل الاستعادة.
+    """
+    base = os.path.dirname(os.path.abspath(db_path))
+    restored = os.path.join(base, f".restore.{os.getpid()}.sqlite3")
+    check = verify_backup(path, keep_db=restored, integrity=False)
+    if not check["ok"]:
+        raise BackupError("; ".join(check["problems"]))
+    manifest = check["manifest"]
+    try:
+        version = manifest.get("user_version", 0)
+        if version > SCHEMA_VERSION:
+            raise BackupError(f"اللقطة من نسخة أحدث من البرنامج (المخطط {version} > {SCHEMA_VERSION})")
+        if version < SCHEMA_VERSION:
+            # upgrade the extracted copy, so the running apps never see the old schema in the live file
+            conn = sqlite3.connect(restored)
+            try:
+                migrate(conn)
+            finally:
+                conn.close()
+        if safety and os.path.exists(db_path):
+            # no rotation here: it could delete the snapshot being restored
+            create_backup(db_path, tag="pre-restore", keep=None)
+        archive = os.path.join(base, ARCHIVE_DIR)
+        with zipfile.ZipFile(path) as zf:
+            # archive files first: the restored sales_archive rows refer to them
+            for name in manifest["archive_files"]:
+                os.makedirs(archive, exist_ok=True)
+                tmp = os.path.join(archive, f".{name}.tmp")
+                with zf.open(f"{ARCHIVE_DIR}/{name}") as src, open(tmp, "wb") as out:
+                    while True:
+                        block = src.read(CHUNK)
+                        if not block:
+                            break
+                        out.write(block)
+                os.replace(tmp, os.path.join(archive, name))
+        src = sqlite3.connect(restored)
+        dst = connect(db_path)
+        try:
+            report = (lambda status, remaining, total: progress(total - remaining, total)) if progress else None
+            # steps only move the progress bar: the write lock on dst is held until the last one
+            with_retry(lambda: src.backup(dst, pages=STEP_PAGES, progress=report))
+        finally:
+            dst.close()
+            src.close()
+    finally:
+        if os.path.exists(restored):
+            os.remove(restored)
+    return manifest
+
+
+# ---------- الجدولة ----------
+def backup_due(db_path, every_hours=EVERY_HOURS, dest_dir=None):
+    """ينشئ لقطة إن مرّ every_hours منذ آخر لقطة (أو لا توجد)؛ يعيد manifest أو None."""
+    if every_hours <= 0 or not os.path.exists(db_path):
+        return None
+    latest = list_backups(db_path, dest_dir)
+    if latest and time.time() - os.path.getmtime(latest[0]["path"]) < every_hours * 3600:
+        return None
+    return create_backup(db_path, dest_dir)
+
+
+_threads = {}
+_threads_lock = threading.Lock()
+
+
+def start_backup_thread(db_path, every_hours=EVERY_HOURS, check_seconds=600, first_delay=60):
+    """
+    thread واحد لكل ملف في هذه العملية يشغل backup_due كل check_seconds (التطبيقان عند التشغيل).
+    first_delay: لا ينافس تحميل الصفحة الأولى عند بدء التطبيق.
+    """
+    path = os.path.abspath(db_path)
+    if every_hours <= 0:
+        return None
+    with _threads_lock:
+        thread = _threads.get(path)
+        if thread is not None and thread.is_alive():
+            return thread
+
+        def run():
+            time.sleep(first_delay)
+            while True:
+                try:
+                    m = backup_due(path, every_hours)
+                    if m:
+                        print(f"backup: {m['path']} ({m['bytes'] / 2**20:.1f} MB in {m['total_s']}s)")
+                except Exception as e:
+                    print("backup error:", e)
+                time.sleep(check_seconds)
+        thread = _threads[path] = threading.Thread(target=run, name="backup", daemon=True)
+        thread.start()
+    return thread
+
+
+# ---------- سطر الأوامر ----------
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default="store.sqlite3")
+    ap.add_argument("--dir", help=f"مجلد اللقطات (افتراضياً {BACKUP_DIR} بجانب قاعدة البيانات)")
+    ap.add_argument("--keep", type=int, default=KEEP)
+    ap.add_argument("action", nargs="?", default="create", choices=("create", "list", "verify", "restore"))
+    ap.add_argument("snapshot", nargs="?", help="ملف اللقطة (verify / restore)")
+    args = ap.parse_args()
+    if args.action == "create":
+        m = create_backup(args.db, args.dir, keep=args.keep)
+        print(f"{m['path']}: {m['db_bytes'] / 2**20:.1f} MB -> {m['bytes'] / 2**20:.1f} MB, "
+              f"{len(m['archive_files'])} archive files, copy {m['copy_s']}s, total {m['total_s']}s")
+    elif args.action == "list":
+        for b in list_backups(args.db, args.dir):
+            print(f"{b['name']}  {b['created_at']}  {b['bytes'] / 2**20:.1f} MB  archive files: {b['archive_files']}")
+    elif not args.snapshot:
+        ap.error(f"{args.action}: snapshot file required")
+    elif args.action == "verify":
+        r = verify_backup(args.snapshot)
+        print("OK" if r["ok"] else "\n".join(r["problems"]), f"({r['ms']:.0f} ms)")
+    else:
+        m = restore_backup(args.snapshot, args.db)
+        print(f"restored {args.db} from {m['created_at']}; restart the apps to reload their caches")
+
+
+if __name__ == "__main__":
+    main()
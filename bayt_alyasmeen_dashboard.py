@@ -8,95 +8,109 @@ bayt_alyasmeen_dashboard.py
 - حفظ الفواتير في مجلد invoices/
 - RTL: محاذاة إلى اليمين حيث أمكن (Tkinter محدود في RTL لكن قمنا بضبط المحاذاة)
 - يعتمد على نفس قاعدة البيانات store.sqlite3
+- إكمال تلقائي لبيانات العميل (الاسم أو الهاتف) من فهرس في الذاكرة (lookup.py)
+- نسخ احتياطي أثناء العمل ولقطات مضغوطة دورية مع التحقق والاستعادة (backup.py، صفحة التشخيص)
+- ملفات التصدير والفواتير المجمعة محفوظة حتى تتغير بياناتها، وتقارير أمس / الشهر تُبنى ليلاً (report_cache.py)
 """
 
 import os
+import queue
 import shutil
-import sqlite3
+import threading
+import time
+import traceback
 from datetime import datetime, date
 from tkinter import *
 from tkinter import ttk, filedialog, messagebox
-from openpyxl import Workbook
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from PIL import Image, ImageTk
+from migrations import migrate
+from sales_rollup import rollup_totals
+from sales_search import day_bounds, optimize_sales_fts
+import sales_archive
+from sales_archive import SalesQuery, archive_next, sales_query
+from change_feed import POLL_MS, ChangeFeed, touches_sales
+from excel_export import ExportCancelled
+from paged_tree import PagedTreeview
+from db_worker import DbWorker
+from db import connect
+import backup
+import profiling
+import report_cache
+import services
+# reportlab / openpyxl / PIL / pandas are imported inside the functions that use them,
+# so the window appears without waiting for them (see benchmarks/bench_startup.py)
 
 # ---------- إعداد المسارات ----------
 APP_DIR = os.path.abspath(os.path.dirname(__file__))
 DB_PATH = os.path.join(APP_DIR, "store.sqlite3")
 IMAGES_DIR = os.path.join(APP_DIR, "images_perfumes")
 INVOICES_DIR = os.path.join(APP_DIR, "invoices")
-os.makedirs(IMAGES_DIR, exist_ok=True)
-os.makedirs(INVOICES_DIR, exist_ok=True)
-
-# ---------- اتصال بقاعدة البيانات ----------
-conn = sqlite3.connect(DB_PATH)
-cur = conn.cursor()
+STARTUP_PROBE = os.environ.get("BAYT_STARTUP_PROBE")  # benchmarks/bench_startup.py
 
 # ---------- دوال مساعدة ----------
+def app_dir(path):
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def startup_mark(name):
+    # the startup benchmark reads these lines from stdout; the app quits after "data"
+    if STARTUP_PROBE:
+        print(f"startup:{name}", flush=True)
+
 def copy_image(src_path):
+    from image_store import store_image_file
+    # content-addressed: the same photo is stored once, thumbnails are made here
     try:
-        base = os.path.basename(src_path)
-        dst = os.path.join(IMAGES_DIR, f"{int(datetime.now().timestamp())}_{base}")
-        shutil.copy(src_path, dst)
-        return dst
+        return store_image_file(src_path, app_dir(IMAGES_DIR))
     except Exception as e:
         print("copy_image error:", e)
         return ""
 
+@profiling.timed_fn("invoice")
 def create_invoice_pdf(sale_row, logo_path=None):
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+    from invoices import draw_sale_invoice
     stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     fname = f"فاتورة_{sale_row['customer_name']}_{stamp}.pdf"
-    path = os.path.join(INVOICES_DIR, fname)
+    path = os.path.join(app_dir(INVOICES_DIR), fname)
     c = canvas.Canvas(path, pagesize=A4)
-    w, h = A4
-    # Header
-    c.setFont("Helvetica-Bold", 16)
-    c.drawRightString(w-40, h - 60, "بيت الياسمين للعطور")
-    c.setFont("Helvetica", 10)
-    c.drawRightString(w-40, h - 80, f"التاريخ: {sale_row['sold_at']}")
-    # Customer
-    c.setFont("Helvetica-Bold", 12)
-    c.drawRightString(w-40, h - 110, "بيانات المستلم:")
-    c.setFont("Helvetica", 10)
-    c.drawRightString(w-40, h - 125, f"الاسم: {sale_row['customer_name']}")
-    c.drawRightString(w-40, h - 140, f"الهاتف: {sale_row['customer_phone']}")
-    c.drawRightString(w-40, h - 155, f"العنوان: {sale_row['customer_address']}")
-    # Product details (left-aligned box)
-    top = h - 200
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(40, top, "تفاصيل المنتج:")
-    c.setFont("Helvetica", 10)
-    c.drawString(40, top - 20, f"المنتج: {sale_row['product_name']}")
-    c.drawString(40, top - 35, f"الكمية: {sale_row['quantity']}")
-    c.drawString(40, top - 50, f"سعر الوحدة (بيع): {sale_row['unit_sell']:.2f}")
-    c.drawString(40, top - 65, f"إجمالي البيع: {sale_row['total']:.2f}")
-    c.drawString(40, top - 80, f"تكلفة الإجمالي: {sale_row['cost_total']:.2f}")
-    c.drawString(40, top - 95, f"صافي الربح: {sale_row['net_profit']:.2f}")
-    # Product image (on right)
-    try:
-        if sale_row.get("image_path") and os.path.exists(sale_row["image_path"]):
-            c.drawImage(sale_row["image_path"], w-220, top-10, width=180, height=180, preserveAspectRatio=True)
-    except Exception:
-        pass
-    # Footer
-    c.setFont("Helvetica", 10)
-    c.drawString(40, 60, "شكراً لتعاملكم مع بيت الياسمين للعطور")
+    draw_sale_invoice(c, sale_row, logo_path)
     c.save()
     return path
 
-def export_sales_to_excel(output_path):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "المبيعات"
+@profiling.timed_fn("export")
+def export_sales_to_excel(output_path, q="", f_from="", f_to="", progress=None, cancel=None):
+    """تصدير متدفق بفلاتر صفحة التقارير. يفتح اتصالاً خاصاً به حتى يمكن تشغيله في thread منفصل."""
+    from excel_export import stream_rows_to_xlsx
     headers = ["التاريخ","المنتج","الكمية","سعر الوحدة","اجمالي البيع","تكلفة الاجمالي","صافي الربح","اسم العميل","هاتف","العنوان"]
-    ws.append(headers)
-    cur.execute("SELECT sold_at, product_name, quantity, unit_sell, total, cost_total, net_profit, customer_name, customer_phone, customer_address FROM sales ORDER BY id DESC")
-    for row in cur.fetchall():
-        ws.append(row)
-    wb.save(output_path)
+    xconn = connect(DB_PATH, readonly=True)
+    try:
+        xcur = xconn.cursor()
+        # live rows + only the archived months the dates need (sales_archive.SalesQuery)
+        query = sales_query(xcur, ("sold_at", "product_name", "quantity", "unit_sell", "total", "cost_total", "net_profit",
+                                   "customer_name", "customer_phone", "customer_address"), q, f_from, f_to)
+        total = query.count(xcur)
+        stream_rows_to_xlsx(query.iter_rows(xcur, key=False), headers, output_path, sheet_title="المبيعات",
+                            progress=progress, cancel=cancel, total=total)
+    finally:
+        xconn.close()
+    return output_path
+
+def build_invoices_pdf(output_path, progress=None, cancel=None, q="", f_from="", f_to="", logo_path=""):
+    """فواتير الفترة في ملف PDF واحد (التقرير invoices_pdf في report_cache)."""
+    from invoices import generate_invoices
+    lo, hi = day_bounds(f_from, f_to)
+    with profiling.timed("invoice", "generate_invoices"):
+        files = generate_invoices(DB_PATH, app_dir(INVOICES_DIR), date_from=lo, date_to=hi,
+                                  logo_path=logo_path or None, merge_path=output_path, progress=progress)
+    if not files:
+        raise ValueError("لا توجد عمليات بيع في هذه الفترة")
     return output_path
 
+# the report cache serves these again until the period's data changes; sales_xlsx is prebuilt at night
+report_cache.register("sales_xlsx", ".xlsx", export_sales_to_excel)
+report_cache.register("invoices_pdf", ".pdf", build_invoices_pdf, prebuild=False)
+
 # ---------- الواجهة (Tkinter) ----------
 class DashboardApp:
     def __init__(self, root):
@@ -105,17 +119,28 @@ class DashboardApp:
         root.geometry("1150x760")
         root.configure(bg="white")
 
+        # database access runs off the Tk thread (migrate runs first, on the writer).
+        # The worker starts once the window is mapped; jobs submitted before that wait in its queue.
+        self.db = DbWorker(root, DB_PATH, init=migrate, start=False)
+        root.bind("<Map>", self._on_first_map, add="+")
+        # writes from any app / till reach the open page as changes (change_feed), not as a rebuild
+        self.feed = ChangeFeed()
+        self.live_handlers = []
+
         # top bar
         top = Frame(root, bg="white")
         top.pack(fill=X, padx=12, pady=8)
         self.logo_img = None
         self.logo_path = None
+        self.archive_status = ""
         self.title_lbl = Label(top, text="🏷 بيت الياسمين للعطور", font=("Arial", 18, "bold"), bg="white", anchor="e")
         self.title_lbl.pack(side=RIGHT)
         Button(top, text="رفع شعار", command=self.upload_logo).pack(side=RIGHT, padx=8)
         Button(top, text="لوحة التحكم", command=self.show_dashboard).pack(side=LEFT, padx=6)
         Button(top, text="الطلبات", command=self.show_orders).pack(side=LEFT, padx=6)
         Button(top, text="التقارير", command=self.show_reports).pack(side=LEFT, padx=6)
+        if profiling.ENABLED:
+            Button(top, text="التشخيص", command=self.show_diagnostics).pack(side=LEFT, padx=6)
 
         # main container
         self.container = Frame(root, bg="white")
@@ -128,137 +153,341 @@ class DashboardApp:
 
         self.show_dashboard()
 
+    def _on_first_map(self, event):
+        if event.widget is self.root and not self.db.started:
+            startup_mark("frame")
+            self.db.start()
+            if sales_archive.AUTO_ARCHIVE:
+                self.archive_old_months()
+            self.poll_changes()
+            backup.start_backup_thread(DB_PATH)
+            report_cache.start_prebuild_thread(DB_PATH)
+
+    def poll_changes(self):
+        """كل POLL_MS: change_feed على thread قراءة، والتغييرات تُرسل إلى الصفحة المعروضة لتحديثها في مكانها."""
+        def done(changes):
+            # schedule the next poll first: a broken page handler must not stop live refresh
+            self.root.after(POLL_MS, self.poll_changes)
+            for handler in list(self.live_handlers) if changes else ():
+                try:
+                    handler(changes)
+                except Exception:
+                    print("live refresh handler error:")
+                    traceback.print_exc()
+        def failed(e):
+            print("change feed error:", e)
+            self.root.after(POLL_MS * 10, self.poll_changes)
+        self.db.submit(self.feed.poll, callback=done, errback=failed)
+
+    def archive_old_months(self, archived=0, on_status=None):
+        """ينقل الأشهر الأقدم من sales_archive.HOT_MONTHS إلى ملفات الأرشيف، شهراً لكل مهمة كتابة
+        حتى لا تنتظر الكتابات الأخرى (ومنها تطبيق Streamlit) طويلاً، ثم يدمج فهرس البحث مرة واحدة.
+        الحالة في self.archive_status (صفحة التشخيص) و on_status؛ الصفحات المفتوحة تُحدَّث من change_feed."""
+        def status(text):
+            self.archive_status = text
+            if on_status:
+                on_status(text)
+        def done(meta):
+            if meta:
+                status(f"أُرشف {meta['month']}: {meta['rows']} سطر -> {meta['file']}")
+                self.archive_old_months(archived + 1, on_status)
+            else:
+                status(f"الأرشفة انتهت: {archived} شهر" if archived else "لا توجد أشهر للأرشفة")
+                if archived:
+                    self.db.submit(optimize_sales_fts, write=True,
+                                   errback=lambda e: messagebox.showerror("خطأ", f"تعذر دمج فهرس البحث: {e}"))
+        def failed(e):
+            status(f"تعذرت الأرشفة: {e}")
+            messagebox.showerror("خطأ", f"تعذرت أرشفة الأشهر القديمة: {e}")
+        status("جاري الأرشفة...")
+        self.db.submit(lambda cur: archive_next(cur), callback=done, write=True, errback=failed)
+
     def upload_logo(self):
         p = filedialog.askopenfilename(filetypes=[("Image files","*.png;*.jpg;*.jpeg;*.bmp")])
         if not p: return
         dst = copy_image(p)
         self.logo_path = dst
         try:
-            im = Image.open(dst); im.thumbnail((80,80)); self.logo_img = ImageTk.PhotoImage(im)
+            from PIL import Image, ImageTk
+            from image_store import thumbnail_path
+            im = Image.open(thumbnail_path(dst, "icon")); self.logo_img = ImageTk.PhotoImage(im)
             self.title_lbl.config(image=self.logo_img, text="")
         except:
             pass
 
     # ---------- لوحة التحكم (Dashboard) ----------
+    @profiling.timed_fn("page")
     def show_dashboard(self):
         self.clear_container()
+        t0 = time.perf_counter()
         frame = Frame(self.container, bg="white")
         frame.pack(fill=BOTH, expand=True)
 
-        # compute stats
         today = date.today().isoformat()
-        month_start = date.today().replace(day=1).isoformat()
-        cur.execute("SELECT COUNT(*), IFNULL(SUM(total),0), IFNULL(SUM(net_profit),0) FROM sales")
-        total_ops, total_revenue, total_profit = cur.fetchone()
-        cur.execute("SELECT COUNT(*), IFNULL(SUM(total),0), IFNULL(SUM(net_profit),0) FROM sales WHERE date(sold_at)=?", (today,))
-        today_ops, today_revenue, today_profit = cur.fetchone()
-        cur.execute("SELECT COUNT(*), IFNULL(SUM(total),0), IFNULL(SUM(net_profit),0) FROM sales WHERE date(sold_at)>=?", (month_start,))
-        month_ops, month_revenue, month_profit = cur.fetchone()
 
         # header
         Label(frame, text="لوحة التحكم", font=("Arial", 16, "bold"), bg="white").pack(anchor="e")
 
         stats_frame = Frame(frame, bg="white")
         stats_frame.pack(fill=X, pady=8)
+        loading = Label(stats_frame, text="جاري التحميل...", bg="white")
+        loading.pack(pady=20)
 
         def stat_card(parent, title, value, subtitle=""):
             card = Frame(parent, bg="#FAFAFA", bd=1, relief=RIDGE, padx=12, pady=8)
             Label(card, text=title, font=("Arial", 11, "bold"), bg="#FAFAFA", anchor="e").pack(anchor="e")
-            Label(card, text=value, font=("Arial", 14, "bold"), bg="#FAFAFA", fg="green", anchor="e").pack(anchor="e")
+            card.value_lbl = Label(card, text=value, font=("Arial", 14, "bold"), bg="#FAFAFA", fg="green", anchor="e")
+            card.value_lbl.pack(anchor="e")
+            card.sub_lbl = None
             if subtitle:
-                Label(card, text=subtitle, font=("Arial", 9), bg="#FAFAFA", anchor="e").pack(anchor="e")
+                card.sub_lbl = Label(card, text=subtitle, font=("Arial", 9), bg="#FAFAFA", anchor="e")
+                card.sub_lbl.pack(anchor="e")
             return card
 
-        # create 3 columns for Today / Month / Total
-        left = Frame(stats_frame, bg="white")
-        left.pack(side=RIGHT, expand=True, fill=BOTH, padx=6)
-        mid = Frame(stats_frame, bg="white")
-        mid.pack(side=RIGHT, expand=True, fill=BOTH, padx=6)
-        right = Frame(stats_frame, bg="white")
-        right.pack(side=RIGHT, expand=True, fill=BOTH, padx=6)
-
-        # Today
-        stat_card(left, "اليوم", "", "").pack(fill=BOTH, padx=6, pady=4)
-        stat_card(left, "عدد الطلبات اليوم", today_ops, "").pack(fill=BOTH, padx=6, pady=4)
-        stat_card(left, "إجمالي الإيراد اليوم", f"{today_revenue:.2f} جنيه", "").pack(fill=BOTH, padx=6, pady=4)
-        stat_card(left, "صافي الربح اليوم", f"{today_profit:.2f} جنيه", "").pack(fill=BOTH, padx=6, pady=4)
-
-        # Month
-        stat_card(mid, "هذا الشهر", "", "").pack(fill=BOTH, padx=6, pady=4)
-        stat_card(mid, "عدد الطلبات هذا الشهر", month_ops, "").pack(fill=BOTH, padx=6, pady=4)
-        stat_card(mid, "إجمالي الإيراد الشهر", f"{month_revenue:.2f} جنيه", "").pack(fill=BOTH, padx=6, pady=4)
-        stat_card(mid, "صافي الربح الشهر", f"{month_profit:.2f} جنيه", "").pack(fill=BOTH, padx=6, pady=4)
-
-        # Total
-        stat_card(right, "الإجمالي الكلي", "", "").pack(fill=BOTH, padx=6, pady=4)
-        stat_card(right, "عدد الطلبات الكلي", total_ops, "").pack(fill=BOTH, padx=6, pady=4)
-        stat_card(right, "إجمالي الإيراد الكلي", f"{total_revenue:.2f} جنيه", "").pack(fill=BOTH, padx=6, pady=4)
-        stat_card(right, "صافي الربح الكلي", f"{total_profit:.2f} جنيه", "").pack(fill=BOTH, padx=6, pady=4)
+        stat_cards = {}
+
+        def show_stats(stats):
+            if not stats_frame.winfo_exists():
+                return
+            (total_ops, total_revenue, total_profit), (today_ops, today_revenue, today_profit), \
+                (month_ops, month_revenue, month_profit) = stats
+            values = {
+                "عدد الطلبات اليوم": today_ops, "إجمالي الإيراد اليوم": f"{today_revenue:.2f} جنيه",
+                "صافي الربح اليوم": f"{today_profit:.2f} جنيه",
+                "عدد الطلبات هذا الشهر": month_ops, "إجمالي الإيراد الشهر": f"{month_revenue:.2f} جنيه",
+                "صافي الربح الشهر": f"{month_profit:.2f} جنيه",
+                "عدد الطلبات الكلي": total_ops, "إجمالي الإيراد الكلي": f"{total_revenue:.2f} جنيه",
+                "صافي الربح الكلي": f"{total_profit:.2f} جنيه",
+            }
+            if stat_cards:  # live update: only the numbers change
+                for title, value in values.items():
+                    stat_cards[title].value_lbl.config(text=value)
+                return
+            loading.destroy()
+
+            # create 3 columns for Today / Month / Total
+            left = Frame(stats_frame, bg="white")
+            left.pack(side=RIGHT, expand=True, fill=BOTH, padx=6)
+            mid = Frame(stats_frame, bg="white")
+            mid.pack(side=RIGHT, expand=True, fill=BOTH, padx=6)
+            right = Frame(stats_frame, bg="white")
+            right.pack(side=RIGHT, expand=True, fill=BOTH, padx=6)
+
+            # Today / Month / Total
+            for parent, heading, titles in (
+                    (left, "اليوم", ("عدد الطلبات اليوم", "إجمالي الإيراد اليوم", "صافي الربح اليوم")),
+                    (mid, "هذا الشهر", ("عدد الطلبات هذا الشهر", "إجمالي الإيراد الشهر", "صافي الربح الشهر")),
+                    (right, "الإجمالي الكلي", ("عدد الطلبات الكلي", "إجمالي الإيراد الكلي", "صافي الربح الكلي"))):
+                stat_card(parent, heading, "", "").pack(fill=BOTH, padx=6, pady=4)
+                for title in titles:
+                    stat_cards[title] = stat_card(parent, title, values[title], "")
+                    stat_cards[title].pack(fill=BOTH, padx=6, pady=4)
+            profiling.record("page", "show_dashboard (data)", (time.perf_counter() - t0) * 1000)
+            startup_mark("data")
+            if STARTUP_PROBE:
+                self.root.after(0, self.root.destroy)
+
+        def load_stats():
+            # stats from the sales_daily rollup, read on a worker thread
+            day = date.today().isoformat()
+            first = date.today().replace(day=1).isoformat()
+            self.db.submit(lambda cur: (rollup_totals(cur), rollup_totals(cur, day, day), rollup_totals(cur, first)),
+                           callback=show_stats)
+        load_stats()
+
+        # stock from the in-memory inventory snapshot (only products changed since the last refresh are read)
+        inv_frame = Frame(frame, bg="white")
+        inv_frame.pack(fill=X, pady=4)
+
+        inv_cards = {}
+        low_tree = []
+
+        def show_inventory(inv):
+            if not inv_frame.winfo_exists():
+                return
+            values = {
+                "المخزون (قطعة)": (inv["units"], f"{inv['products']} منتج"),
+                "قيمة المخزون بسعر الشراء": (f"{inv['value_cost']:.2f} جنيه", ""),
+                "قيمة المخزون بسعر البيع": (f"{inv['value_sell']:.2f} جنيه", ""),
+                "منتجات تحت حد الطلب": (inv["low_stock"], f"نافد: {inv['out_of_stock']}"),
+            }
+            if inv_cards:  # live update
+                for title, (value, subtitle) in values.items():
+                    inv_cards[title].value_lbl.config(text=value)
+                    if inv_cards[title].sub_lbl:
+                        inv_cards[title].sub_lbl.config(text=subtitle)
+            else:
+                cards = Frame(inv_frame, bg="white")
+                cards.pack(fill=X)
+                for title, (value, subtitle) in values.items():
+                    inv_cards[title] = stat_card(cards, title, value, subtitle)
+                    inv_cards[title].pack(side=RIGHT, expand=True, fill=BOTH, padx=6)
+            items = inv["low_stock_items"]
+            if items and not low_tree:
+                Label(inv_frame, text="تنبيهات نقص المخزون", font=("Arial", 11, "bold"), bg="white").pack(anchor="e", padx=6, pady=(6,0))
+                cols = ("المنتج","الكمية","حد إعادة الطلب")
+                tree = ttk.Treeview(inv_frame, columns=cols, show="headings", height=min(len(items), 6))
+                for c in cols:
+                    tree.heading(c, text=c)
+                    tree.column(c, anchor=CENTER, width=160)
+                tree.column("المنتج", anchor="e", width=360)
+                tree.pack(fill=X, padx=6, pady=4)
+                low_tree.append(tree)
+            if low_tree:
+                tree = low_tree[0]
+                tree.delete(*tree.get_children())
+                for r in items:
+                    tree.insert("", "end", values=(r["name"], r["qty"], r["reorder_level"]))
+                tree.configure(height=max(1, min(len(items), 6)))
+
+        def load_inventory():
+            self.db.submit(lambda cur: services.inventory_status(cur, 10), callback=show_inventory)
+        load_inventory()
+
+        def on_changes(changes):
+            if touches_sales(changes):
+                load_stats()
+            if changes["stock"]:
+                load_inventory()
+        self.live_handlers.append(on_changes)
 
         # quick actions
         actions = Frame(frame, bg="white")
         actions.pack(fill=X, pady=8)
         Button(actions, text="إضافة منتج جديد", command=self.open_add_product).pack(side=RIGHT, padx=6)
         Button(actions, text="تصدير مبيعات إلى Excel", command=self.export_sales).pack(side=RIGHT, padx=6)
+        Button(actions, text="فواتير اليوم (ملف واحد)", command=lambda: self.print_invoices(today, today, f"فواتير_{today}.pdf")).pack(side=RIGHT, padx=6)
 
         self.dashboard_page = frame
 
-    def export_sales(self):
+    def export_sales(self, q="", f_from="", f_to=""):
         p = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files","*.xlsx")])
         if not p: return
+        def work(progress, cancel):
+            # the same filters and unchanged data: the saved workbook is copied instead of rebuilt
+            path, _hit = report_cache.cache_for(DB_PATH).get(
+                "sales_xlsx", {"q": q, "f_from": f_from, "f_to": f_to}, progress=progress, cancel=cancel)
+            shutil.copyfile(path, p)
+        self.run_with_progress("تصدير إلى Excel", work, f"تم التصدير إلى {p}")
+
+    def print_invoices(self, f_from, f_to, merge_name):
+        """فواتير كل عمليات الفترة [f_from, f_to] في ملف PDF واحد (تُرسم على عدة عمليات في الخلفية)."""
         try:
-            export_sales_to_excel(p)
-            messagebox.showinfo("تم", f"تم التصدير إلى {p}")
-        except Exception as e:
-            messagebox.showerror("خطأ", str(e))
+            date.fromisoformat(f_from), date.fromisoformat(f_to)
+        except ValueError:
+            messagebox.showwarning("قيمة خاطئة","صيغة التاريخ YYYY-MM-DD")
+            return
+        merge_path = os.path.join(app_dir(INVOICES_DIR), merge_name)
+        def work(progress, cancel):
+            path, _hit = report_cache.cache_for(DB_PATH).get(
+                "invoices_pdf", {"f_from": f_from, "f_to": f_to, "logo_path": self.logo_path}, progress=progress)
+            shutil.copyfile(path, merge_path)
+        self.run_with_progress("طباعة الفواتير", work, f"تم حفظ الفواتير في {merge_path}", cancellable=False)
+
+    def run_with_progress(self, title, work, done_msg=None, cancellable=True, on_done=None):
+        """يشغل work(progress, cancel) في thread منفصل مع نافذة تقدم تُحدَّث عبر after().
+        عند الانتهاء تُستدعى on_done(النتيجة) إن وُجدت وإلا تظهر رسالة done_msg."""
+        win = Toplevel(self.root)
+        win.title(title)
+        win.geometry("360x130")
+        win.configure(bg="white")
+        win.transient(self.root)
+        status = Label(win, text="جاري التنفيذ...", bg="white")
+        status.pack(pady=(12,4))
+        bar = ttk.Progressbar(win, length=300, mode="determinate")
+        bar.pack(pady=4)
+        cancel = threading.Event()
+        if cancellable:
+            Button(win, text="إلغاء", command=cancel.set).pack(pady=6)
+        events = queue.Queue()
+
+        def run():
+            try:
+                result = work(lambda done, total: events.put(("progress", done, total)), cancel)
+                events.put(("done", result))
+            except ExportCancelled:
+                events.put(("cancelled",))
+            except Exception as e:
+                events.put(("error", str(e)))
+        threading.Thread(target=run, daemon=True).start()
+
+        def poll():
+            try:
+                while True:
+                    ev = events.get_nowait()
+                    if ev[0] == "progress":
+                        done, total = ev[1], ev[2]
+                        if total:
+                            bar.config(mode="determinate", maximum=max(total, 1), value=done)
+                        else:
+                            bar.config(mode="indeterminate"); bar.step(5)
+                        status.config(text=f"جاري التنفيذ... {done} / {total or '?'}")
+                        continue
+                    win.destroy()
+                    if ev[0] == "done" and on_done:
+                        on_done(ev[1])
+                    elif ev[0] == "done":
+                        messagebox.showinfo("تم", done_msg)
+                    elif ev[0] == "cancelled":
+                        messagebox.showinfo("تم", "تم الإلغاء")
+                    else:
+                        messagebox.showerror("خطأ", ev[1])
+                    return
+            except queue.Empty:
+                pass
+            win.after(100, poll)
+        poll()
 
     # ---------- Orders page (عرض الطلبات) ----------
+    @profiling.timed_fn("page")
     def show_orders(self):
         self.clear_container()
         frame = Frame(self.container, bg="white")
         frame.pack(fill=BOTH, expand=True)
         Label(frame, text="قائمة الطلبات", font=("Arial", 16, "bold"), bg="white").pack(anchor="e", padx=6, pady=(2,6))
 
-        # table of orders
-        cols = ("التاريخ","المنتج","الكمية","سعر الوحدة","إجمالي","صافي الربح","العميل","هاتف")
+        count_lbl = Label(frame, text="", bg="white")
+        count_lbl.pack(anchor="e", padx=12)
+
+        # table of orders (windowed: only the visible rows + prefetch are loaded)
+        cols = ("رقم الطلب","التاريخ","المنتج","الكمية","سعر الوحدة","إجمالي","صافي الربح","العميل","هاتف")
         tree = ttk.Treeview(frame, columns=cols, show="headings", height=18)
         for c in cols:
             tree.heading(c, text=c)
             tree.column(c, anchor=CENTER, width=120)
         tree.pack(fill=BOTH, expand=True, padx=12, pady=8)
-        scrollbar = ttk.Scrollbar(frame, orient=VERTICAL, command=tree.yview)
-        tree.configure(yscroll=scrollbar.set)
+        scrollbar = ttk.Scrollbar(frame, orient=VERTICAL)
         scrollbar.pack(side=RIGHT, fill=Y)
 
+        count_lbl.config(text="جاري التحميل...")
+        # live sales + archived months, newest first (sales_archive.SalesQuery)
+        pager = PagedTreeview(
+            tree, scrollbar, self.db,
+            SalesQuery(("order_id", "sold_at", "product_name", "quantity", "unit_sell", "total", "net_profit",
+                        "customer_name", "customer_phone")),
+            format_row=lambda r: (r[0], r[1], r[2], r[3], f"{r[4]:.2f}", f"{r[5]:.2f}", f"{r[6]:.2f}", r[7], r[8]),
+            on_loaded=lambda total: count_lbl.config(text=f"عدد الطلبات: {total}"), name="show_orders")
+
         def load_orders():
-            for i in tree.get_children():
-                tree.delete(i)
-            cur.execute("SELECT id,sold_at,product_name,quantity,unit_sell,total,net_profit,customer_name,customer_phone FROM sales ORDER BY id DESC")
-            for r in cur.fetchall():
-                tree.insert("", "end", iid=r[0], values=(r[1], r[2], r[3], f"{r[4]:.2f}", f"{r[5]:.2f}", f"{r[6]:.2f}", r[7], r[8]))
+            pager.reload()
         load_orders()
+        self.live_handlers.append(pager.apply_changes)
 
         # right-click menu
         menu = Menu(self.root, tearoff=0)
         def edit_order():
-            sel = tree.selection()
-            if not sel: return
-            oid = int(sel[0])
+            oid = pager.selected()
+            if oid is None: return
             self.open_edit_sale(oid, refresh_fn=load_orders)
         def delete_order():
-            sel = tree.selection()
-            if not sel: return
-            oid = int(sel[0])
+            oid = pager.selected()
+            if oid is None: return
             if messagebox.askyesno("تأكيد","هل تريد حذف هذه العملية؟"):
-                cur.execute("SELECT product_id, quantity FROM sales WHERE id=?", (oid,))
-                row = cur.fetchone()
-                if row:
-                    pid, q = row
-                    cur.execute("UPDATE products SET qty = qty + ? WHERE id=?", (q, pid))
-                cur.execute("DELETE FROM sales WHERE id=?", (oid,))
-                conn.commit()
-                load_orders()
-                messagebox.showinfo("تم","تم حذف العملية")
+                def done(_):
+                    load_orders()
+                    messagebox.showinfo("تم","تم حذف العملية")
+                self.db.submit(lambda cur: services.delete_sale(cur, oid), callback=done, write=True,
+                               errback=lambda e: messagebox.showerror("خطأ", f"تعذر الحذف: {e}"))
         menu.add_command(label="تعديل", command=edit_order)
         menu.add_command(label="حذف", command=delete_order)
         def on_right(event):
@@ -271,6 +500,7 @@ class DashboardApp:
         self.orders_page = frame
 
     # ---------- Reports page ----------
+    @profiling.timed_fn("page")
     def show_reports(self):
         self.clear_container()
         frame = Frame(self.container, bg="white")
@@ -278,13 +508,19 @@ class DashboardApp:
         Label(frame, text="تقارير متقدمة", font=("Arial", 16, "bold"), bg="white").pack(anchor="e", padx=6, pady=(2,6))
 
         # quick stats (reuse dashboard numbers)
-        cur.execute("SELECT COUNT(*), IFNULL(SUM(total),0), IFNULL(SUM(net_profit),0) FROM sales")
-        total_ops, total_revenue, total_profit = cur.fetchone()
         stats = Frame(frame, bg="white")
         stats.pack(fill=X, padx=12, pady=6)
-        Label(stats, text=f"عدد الطلبات: {total_ops}", bg="white").pack(side=RIGHT, padx=8)
-        Label(stats, text=f"إجمالي الإيراد: {total_revenue:.2f} جنيه", bg="white").pack(side=RIGHT, padx=8)
-        Label(stats, text=f"صافي الربح: {total_profit:.2f} جنيه", bg="white").pack(side=RIGHT, padx=8)
+        ops_lbl = Label(stats, text="عدد الطلبات: ...", bg="white"); ops_lbl.pack(side=RIGHT, padx=8)
+        revenue_lbl = Label(stats, text="إجمالي الإيراد: ...", bg="white"); revenue_lbl.pack(side=RIGHT, padx=8)
+        profit_lbl = Label(stats, text="صافي الربح: ...", bg="white"); profit_lbl.pack(side=RIGHT, padx=8)
+        def show_stats(totals):
+            if not stats.winfo_exists():
+                return
+            total_ops, total_revenue, total_profit = totals
+            ops_lbl.config(text=f"عدد الطلبات: {total_ops}")
+            revenue_lbl.config(text=f"إجمالي الإيراد: {total_revenue:.2f} جنيه")
+            profit_lbl.config(text=f"صافي الربح: {total_profit:.2f} جنيه")
+        self.db.submit(lambda cur: rollup_totals(cur), callback=show_stats)
 
         # filter & search
         f = Frame(frame, bg="white")
@@ -297,75 +533,161 @@ class DashboardApp:
         Label(f, text="إلى تاريخ (YYYY-MM-DD):", bg="white").pack(side=RIGHT, padx=6)
         to_var = StringVar(); Entry(f, textvariable=to_var, width=12).pack(side=RIGHT, padx=6)
 
-        # result table
+        count_lbl = Label(frame, text="", bg="white")
+        count_lbl.pack(anchor="e", padx=12)
+
+        # result table (windowed, see PagedTreeview)
         cols = ("التاريخ","المنتج","الكمية","سعر الوحدة","اجمالي","تكلفة","صافي الربح","عميل","هاتف")
         tree = ttk.Treeview(frame, columns=cols, show="headings", height=14)
         for c in cols:
             tree.heading(c, text=c)
             tree.column(c, anchor=CENTER, width=110)
         tree.pack(fill=BOTH, expand=True, padx=12, pady=8)
-        scrollbar = ttk.Scrollbar(frame, orient=VERTICAL, command=tree.yview)
-        tree.configure(yscroll=scrollbar.set)
+        scrollbar = ttk.Scrollbar(frame, orient=VERTICAL)
         scrollbar.pack(side=RIGHT, fill=Y)
+        cols_sql = ("sold_at", "product_name", "quantity", "unit_sell", "total", "cost_total", "net_profit",
+                    "customer_name", "customer_phone")
+        pager = PagedTreeview(tree, scrollbar, self.db, SalesQuery(cols_sql),
+                              on_loaded=lambda total: count_lbl.config(text=f"عدد النتائج: {total}"), name="show_reports")
 
         def load_table():
-            for i in tree.get_children():
-                tree.delete(i)
-            q = search_var.get().strip().lower()
+            q = search_var.get().strip()
             f_from = from_var.get().strip()
             f_to = to_var.get().strip()
-            sql = "SELECT sold_at,product_name,quantity,unit_sell,total,cost_total,net_profit,customer_name,customer_phone FROM sales WHERE 1=1"
-            params = []
-            if q:
-                sql += " AND (LOWER(product_name) LIKE ? OR LOWER(customer_name) LIKE ?)"
-                params += [f"%{q}%", f"%{q}%"]
-            if f_from:
-                sql += " AND date(sold_at) >= date(?)"
-                params.append(f_from)
-            if f_to:
-                sql += " AND date(sold_at) <= date(?)"
-                params.append(f_to)
-            sql += " ORDER BY id DESC"
-            cur.execute(sql, params)
-            for row in cur.fetchall():
-                tree.insert("", "end", values=row)
+            def apply(query):
+                if not tree.winfo_exists():
+                    return
+                pager.set_query(query)
+            def failed(e):
+                if not count_lbl.winfo_exists():
+                    return
+                count_lbl.config(text="")
+                if isinstance(e, ValueError):
+                    messagebox.showwarning("قيمة خاطئة","صيغة التاريخ YYYY-MM-DD")
+                else:
+                    messagebox.showerror("خطأ", f"تعذر تحميل النتائج: {e}")
+            count_lbl.config(text="جاري البحث...")
+            # sales_filter may query sales_fts, so it runs on the worker too; archived months are
+            # filtered in memory by the same words and dates
+            self.db.submit(lambda cur: sales_query(cur, cols_sql, q, f_from, f_to), callback=apply, errback=failed)
         load_table()
 
-        # export button
+        def on_changes(changes):
+            if touches_sales(changes):
+                self.db.submit(lambda cur: rollup_totals(cur), callback=show_stats)
+                pager.apply_changes(changes)
+        self.live_handlers.append(on_changes)
+
+        # search as you type (debounced), dates on Enter
+        pending = [None]
+        def schedule_load(*_):
+            if pending[0]:
+                frame.after_cancel(pending[0])
+            pending[0] = frame.after(250, load_table)
+        search_var.trace_add("write", schedule_load)
+        for child in f.winfo_children():
+            if isinstance(child, Entry):
+                child.bind("<Return>", lambda e: load_table())
+
+        # export button (exports what the filters above currently show)
         def export_action():
-            p = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files","*.xlsx")])
-            if not p: return
-            try:
-                export_sales_to_excel(p)
-                messagebox.showinfo("تم", f"تم التصدير إلى {p}")
-            except Exception as e:
-                messagebox.showerror("خطأ", str(e))
+            self.export_sales(search_var.get().strip(), from_var.get().strip(), to_var.get().strip())
         Button(frame, text="تصدير إلى Excel", command=export_action).pack(pady=6)
+        def invoices_action():
+            f_from = from_var.get().strip() or date.today().isoformat()
+            f_to = to_var.get().strip() or f_from
+            self.print_invoices(f_from, f_to, f"فواتير_{f_from}_{f_to}.pdf")
+        Button(frame, text="فواتير الفترة (ملف واحد)", command=invoices_action).pack(pady=2)
+        Button(frame, text="تحليلات (منتجات / عملاء / إيراد)",
+               command=lambda: self.show_analytics(from_var.get().strip(), to_var.get().strip())).pack(pady=2)
 
         self.reports_page = frame
 
+    def show_analytics(self, f_from="", f_to=""):
+        """تحليلات الفترة (analytics.analyze) تُحسب في الخلفية ثم تُعرض في نافذة بتبويبات."""
+        try:
+            lo, hi = day_bounds(f_from, f_to)
+        except ValueError:
+            messagebox.showwarning("قيمة خاطئة","صيغة التاريخ YYYY-MM-DD")
+            return
+
+        def work(progress, cancel):
+            import analytics  # pandas loads here, on the worker thread
+            aconn = connect(DB_PATH, readonly=True)
+            try:
+                with profiling.timed("report", "analytics.analyze"):
+                    return analytics.analyze(aconn, "sales", lo, hi, progress=progress)
+            finally:
+                aconn.close()
+        self.run_with_progress("تحليلات", work, cancellable=False, on_done=self._analytics_window)
+
+    def _analytics_window(self, result):
+        import analytics
+        win = Toplevel(self.root)
+        win.title("تحليلات المبيعات")
+        win.geometry("900x560")
+        win.configure(bg="white")
+        nb = ttk.Notebook(win)
+        nb.pack(fill=BOTH, expand=True, padx=8, pady=8)
+
+        def table(parent, cols, rows):
+            tree = ttk.Treeview(parent, columns=cols, show="headings", height=20)
+            for c in cols:
+                tree.heading(c, text=c)
+                tree.column(c, anchor=CENTER, width=120)
+            for r in rows:
+                tree.insert("", "end", values=r)
+            tree.pack(fill=BOTH, expand=True)
+            return tree
+
+        tab = Frame(nb, bg="white"); nb.add(tab, text="ربحية المنتجات")
+        top = analytics.top_products(result, 100)
+        table(tab, ("المنتج","عدد العمليات","الكمية","الإيراد","صافي الربح","هامش الربح"),
+              [(name, int(r.ops), int(r.qty), f"{r.total:.2f}", f"{r.profit:.2f}", f"{r.margin:.1%}") for name, r in top.iterrows()])
+
+        tab = Frame(nb, bg="white"); nb.add(tab, text="العملاء")
+        rep = analytics.repeat_customer_stats(result)
+        Label(tab, bg="white", anchor="e", text=(
+            f"عدد العملاء: {rep['customers']}   |   عملاء متكررون: {rep['repeat_customers']} ({rep['repeat_rate']:.1%})"
+            f"   |   حصتهم من الإيراد: {rep['repeat_revenue_share']:.1%}   |   متوسط الطلبات للعميل: {rep['avg_orders_per_customer']:.2f}"
+        )).pack(fill=X, pady=6)
+        table(tab, ("العميل","عدد الطلبات","الإيراد","أول شراء","آخر شراء"),
+              [(name, int(r.orders), f"{r.revenue:.2f}", r["first"], r["last"]) for name, r in result["customers"].head(100).iterrows()])
+
+        for bucket, title, window in (("day", "الإيراد اليومي", 7), ("month", "الإيراد الشهري", 3)):
+            tab = Frame(nb, bg="white"); nb.add(tab, text=title)
+            series = analytics.revenue_series(result, bucket, window).iloc[::-1]
+            fmt = "%Y-%m-%d" if bucket == "day" else "%Y-%m"
+            table(tab, ("الفترة","عدد العمليات","الإيراد","صافي الربح",f"متوسط متحرك ({window})"),
+                  [(ts.strftime(fmt), int(r.ops), f"{r.total:.2f}", f"{r.profit:.2f}", f"{r.moving_avg:.2f}") for ts, r in series.head(400).iterrows()])
+
+        tab = Frame(nb, bg="white"); nb.add(tab, text="ساعات اليوم")
+        profile = analytics.hour_of_day_profile(result)
+        table(tab, ("الساعة","الإيراد"), [(f"{h:02d}:00", f"{v:.2f}") for h, v in profile.items()])
+
     # ---------- تعديل عملية بيع (تفتح من orders) ----------
     def open_edit_sale(self, sale_id, refresh_fn=None):
-        cur.execute("SELECT id,sold_at,product_id,product_name,quantity,unit_sell,unit_cost,total,cost_total,net_profit,customer_name,customer_phone,customer_address FROM sales WHERE id=?", (sale_id,))
-        r = cur.fetchone()
-        if not r:
-            messagebox.showerror("خطأ","العملية غير موجودة")
-            return
+        self.db.submit(lambda cur: services.get_sale(cur, sale_id),
+                       callback=lambda r: self._edit_sale_window(sale_id, r, refresh_fn),
+                       errback=lambda e: messagebox.showerror("خطأ","العملية غير موجودة"))
+
+    def _edit_sale_window(self, sale_id, r, refresh_fn=None):
         win = Toplevel(self.root)
         win.title("تعديل عملية البيع")
         win.geometry("480x520")
         win.configure(bg="white")
         Label(win, text="تعديل بيانات البيع", bg="white", font=("Arial",12,"bold")).pack(pady=8)
         Label(win, text="اسم العميل:", bg="white").pack(anchor="e", padx=12)
-        name_e = Entry(win); name_e.insert(0, r[10]); name_e.pack(fill=X, padx=12)
+        name_e = Entry(win); name_e.insert(0, r["customer_name"] or ""); name_e.pack(fill=X, padx=12)
         Label(win, text="هاتف العميل:", bg="white").pack(anchor="e", padx=12)
-        phone_e = Entry(win); phone_e.insert(0, r[11]); phone_e.pack(fill=X, padx=12)
+        phone_e = Entry(win); phone_e.insert(0, r["customer_phone"] or ""); phone_e.pack(fill=X, padx=12)
         Label(win, text="العنوان:", bg="white").pack(anchor="e", padx=12)
-        addr_e = Entry(win); addr_e.insert(0, r[12]); addr_e.pack(fill=X, padx=12)
+        addr_e = Entry(win); addr_e.insert(0, r["customer_address"] or ""); addr_e.pack(fill=X, padx=12)
         Label(win, text="الكمية:", bg="white").pack(anchor="e", padx=12)
-        qty_e = Entry(win); qty_e.insert(0, str(r[4])); qty_e.pack(fill=X, padx=12)
+        qty_e = Entry(win); qty_e.insert(0, str(r["quantity"])); qty_e.pack(fill=X, padx=12)
         Label(win, text="سعر البيع للوحدة:", bg="white").pack(anchor="e", padx=12)
-        unit_sell_e = Entry(win); unit_sell_e.insert(0, str(r[5])); unit_sell_e.pack(fill=X, padx=12)
+        unit_sell_e = Entry(win); unit_sell_e.insert(0, str(r["unit_sell"])); unit_sell_e.pack(fill=X, padx=12)
+        self.attach_customer_lookup(win, name_e, phone_e, addr_e)
 
         def save_edit():
             try:
@@ -377,34 +699,82 @@ class DashboardApp:
             except:
                 messagebox.showwarning("قيمة خاطئة","تأكد من المدخلات")
                 return
-            cur.execute("SELECT unit_cost, product_id, quantity FROM sales WHERE id=?", (sale_id,))
-            row = cur.fetchone()
-            if not row:
-                messagebox.showerror("خطأ","المعلومة مفقودة")
+            def done(_):
+                messagebox.showinfo("تم","تم حفظ التعديلات")
+                win.destroy()
+                if refresh_fn:
+                    refresh_fn()
+            def failed(e):
+                save_btn.config(state=NORMAL)
+                if isinstance(e, services.NotFound):
+                    messagebox.showerror("خطأ","المعلومة مفقودة")
+                else:
+                    messagebox.showerror("خطأ", f"تعذر الحفظ: {e}")
+            save_btn.config(state=DISABLED)
+            # totals, profit and the stock correction are computed in services.update_sale
+            self.db.submit(lambda cur: services.update_sale(cur, sale_id, new_name, new_phone, new_addr, new_qty, new_unit_sell),
+                           callback=done, errback=failed, write=True)
+
+        save_btn = Button(win, text="حفظ التعديل", command=save_edit)
+        save_btn.pack(pady=12)
+
+    # ---------- إكمال تلقائي للعميل (lookup.py) ----------
+    def attach_customer_lookup(self, win, name_e, phone_e, addr_e, delay_ms=150):
+        """قائمة العملاء المطابقين تحت خانة الاسم / الهاتف أثناء الكتابة؛ اختيار عميل يملأ الخانات الثلاث.
+        نافذة تعديل البيع هي خانات العميل الوحيدة هنا: الطلبات الجديدة تُسجل من Streamlit أو الـ API."""
+        box = Listbox(win, height=5, justify=RIGHT)
+        found, pending = [], [None]
+
+        def show(entry, text, rows):
+            # a reply for text the user has since changed is dropped
+            if not win.winfo_exists() or entry.get().strip() != text:
+                return
+            found[:] = rows
+            box.delete(0, END)
+            for c in rows:
+                box.insert(END, f"{c['name']}   {c['phone']}   {c['address']}")
+            if rows:
+                box.pack(after=entry, fill=X, padx=12)
+            else:
+                box.pack_forget()
+
+        def lookup(entry):
+            pending[0] = None
+            text = entry.get().strip()
+            if len(text) < 2:
+                box.pack_forget()
+                return
+            self.db.submit(lambda cur: services.search_customers(cur, text, 8),
+                           callback=lambda rows: show(entry, text, rows))
+
+        def typed(event):
+            if event.keysym in ("Return", "Tab", "Escape"):
+                box.pack_forget()
+                return
+            if pending[0] is not None:
+                win.after_cancel(pending[0])
+            pending[0] = win.after(delay_ms, lambda: lookup(event.widget))
+
+        def pick(_event=None):
+            sel = box.curselection()
+            if not sel:
                 return
-            unit_cost, prod_id, old_qty = float(row[0]), int(row[1]), int(row[2])
-            # adjust product qty
-            diff = new_qty - old_qty
-            cur.execute("UPDATE products SET qty = qty - ? WHERE id=?", (diff, prod_id))
-            new_total = new_unit_sell * new_qty
-            new_cost_total = unit_cost * new_qty
-            new_profit = new_total - new_cost_total
-            cur.execute("""UPDATE sales SET customer_name=?, customer_phone=?, customer_address=?, quantity=?, unit_sell=?, total=?, cost_total=?, net_profit=? WHERE id=?""",
-                        (new_name, new_phone, new_addr, new_qty, new_unit_sell, new_total, new_cost_total, new_profit, sale_id))
-            conn.commit()
-            messagebox.showinfo("تم","تم حفظ التعديلات")
-            win.destroy()
-            if refresh_fn:
-                refresh_fn()
-
-        Button(win, text="حفظ التعديل", command=save_edit).pack(pady=12)
+            c = found[sel[0]]
+            for entry, value in ((name_e, c["name"]), (phone_e, c["phone"]), (addr_e, c["address"])):
+                entry.delete(0, END)
+                entry.insert(0, value or "")
+            box.pack_forget()
+
+        for entry in (name_e, phone_e):
+            entry.bind("<KeyRelease>", typed)
+        box.bind("<<ListboxSelect>>", pick)
 
     # ---------- فتح إضافة منتج (مستخدم في dashboard) ----------
     def open_add_product(self):
         # reuse product add window similar to previous implementation
         win = Toplevel(self.root)
         win.title("إضافة منتج جديد")
-        win.geometry("420x520")
+        win.geometry("420x580")
         win.configure(bg="white")
         Label(win, text="اسم المنتج:", bg="white").pack(anchor="e", padx=12, pady=(8,0))
         name_e = Entry(win); name_e.pack(fill=X, padx=12)
@@ -416,6 +786,8 @@ class DashboardApp:
         cost_e = Entry(win); cost_e.pack(fill=X, padx=12)
         Label(win, text="سعر البيع:", bg="white").pack(anchor="e", padx=12, pady=(8,0))
         sell_e = Entry(win); sell_e.pack(fill=X, padx=12)
+        Label(win, text="حد إعادة الطلب (اختياري):", bg="white").pack(anchor="e", padx=12, pady=(8,0))
+        level_e = Entry(win); level_e.pack(fill=X, padx=12)
         img_path_var = StringVar(value="")
         img_lbl = Label(win, text="لم يتم اختيار صورة", bg="white")
         img_lbl.pack(padx=12, pady=8)
@@ -433,20 +805,153 @@ class DashboardApp:
                 qty = int(qty_e.get() or 0)
                 cost = float(cost_e.get() or 0)
                 sell = float(sell_e.get() or 0)
+                level = int(level_e.get()) if level_e.get().strip() else None
             except:
                 messagebox.showwarning("قيمة خاطئة","تأكد من المدخلات الرقمية")
                 return
             img = img_path_var.get()
-            cur.execute("INSERT INTO products (name,description,qty,cost_price,sell_price,image_path) VALUES (?,?,?,?,?,?)",
-                        (name, desc, qty, cost, sell, img))
-            conn.commit()
-            messagebox.showinfo("تم","تمت إضافة المنتج")
-            win.destroy()
-            self.show_dashboard()
-        Button(win, text="حفظ المنتج", command=save).pack(pady=10)
+            def done(_):
+                messagebox.showinfo("تم","تمت إضافة المنتج")
+                win.destroy()
+                self.show_dashboard()
+            save_btn.config(state=DISABLED)
+            self.db.submit(lambda cur: services.add_product(cur, name, price=sell, qty=qty, cost_price=cost,
+                                                            description=desc, image_path=img, reorder_level=level),
+                           callback=done, write=True,
+                           errback=lambda e: (save_btn.config(state=NORMAL), messagebox.showerror("خطأ", f"تعذر الحفظ: {e}")))
+        save_btn = Button(win, text="حفظ المنتج", command=save)
+        save_btn.pack(pady=10)
+
+    # ---------- التشخيص (profiling) ----------
+    def show_diagnostics(self):
+        """أزمنة العمليات (p50 / p95 / p99) وآخر الاستعلامات البطيئة مع خطة التنفيذ."""
+        self.clear_container()
+        frame = Frame(self.container, bg="white")
+        frame.pack(fill=BOTH, expand=True)
+        Label(frame, text="التشخيص", font=("Arial", 16, "bold"), bg="white").pack(anchor="e", padx=6, pady=(2,6))
+        Label(frame, text=f"السجل: {profiling.LOG_PATH or 'غير مفعل (BAYT_PROFILE_LOG)'} — الاستعلامات البطيئة: {profiling.SLOW_MS:.0f} ms فأكثر",
+              bg="white").pack(anchor="e", padx=12)
+
+        cols = ("النوع","العملية","العدد","p50 ms","p95 ms","p99 ms","الأقصى ms","الكلي ms","متوسط الصفوف")
+        ops = ttk.Treeview(frame, columns=cols, show="headings", height=12)
+        for c in cols:
+            ops.heading(c, text=c)
+            ops.column(c, anchor=CENTER, width=80)
+        ops.column("العملية", anchor="w", width=460)
+        ops.pack(fill=BOTH, expand=True, padx=12, pady=6)
+
+        slow_cols = ("الوقت","ms","الصفوف","الاستعلام","الخطة")
+        slow = ttk.Treeview(frame, columns=slow_cols, show="headings", height=8)
+        for c in slow_cols:
+            slow.heading(c, text=c)
+            slow.column(c, anchor=CENTER, width=80)
+        slow.column("الوقت", width=130)
+        slow.column("الاستعلام", anchor="w", width=420)
+        slow.column("الخطة", anchor="w", width=360)
+        slow.pack(fill=BOTH, expand=True, padx=12, pady=6)
+
+        def refresh():
+            ops.delete(*ops.get_children())
+            for r in profiling.summary():
+                ops.insert("", "end", values=(r["kind"], r["name"], r["count"], r["p50_ms"], r["p95_ms"], r["p99_ms"],
+                                              r["max_ms"], r["total_ms"], "" if r["avg_rows"] is None else r["avg_rows"]))
+            slow.delete(*slow.get_children())
+            for r in profiling.slow_queries():
+                slow.insert("", "end", values=(r["at"], r["ms"], r["rows"], r["sql"], r["plan"] or ""))
+
+        def reset():
+            profiling.reset()
+            refresh()
+
+        actions = Frame(frame, bg="white")
+        actions.pack(fill=X, pady=6)
+        Button(actions, text="تحديث", command=refresh).pack(side=RIGHT, padx=6)
+        Button(actions, text="حفظ الملخص في السجل", command=profiling.flush_log,
+               state=NORMAL if profiling.LOG_PATH else DISABLED).pack(side=RIGHT, padx=6)
+        Button(actions, text="مسح القياسات", command=reset).pack(side=RIGHT, padx=6)
+        refresh()
+
+        archive_row = Frame(frame, bg="white")
+        archive_row.pack(fill=X, padx=12, pady=2)
+        archive_lbl = Label(archive_row, text=self.archive_status, bg="white")
+        def archive_now():
+            if messagebox.askyesno("أرشفة", f"نقل مبيعات الأشهر الأقدم من {sales_archive.HOT_MONTHS} أشهر إلى "
+                                             "ملفات الأرشيف؟ (تبقى ظاهرة في الطلبات والتقارير لكن لا تُعدل)"):
+                self.archive_old_months(on_status=lambda text: archive_lbl.winfo_exists() and archive_lbl.config(text=text))
+        Button(archive_row, text="أرشفة الأشهر القديمة", command=archive_now,
+               state=NORMAL if sales_archive.HOT_MONTHS > 0 else DISABLED).pack(side=RIGHT, padx=6)
+        archive_lbl.pack(side=RIGHT, padx=6)
+        cache = report_cache.cache_for(DB_PATH).stats()
+        Label(frame, text=f"التقارير الجاهزة: {cache['files']} ملف ({cache['bytes'] / 2**20:.1f} MB) في {cache['dir']} — "
+                          f"من الجاهز {cache['hits']} / بناء جديد {cache['misses']}؛ البناء الليلي "
+                          f"{report_cache.PREBUILD_HOURS}", bg="white").pack(anchor="e", padx=12)
+        self.backups_panel(frame)
+
+    # ---------- النسخ الاحتياطي (backup.py) ----------
+    def backups_panel(self, parent):
+        """اللقطات في مجلد backup.BACKUP_DIR مع إنشاء لقطة الآن، التحقق من لقطة واستعادتها."""
+        Label(parent, text=f"النسخ الاحتياطية — {backup.backup_dir(DB_PATH)} (آخر {backup.KEEP}، تلقائياً كل "
+                           f"{backup.EVERY_HOURS:g} ساعة)", bg="white").pack(anchor="e", padx=12)
+        cols = ("الملف","التاريخ","MB","قاعدة البيانات MB","ملفات الأرشيف")
+        tree = ttk.Treeview(parent, columns=cols, show="headings", height=5)
+        for c in cols:
+            tree.heading(c, text=c)
+            tree.column(c, anchor=CENTER, width=110)
+        tree.column("الملف", anchor="w", width=300)
+        tree.pack(fill=X, padx=12, pady=6)
+        paths = {}
+
+        def refresh():
+            tree.delete(*tree.get_children())
+            paths.clear()
+            for b in backup.list_backups(DB_PATH):
+                iid = tree.insert("", "end", values=(b["name"], b["created_at"], f"{b['bytes'] / 2**20:.1f}",
+                                                     "" if b["db_bytes"] is None else f"{b['db_bytes'] / 2**20:.1f}",
+                                                     b["archive_files"]))
+                paths[iid] = b["path"]
+
+        def selected():
+            sel = tree.selection()
+            if not sel:
+                messagebox.showwarning("تنبيه", "اختر لقطة أولاً")
+                return None
+            return paths[sel[0]]
+
+        def created(m):
+            refresh()
+            messagebox.showinfo("تم", f"{os.path.basename(m['path'])}: {m['bytes'] / 2**20:.1f} MB في {m['total_s']} ث")
+
+        def verify():
+            path = selected()
+            if path:
+                self.run_with_progress("التحقق من اللقطة", lambda progress, cancel: backup.verify_backup(path),
+                                       cancellable=False, on_done=lambda r: messagebox.showinfo(
+                                           "التحقق", "سليمة" if r["ok"] else "\n".join(r["problems"])))
+
+        def restore():
+            path = selected()
+            if not path or not messagebox.askyesno(
+                    "استعادة", f"استبدال البيانات الحالية بـ {os.path.basename(path)}؟\n"
+                               "أوقف تطبيق Streamlit وخادم الـ API أولاً: الكتابة متوقفة طوال النسخ.\n"
+                               "تُحفظ لقطة من الحالية أولاً، ثم أعد تشغيل التطبيقات."):
+                return
+            self.run_with_progress("استعادة", lambda progress, cancel: backup.restore_backup(path, DB_PATH,
+                                                                                          progress=progress),
+                                   cancellable=False, on_done=lambda m: (refresh(), messagebox.showinfo(
+                                       "تم", f"تمت الاستعادة إلى {m['created_at']} — أعد تشغيل التطبيق")))
+
+        actions = Frame(parent, bg="white")
+        actions.pack(fill=X, pady=6)
+        Button(actions, text="نسخة احتياطية الآن", command=lambda: self.run_with_progress(
+            "نسخ احتياطي", lambda progress, cancel: backup.create_backup(DB_PATH, progress=progress),
+            cancellable=False, on_done=created)).pack(side=RIGHT, padx=6)
+        Button(actions, text="تحقق من المحددة", command=verify).pack(side=RIGHT, padx=6)
+        Button(actions, text="استعادة المحددة", command=restore).pack(side=RIGHT, padx=6)
+        refresh()
 
     # ---------- utilities ----------
     def clear_container(self):
+        self.live_handlers = []
         for w in self.container.winfo_children():
             w.destroy()
 
@@ -455,3 +960,4 @@ if __name__ == "__main__":
     root = Tk()
     app = DashboardApp(root)
     root.mainloop()
+    app.db.close()
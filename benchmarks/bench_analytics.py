@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+bench_analytics.py
+زمن محرك التحليلات (analytics.analyze) على ملايين الصفوف
+
+التشغيل:
+    python benchmarks/bench_analytics.py --rows 2000000
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import analytics  # noqa: E402
+from migrations import migrate  # noqa: E402
+from bench_query_plans import fill  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=2000000)
+    ap.add_argument("--chunksize", type=int, default=250000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.sqlite3"))
+        migrate(conn, target=1)
+        t0 = time.perf_counter()
+        fill(conn, args.rows)
+        print(f"generated {args.rows} sales + {args.rows} orders in {time.perf_counter() - t0:.1f}s")
+
+        for source in ("sales", "orders"):
+            t0 = time.perf_counter()
+            result = analytics.analyze(conn, source, chunksize=args.chunksize)
+            t_scan = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            top = analytics.top_products(result, 10)
+            rep = analytics.repeat_customer_stats(result)
+            daily = analytics.revenue_series(result, "day", 7)
+            monthly = analytics.revenue_series(result, "month", 3)
+            profile = analytics.hour_of_day_profile(result)
+            t_derive = time.perf_counter() - t0
+            print(f"\n[{source}] analyze: {t_scan:.2f}s ({result['rows'] / t_scan:,.0f} rows/s), derived reports: {t_derive * 1000:.0f} ms")
+            print(f"  products={len(result['products'])} customers={rep['customers']} repeat_rate={rep['repeat_rate']:.2%}")
+            print(f"  days={len(daily)} months={len(monthly)} peak hour={int(profile.idxmax())}")
+            print(f"  top product: {top.index[0]} profit={top['profit'].iloc[0]:,.0f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
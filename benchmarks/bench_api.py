@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+bench_api.py
+اختبار حمل لخادم api_server.py: الخادم في عملية منفصلة، وعملاء (نقاط بيع) متوازيون
+بخليط من القراءة والكتابة على اتصالات HTTP دائمة (keep-alive).
+يطبع الطلبات في الثانية، والطلبات لكل ثانية معالج (CPU) في الخادم = "لكل نواة"، و p50 / p95.
+
+التشغيل:
+    python benchmarks/bench_api.py --clients 8 --seconds 10 --rows 100000
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing as mp
+import os
+import random
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from bench_query_plans import fill  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+# (الوزن، الطريقة، المسار، دالة الجسم)
+MIX = [
+    (40, "GET", "/api/stats", None),
+    (25, "GET", "/api/sales?limit=50", None),
+    (10, "GET", "/api/sales?q=" + quote("عميل 12345") + "&limit=20", None),
+    (15, "POST", "/api/sales", lambda r: {"product_id": r.randint(1, 500), "quantity": r.randint(1, 3),
+                                          "customer_name": f"عميل {r.randint(1, 20000)}"}),
+    (10, "POST", "/api/orders", lambda r: {"customer": f"عميل {r.randint(1, 20000)}",
+                                           "product": f"عطر {r.randint(1, 500)}", "qty": 1}),
+]
+
+
+def client(port, deadline, seed, out):
+    rnd = random.Random(seed)
+    weights = [m[0] for m in MIX]
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    lat, errors = [], 0
+    while time.time() < deadline:
+        _, method, path, body_fn = rnd.choices(MIX, weights)[0]
+        body = json.dumps(body_fn(rnd)).encode() if body_fn else None
+        t0 = time.perf_counter()
+        conn.request(method, path, body=body, headers={"Content-Type": "application/json"} if body else {})
+        resp = conn.getresponse()
+        resp.read()
+        lat.append(time.perf_counter() - t0)
+        if resp.status >= 400:
+            errors += 1
+    conn.close()
+    out.put((lat, errors))
+
+
+def wait_ready(port, timeout=30):
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        try:
+            c = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            c.request("GET", "/api/health")
+            if c.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--rows", type=int, default=100000)
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--port", type=int, default=8799)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite3")
+        conn = sqlite3.connect(path)
+        migrate(conn)
+        fill(conn, args.rows)
+        conn.close()
+
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, "api_server.py"), "--db", path,
+                                   "--port", str(args.port), "--readers", str(args.readers), "--quiet"])
+        try:
+            wait_ready(args.port)
+            out = mp.Queue()
+            deadline = time.time() + args.seconds
+            procs = [mp.Process(target=client, args=(args.port, deadline, i, out)) for i in range(args.clients)]
+            for p in procs:
+                p.start()
+            results = [out.get() for _ in procs]
+            for p in procs:
+                p.join()
+        finally:
+            server.send_signal(signal.SIGINT)
+            # wait4 gives the CPU time of the server process alone (clients are separate children)
+            _, _, usage = os.wait4(server.pid, 0)
+            server.returncode = 0
+        server_cpu = usage.ru_utime + usage.ru_stime
+
+    lat = sorted(x for r in results for x in r[0])
+    errors = sum(r[1] for r in results)
+    total = len(lat)
+    print(f"clients {args.clients}  requests {total}  errors {errors}")
+    print(f"throughput {total / args.seconds:8.0f} req/s")
+    print(f"latency    p50 {lat[total // 2] * 1000:6.2f} ms  p95 {lat[int(total * 0.95)] * 1000:6.2f} ms")
+    print(f"server CPU {server_cpu:.1f}s -> {total / max(server_cpu, 1e-9):.0f} req/s per core")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+bench_archive.py
+نفس البيانات قبل الأرشفة وبعدها (sales_archive.py: آخر HOT_MONTHS أشهر في SQLite والباقي ملفات .npz)
+- زمن archive_due وعدد الأشهر والأسطر المنقولة
+- حجم الملف الحي بعد VACUUM وحجم مجلد الأرشيف
+- صفحة الطلبات (العدد + أول نافذة، القفز إلى المنتصف)، البحث النصي، تقرير شهر قديم وتصدير كل الصفوف
+  عبر SalesQuery في الحالتين، وإجماليات rollup_totals (يجب أن تتطابق)
+
+التشغيل:
+    python benchmarks/bench_archive.py --sales 1000000 --keep-months 3
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import sales_archive  # noqa: E402
+from db import connect  # noqa: E402
+from migrations import migrate  # noqa: E402
+from sales_rollup import rollup_totals  # noqa: E402
+from synthetic_data import generate_db  # noqa: E402
+
+COLUMNS = ("order_id", "sold_at", "product_name", "quantity", "unit_sell", "total", "net_profit",
+           "customer_name", "customer_phone")
+WINDOW = 18 + 2 * 100
+
+
+def timed(fn, repeat):
+    """أفضل زمن (مللي ثانية) من repeat مرات بعد تشغيل أول للتسخين، مع نتيجة آخر تشغيل."""
+    result = fn()
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, (time.perf_counter() - t0) * 1000)
+    return best, result
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) if os.path.isdir(path) else 0
+
+
+def operations(cur, old_month):
+    def first_window():
+        query = sales_archive.SalesQuery(COLUMNS)
+        total = query.count(cur)
+        return total, len(query.fetch(cur, ("offset", 0, WINDOW)))
+
+    def jump():
+        query = sales_archive.SalesQuery(COLUMNS)
+        total = query.count(cur)
+        return total, len(query.fetch(cur, ("offset", total // 2, WINDOW)))
+
+    def search():
+        query = sales_archive.sales_query(cur, COLUMNS, "الياسمين")
+        return query.count(cur), len(query.fetch(cur, ("offset", 0, WINDOW)))
+
+    def month():
+        query = sales_archive.sales_query(cur, COLUMNS, "", *old_month)
+        return query.count(cur), sum(len(chunk) for chunk in query.iter_rows(cur))
+
+    def export_all():
+        query = sales_archive.SalesQuery(COLUMNS)
+        return query.count(cur), sum(len(chunk) for chunk in query.iter_rows(cur, key=False))
+
+    return [("orders: count + first window", first_window), ("orders: jump to middle", jump),
+            ("reports: text search", search), ("reports: old month (all rows)", month),
+            ("export: all rows", export_all), ("dashboard: rollup_totals", lambda: rollup_totals(cur))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sales", type=int, default=500000)
+    ap.add_argument("--years", type=float, default=3)
+    ap.add_argument("--keep-months", type=int, default=3)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=11)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        hot = os.path.join(tmp, "hot", "store.sqlite3")
+        cold = os.path.join(tmp, "cold", "store.sqlite3")
+        os.makedirs(os.path.dirname(hot))
+        os.makedirs(os.path.dirname(cold))
+        t0 = time.perf_counter()
+        info = generate_db(cold, args.sales, years=args.years, seed=args.seed)
+        print(f"{info['sales']} sales in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+        conn = connect(cold)
+        migrate(conn)
+        conn.close()
+        shutil.copy(cold, hot)
+        # a month from the middle of the data, so it is archived in the second copy
+        first = date.fromisoformat(info["first_day"])
+        mid = first + (date.fromisoformat(info["last_day"]) - first) / 2
+        start = mid.replace(day=1)
+        old_month = (start.isoformat(), ((start + timedelta(days=32)).replace(day=1) - timedelta(days=1)).isoformat())
+
+        conn = connect(hot)
+        t0 = time.perf_counter()
+        done = []
+        sales_archive.archive_due(conn, args.keep_months, progress=done.append)
+        archive_s = time.perf_counter() - t0
+        print(f"archive_due: {len(done)} months, {sum(m['rows'] for m in done)} lines in {archive_s:.1f}s",
+              file=sys.stderr)
+        conn.execute("VACUUM")
+        conn.close()
+        conn = connect(cold)
+        conn.execute("VACUUM")
+        conn.close()
+
+        print(f"{'':36s} {'all in SQLite':>16s} {'archived':>16s}")
+        print(f"{'SQLite file (MB)':36s} {os.path.getsize(cold) / 2**20:16.1f} {os.path.getsize(hot) / 2**20:16.1f}")
+        archive_mb = dir_size(os.path.join(os.path.dirname(hot), sales_archive.ARCHIVE_DIR)) / 2**20
+        print(f"{'archive folder (MB)':36s} {0:16.1f} {archive_mb:16.1f}")
+        conns = [connect(cold, readonly=True), connect(hot, readonly=True)]
+        ops = [operations(c.cursor(), old_month) for c in conns]
+        for (name, before), (_name, after) in zip(*ops):
+            (ms_a, res_a), (ms_b, res_b) = timed(before, args.repeat), timed(after, args.repeat)
+            flag = "" if res_a == res_b else f"  MISMATCH {res_a} != {res_b}"
+            print(f"{name:36s} {ms_a:13.2f} ms {ms_b:13.2f} ms{flag}")
+        for c in conns:
+            c.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+bench_backup.py
+النسخ الاحتياطي أثناء العمل (backup.py) على قاعدة كبيرة مع كاتب مستمر (طلب كل commit كما في نقطة البيع)
+- زمن كتابة الطلب (p50 / p99 / الأقصى) بدون نسخ ثم أثناء create_backup: أقصى توقف للكاتب
+- سرعة النسخ (MB/s) والضغط، حجم اللقطة، زمن verify_backup و restore_backup
+- restore_backup فوق الملف الحي والكاتب يعمل: الكتابة متوقفة طوال النسخ (أقصى انتظار وعدد الطلبات الفاشلة)
+- SQLite backup بدون معاملة القراءة: يعيد النسخ من الأول بعد كل commit (يتوقف هنا بعد --restarts مرات)
+
+التشغيل (3 ملايين سطر ≈ 2 GB):
+    python benchmarks/bench_backup.py --sales 3000000
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import backup  # noqa: E402
+import services  # noqa: E402
+from db import connect, run_in_transaction  # noqa: E402
+from migrations import migrate  # noqa: E402
+from synthetic_data import generate_db  # noqa: E402
+
+
+class Writer(threading.Thread):
+    """يسجل طلباً في كل معاملة ويحفظ زمن كل واحدة (مللي ثانية)."""
+
+    def __init__(self, path, pause=0.005):
+        super().__init__(daemon=True)
+        self.path, self.pause = path, pause
+        self.stop = threading.Event()
+        self.samples = []
+        self.failed = 0
+
+    def run(self):
+        conn = connect(self.path)
+        cur = conn.cursor()
+        cur.execute("SELECT name FROM products ORDER BY id LIMIT 1")
+        product = cur.fetchone()[0]
+        while not self.stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                run_in_transaction(conn, lambda c: services.add_order(c, "عميل تجريبي", product, 1))
+            except sqlite3.OperationalError:   # still locked after busy_timeout and the retries
+                self.failed += 1
+            self.samples.append((time.perf_counter() - t0) * 1000)
+            time.sleep(self.pause)
+        conn.close()
+
+
+def stats(samples):
+    s = sorted(samples.samples)
+    failed = f"  failed {samples.failed}" if samples.failed else ""
+    return f"{len(s):6d} writes{failed}  p50 {s[len(s) // 2]:7.2f}  p99 {s[int(len(s) * 0.99) - 1]:7.2f}  max {s[-1]:7.2f} ms"
+
+
+def while_writing(path, fn, seconds=None):
+    writer = Writer(path)
+    writer.start()
+    time.sleep(0.5)
+    t0 = time.perf_counter()
+    result = fn() if fn else time.sleep(seconds)
+    elapsed = time.perf_counter() - t0
+    writer.stop.set()
+    writer.join()
+    return result, elapsed, writer
+
+
+def plain_backup_restarts(path, dest, limit):
+    """SQLite backup على دفعات بدون معاملة قراءة: يعد مرات إعادة البدء حتى limit."""
+    restarts, last = [0], [None]
+
+    class Restarted(Exception):
+        pass
+
+    def progress(status, remaining, total):
+        if last[0] is not None and remaining > last[0]:
+            restarts[0] += 1
+            if restarts[0] >= limit:
+                raise Restarted()
+        last[0] = remaining
+    src, dst = sqlite3.connect(path), sqlite3.connect(dest)
+    try:
+        src.backup(dst, pages=backup.STEP_PAGES, progress=progress, sleep=backup.STEP_SLEEP)
+        done = True
+    except Restarted:
+        done = False
+    finally:
+        src.close()
+        dst.close()
+    return done, restarts[0]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sales", type=int, default=3000000)
+    ap.add_argument("--db", help="قاعدة موجودة بدلاً من توليد واحدة (تُنسخ إلى مجلد مؤقت)")
+    ap.add_argument("--restarts", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "store.sqlite3")
+        t0 = time.perf_counter()
+        if args.db:
+            src, dst = sqlite3.connect(args.db), sqlite3.connect(path)
+            src.backup(dst)
+            src.close()
+            dst.close()
+        else:
+            generate_db(path, args.sales, years=3)
+        conn = connect(path)
+        migrate(conn)
+        conn.close()
+        mb = os.path.getsize(path) / 2**20
+        print(f"database {mb:.0f} MB ready in {time.perf_counter() - t0:.0f}s", file=sys.stderr)
+
+        _r, idle_s, idle = while_writing(path, None, seconds=5)
+        print(f"{'writer, no backup':34s} {stats(idle)}")
+
+        dest = os.path.join(tmp, "backups")
+        m, backup_s, during = while_writing(path, lambda: backup.create_backup(path, dest))
+        print(f"{'writer, during create_backup':34s} {stats(during)}")
+        print(f"{'create_backup':34s} {backup_s:8.1f} s  copy {m['copy_s']:.1f} s "
+              f"({m['db_bytes'] / 2**20 / max(m['copy_s'], 1e-3):.0f} MB/s), "
+              f"total {m['db_bytes'] / 2**20 / max(m['total_s'], 1e-3):.0f} MB/s, "
+              f"{m['db_bytes'] / 2**20:.0f} MB -> {m['bytes'] / 2**20:.0f} MB")
+
+        t0 = time.perf_counter()
+        check = backup.verify_backup(m["path"])
+        print(f"{'verify_backup':34s} {time.perf_counter() - t0:8.1f} s  {'OK' if check['ok'] else check['problems']}")
+
+        restored = os.path.join(tmp, "restored", "store.sqlite3")
+        os.makedirs(os.path.dirname(restored))
+        t0 = time.perf_counter()
+        backup.restore_backup(m["path"], restored, safety=False)
+        print(f"{'restore_backup (new file)':34s} {time.perf_counter() - t0:8.1f} s")
+        t0 = time.perf_counter()
+        backup.restore_backup(m["path"], restored, safety=False)
+        print(f"{'restore_backup (over existing)':34s} {time.perf_counter() - t0:8.1f} s")
+
+        # over the live file with a writer running: the write lock is held for the whole copy
+        _r, live_s, during = while_writing(path, lambda: backup.restore_backup(m["path"], path, safety=False))
+        print(f"{'writer, during restore_backup':34s} {stats(during)}")
+        print(f"{'restore_backup (live file)':34s} {live_s:8.1f} s")
+        a, b = connect(path, readonly=True), connect(restored, readonly=True)
+        same = (b.execute("SELECT COUNT(*) FROM order_lines").fetchone()[0]
+                <= a.execute("SELECT COUNT(*) FROM order_lines").fetchone()[0])
+        print(f"{'restored rows <= live rows':34s} {'OK' if same else 'MISMATCH'}")
+        a.close()
+        b.close()
+
+        (done, restarts), plain_s, _w = while_writing(
+            path, lambda: plain_backup_restarts(path, os.path.join(tmp, "plain.sqlite3"), args.restarts))
+        print(f"{'backup without read snapshot':34s} {plain_s:8.1f} s  "
+              f"{'finished' if done else 'gave up'} after {restarts} restarts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+bench_concurrency.py
+اختبار ضغط للتزامن على store.sqlite3: N عملية كتابة (add_order) + M thread قراءة (أرقام لوحة التحكم)
+يقارن الاتصال القديم (sqlite3.connect + journal_mode=DELETE) بمصنع الاتصالات db.py (WAL + retry)
+ويطبع عدد العمليات في الثانية وأخطاء "database is locked" وزمن الكتابة p50 / p95.
+
+التشغيل:
+    python benchmarks/bench_concurrency.py --writers 4 --readers 4 --seconds 10
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import services  # noqa: E402
+from bench_query_plans import fill  # noqa: E402
+from db import connect, is_locked_error, run_in_transaction  # noqa: E402
+from migrations import migrate  # noqa: E402
+from sales_rollup import rollup_totals  # noqa: E402
+
+
+def _open(path, mode, readonly=False):
+    if mode == "wal":
+        return connect(path, readonly=readonly)
+    return sqlite3.connect(path)  # what both apps did before db.py
+
+
+def _add_order(conn, mode, n):
+    # the same services.add_order as the Streamlit app
+    args = (f"عميل {n % 20000 + 1}", f"عطر {n % 500 + 1}", 1, 80.0)
+    if mode == "wal":
+        run_in_transaction(conn, lambda cur: services.add_order(cur, *args))
+    else:
+        try:
+            services.add_order(conn.cursor(), *args)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def writer(path, mode, deadline, out):
+    conn = _open(path, mode)
+    ops, errors, lat = 0, 0, []
+    n = os.getpid() * 1000
+    while time.time() < deadline:
+        t0 = time.perf_counter()
+        try:
+            _add_order(conn, mode, n)
+            ops += 1
+            lat.append(time.perf_counter() - t0)
+        except sqlite3.OperationalError as e:
+            if not is_locked_error(e):
+                raise
+            errors += 1
+        n += 1
+    conn.close()
+    out.put((ops, errors, lat))
+
+
+def reader(path, mode, deadline, results):
+    conn = _open(path, mode, readonly=True)
+    cur = conn.cursor()
+    ops, errors = 0, 0
+    while time.time() < deadline:
+        try:
+            services.order_stats(cur)
+            rollup_totals(cur)
+            ops += 1
+        except sqlite3.OperationalError as e:
+            if not is_locked_error(e):
+                raise
+            errors += 1
+    conn.close()
+    results.append((ops, errors))
+
+
+def run(mode, args, tmp):
+    path = os.path.join(tmp, f"{mode}.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = " + ("WAL" if mode == "wal" else "DELETE"))
+    migrate(conn)
+    fill(conn, args.rows)
+    conn.close()
+
+    deadline = time.time() + args.seconds
+    out = mp.Queue()
+    procs = [mp.Process(target=writer, args=(path, mode, deadline, out)) for _ in range(args.writers)]
+    read_results = []
+    threads = [threading.Thread(target=reader, args=(path, mode, deadline, read_results)) for _ in range(args.readers)]
+    for p in procs:
+        p.start()
+    for t in threads:
+        t.start()
+    writes = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    for t in threads:
+        t.join()
+
+    w_ops = sum(w[0] for w in writes)
+    w_err = sum(w[1] for w in writes)
+    lat = sorted(x for w in writes for x in w[2]) or [0.0]
+    r_ops = sum(r[0] for r in read_results)
+    r_err = sum(r[1] for r in read_results)
+    print(f"{mode:6s} writes {w_ops / args.seconds:8.1f}/s  locked {w_err:5d}  "
+          f"p50 {lat[len(lat) // 2] * 1000:7.1f} ms  p95 {lat[int(len(lat) * 0.95)] * 1000:7.1f} ms | "
+          f"reads {r_ops / args.seconds:8.1f}/s  locked {r_err:5d}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--rows", type=int, default=50000, help="sales / orders rows before the run")
+    ap.add_argument("--mode", choices=["legacy", "wal", "both"], default="both")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in (["legacy", "wal"] if args.mode == "both" else [args.mode]):
+            run(mode, args, tmp)
+
+
+if __name__ == "__main__":
+    main()
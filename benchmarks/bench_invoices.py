@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+bench_invoices.py
+سرعة رسم الفواتير (فاتورة / ثانية) في عملية واحدة مع تشكيل النص العربي (arabic_text)
+- plain: خط Helvetica بدون تشكيل (السلوك القديم، النص العربي غير مقروء)
+- shaped, no cache: خط TTF + تشكيل كل سطر من جديد
+- shaped, cached: خط TTF + تشكيل مع الذاكرة المؤقتة (الوضع الفعلي)
+ثم قالب الفاتورة: الأجزاء الثابتة تُرسم في كل صفحة (no template) مقابل form XObject واحد للملف
+(template)، مع حجم الملف، وفواتير من عدة أصناف (--items).
+
+التشغيل:
+    python benchmarks/bench_invoices.py --invoices 2000 --customers 300 --items 5
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import arabic_text  # noqa: E402
+import invoices  # noqa: E402
+from invoices import draw_invoice, draw_sale_invoice  # noqa: E402
+from reportlab.lib.pagesizes import A4  # noqa: E402
+from reportlab.pdfgen import canvas  # noqa: E402
+
+
+def sample_rows(n, customers, products, seed=7):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        c = rnd.randint(1, customers)
+        p = rnd.randint(1, products)
+        q = rnd.randint(1, 3)
+        rows.append({"id": i + 1, "sold_at": f"2025-03-{i % 28 + 1:02d} 12:00:00", "product_id": p,
+                     "product_name": f"عطر الياسمين رقم {p}", "quantity": q, "unit_sell": 80.0, "total": 80.0 * q,
+                     "cost_total": 50.0 * q, "net_profit": 30.0 * q, "customer_name": f"العميلة نور {c}",
+                     "customer_phone": f"0100{c:06d}", "customer_address": f"شارع النصر {c % 40} — القاهرة",
+                     "image_path": None})
+    return rows
+
+
+def render(rows):
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    t0 = time.perf_counter()
+    for row in rows:
+        draw_sale_invoice(c, row)
+        c.showPage()
+    c.save()
+    return time.perf_counter() - t0, len(buf.getvalue())
+
+
+def render_multi(rows, items):
+    """فاتورة لكل items صفوف متتالية (نفس العميل)."""
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    t0 = time.perf_counter()
+    for i in range(0, len(rows), items):
+        draw_invoice(c, rows[i], rows[i:i + items])
+        c.showPage()
+    c.save()
+    return time.perf_counter() - t0, len(buf.getvalue())
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--invoices", type=int, default=2000)
+    ap.add_argument("--customers", type=int, default=300)
+    ap.add_argument("--products", type=int, default=50)
+    ap.add_argument("--items", type=int, default=5, help="أصناف الفاتورة في قياس الفواتير متعددة الأصناف")
+    args = ap.parse_args()
+    rows = sample_rows(args.invoices, args.customers, args.products)
+
+    t0 = time.perf_counter()
+    fonts = arabic_text.register_fonts()
+    print(f"register_fonts: {fonts[0]} in {(time.perf_counter() - t0) * 1000:.0f} ms (once per process)")
+    if not arabic_text.SHAPING_AVAILABLE:
+        print("arabic_reshaper / python-bidi not installed: shaping is a no-op")
+
+    cached_shape = arabic_text._shape
+    modes = [
+        ("plain", ("Helvetica", "Helvetica-Bold"), False, cached_shape),
+        ("shaped, no cache", fonts, True, cached_shape.__wrapped__),
+        ("shaped, cached", fonts, True, cached_shape),
+    ]
+    shaping = arabic_text.SHAPING_AVAILABLE
+    for name, mode_fonts, shape_on, shape_fn in modes:
+        arabic_text._fonts = mode_fonts
+        arabic_text.SHAPING_AVAILABLE = shaping and shape_on
+        arabic_text._shape = shape_fn
+        cached_shape.cache_clear()
+        secs, size = render(rows)
+        print(f"{name:18s} {len(rows) / secs:8.0f} invoices/s  ({secs:.2f}s, {size / 1024:.0f} KB)")
+    arabic_text._fonts, arabic_text.SHAPING_AVAILABLE, arabic_text._shape = fonts, shaping, cached_shape
+
+    print("template:")
+    for name, use_template in [("no template", False), ("template", True)]:
+        invoices.USE_TEMPLATE = use_template
+        secs, size = render(rows)
+        print(f"  {name:16s} {len(rows) / secs:8.0f} invoices/s  ({secs:.2f}s, {size / len(rows):.0f} bytes/invoice)")
+        secs, size = render_multi(rows, args.items)
+        n = -(-len(rows) // args.items)
+        print(f"  {'':16s} {n / secs:8.0f} invoices/s with {args.items} items ({size / n:.0f} bytes/invoice)")
+    invoices.USE_TEMPLATE = True
+    info = cached_shape.cache_info()
+    print(f"shape cache: {info.hits} hits / {info.misses} misses ({info.hits / max(info.hits + info.misses, 1):.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+bench_lookup.py
+الإكمال التلقائي للمنتج والعميل: فهرس lookup.py في الذاكرة مقابل الطريقة السابقة
+- السابق: تحميل كل المنتجات في pandas ثم قناع (mask) على الاسم لكل طلب (صفحة الطلبات في Streamlit)،
+  و LIKE 'بادئة%' على customers (لا يستفيد من فهرس: الاسم يحتاج توحيد الحروف العربية)
+- الفهرس: زمن أول تحميل، ثم زمن البحث (متوسط / p99) لبادئات عشوائية من الأسماء والهواتف،
+  و refresh بعد add_product / add_order (يقرأ المتغير فقط)
+- النتائج يجب أن تتطابق مع بحث خطي على نفس المفاتيح
+
+التشغيل:
+    python benchmarks/bench_lookup.py --products 50000 --customers 500000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import lookup  # noqa: E402
+import services  # noqa: E402
+from db import connect, run_in_transaction  # noqa: E402
+from synthetic_data import generate_db  # noqa: E402
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return sum(samples) / len(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def prefixes(rnd, values, n, key):
+    out = []
+    for v in rnd.sample(values, n):
+        k = key(v)
+        out.append(v[:max(2, rnd.randint(2, len(k)))] if k else v)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--products", type=int, default=50000)
+    ap.add_argument("--customers", type=int, default=500000)
+    ap.add_argument("--sales", type=int, default=20000)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=11)
+    args = ap.parse_args()
+    rnd = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "store.sqlite3")
+        t0 = time.perf_counter()
+        generate_db(path, args.sales, products=args.products, customers=args.customers, years=1, seed=args.seed)
+        print(f"{args.products} products, {args.customers} customers in {time.perf_counter() - t0:.1f}s",
+              file=sys.stderr)
+        conn = connect(path)
+        cur = connect(path, readonly=True).cursor()
+        names = [r[0] for r in cur.execute("SELECT name FROM products")]
+        customers = cur.execute("SELECT name, phone FROM customers").fetchall()
+        product_q = prefixes(rnd, names, args.queries, lookup.name_key)
+        name_q = prefixes(rnd, [c[0] for c in customers], args.queries, lookup.name_key)
+        phone_q = [p[:rnd.randint(4, len(p))] for _, p in rnd.sample(customers, args.queries)]
+
+        # ---------- السابق ----------
+        import pandas as pd
+        t0 = time.perf_counter()
+        df = pd.read_sql_query("SELECT * FROM products", cur.connection)
+        load_df = (time.perf_counter() - t0) * 1000
+        pick = rnd.sample(names, 50)
+        t0 = time.perf_counter()
+        for name in pick:
+            float(df.loc[df["name"] == name, "price"].values[0])
+        mask_ms = (time.perf_counter() - t0) * 1000 / len(pick)
+        t0 = time.perf_counter()
+        for q in name_q[:20]:
+            cur.execute("SELECT id FROM customers WHERE name LIKE ? LIMIT 10", (q + "%",)).fetchall()
+        like_ms = (time.perf_counter() - t0) * 1000 / 20
+
+        # ---------- الفهرس ----------
+        idx = lookup.index_for(cur)
+        t0 = time.perf_counter()
+        idx.refresh(cur)
+        load_ms = (time.perf_counter() - t0) * 1000
+        sizes = idx.sizes()
+        rows = []
+        for label, fn, queries in (("products by name", idx.products, product_q),
+                                   ("customers by name", idx.customers, name_q),
+                                   ("customers by phone", idx.customers, phone_q)):
+            samples = []
+            for q in queries:
+                t0 = time.perf_counter()
+                fn(q)
+                samples.append((time.perf_counter() - t0) * 1000)
+            rows.append((label, *percentiles(samples)))
+        samples = []
+        for q in product_q[:500]:
+            t0 = time.perf_counter()
+            services.search_products(cur, q)   # refresh (nothing changed) + lookup
+            samples.append((time.perf_counter() - t0) * 1000)
+        rows.append(("search_products (refresh + lookup)", *percentiles(samples)))
+
+        # linear scan on the same keys, to check the results
+        keys = sorted((lookup.name_key(c[0]), i) for i, c in idx._customers.items())
+        bad = 0
+        for q in name_q[:50]:
+            k = lookup.name_key(q)
+            if [i for key, i in keys if key.startswith(k)][:10] != [c["id"] for c in idx.customers(q)]:
+                bad += 1
+
+        # ---------- التحديث ----------
+        t0 = time.perf_counter()
+        for i in range(100):
+            run_in_transaction(conn, lambda c: services.add_product(c, f"منتج تجريبي {i}", price=10))
+            run_in_transaction(conn, lambda c: services.add_order(c, f"عميل جديد {i}", names[i], 1))
+        write_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        changed = idx.refresh(cur)
+        refresh_ms = (time.perf_counter() - t0) * 1000
+        visible = len(idx.products("منتج تجريبي", 200)) == 100 and len(idx.customers("عميل جديد", 200)) == 100
+
+        print(f"{'before: load products into pandas':40s} {load_df:10.1f} ms")
+        print(f"{'before: price by pandas mask':40s} {mask_ms:10.3f} ms / order")
+        print(f"{'before: customers LIKE prefix%':40s} {like_ms:10.3f} ms / query")
+        print(f"{'index: first load':40s} {load_ms:10.1f} ms  {sizes}")
+        for label, avg, p99 in rows:
+            print(f"{'index: ' + label:40s} {avg:10.4f} ms avg {p99:10.4f} ms p99")
+        print(f"{'index: refresh after 100+100 writes':40s} {refresh_ms:10.2f} ms ({changed} rows, "
+              f"writes {write_ms:.0f} ms) {'OK' if visible else 'MISSING'}")
+        print(f"{'results vs linear scan':40s} {'OK' if not bad else f'{bad} MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+bench_order_model.py
+النموذج القديم (صف لكل صنف في sales مع نسخ بيانات العميل واسم المنتج) مقابل
+النموذج الموحد بعد الترحيل 6 (customers / orders / order_lines + VIEW sales)
+- حجم قاعدة البيانات بعد VACUUM وحجم الجداول والفهارس (dbstat)
+- زمن الترحيل من النسخة 5
+- زمن استعلامات صفحة الطلبات والتقارير ولوحة التحكم على نفس البيانات
+
+التشغيل:
+    python benchmarks/bench_order_model.py --baskets 200000 --max-items 5
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import analytics  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+STREETS = ["شارع النصر", "شارع الجمهورية", "شارع التحرير", "طريق الكورنيش", "شارع الهرم"]
+CITIES = ["القاهرة", "الجيزة", "الإسكندرية", "المنصورة", "طنطا"]
+
+# (العنوان، الاستعلام في v5، الاستعلام في v6) — المعاملات من البيانات المولدة في main
+QUERIES = [
+    ("orders page: first window",
+     "SELECT id, sold_at, product_name, quantity, unit_sell, total, net_profit, customer_name, customer_phone "
+     "FROM sales ORDER BY id DESC LIMIT 100",
+     "SELECT id, order_id, sold_at, product_name, quantity, unit_sell, total, net_profit, customer_name, customer_phone "
+     "FROM sales ORDER BY id DESC LIMIT 100"),
+    ("orders page: deep keyset window",
+     "SELECT id, sold_at, product_name, total, customer_name FROM sales WHERE id < ? ORDER BY id DESC LIMIT 100",
+     "SELECT id, sold_at, product_name, total, customer_name FROM sales WHERE id < ? ORDER BY id DESC LIMIT 100"),
+    ("customer history",
+     "SELECT COUNT(*), SUM(total) FROM sales WHERE customer_name = ? AND customer_phone = ?",
+     "SELECT COUNT(*), SUM(total) FROM sales WHERE customer_id = "
+     "(SELECT id FROM customers WHERE name = ? AND phone = ?)"),
+    ("reports: month total",
+     "SELECT COUNT(*), SUM(total) FROM sales WHERE sold_at >= ? AND sold_at < ?",
+     "SELECT COUNT(*), SUM(total) FROM sales WHERE sold_at >= ? AND sold_at < ?"),
+    ("orders per customer",
+     "SELECT COUNT(DISTINCT customer_name || customer_phone || sold_at) FROM sales",
+     "SELECT COUNT(*) FROM orders"),
+]
+
+
+def generate(baskets, max_items, customers, products, seed=11):
+    """سلال عشوائية: [(sold_at, (name, phone, address), [(product_id, qty)])] على 3 سنوات."""
+    rnd = random.Random(seed)
+    people = [(f"العميلة {rnd.choice(['نور', 'سارة', 'منى', 'هدى', 'ريم'])} {k}", f"010{k:08d}",
+               f"{rnd.choice(STREETS)} {rnd.randint(1, 200)} — {rnd.choice(CITIES)}") for k in range(customers)]
+    start, step = datetime(2023, 1, 1), 3 * 365 * 24 * 3600 / max(baskets, 1)
+    out = []
+    for i in range(baskets):
+        when = (start + timedelta(seconds=int(i * step))).strftime("%Y-%m-%d %H:%M:%S")
+        items = [(rnd.randint(1, products), rnd.randint(1, 3)) for _ in range(rnd.randint(1, max_items))]
+        out.append((when, rnd.choice(people), items))
+    return out
+
+
+def build_v5(path, data, products):
+    conn = sqlite3.connect(path)
+    migrate(conn, target=5)
+    conn.executemany("INSERT INTO products (name, qty, cost_price, sell_price, price, quantity) VALUES (?,?,?,?,?,?)",
+                     [(f"عطر الياسمين الفاخر {i}", 1000, 50.0, 80.0, 80.0, 1000) for i in range(1, products + 1)])
+    rows = [(when, pid, f"عطر الياسمين الفاخر {pid}", q, 80.0, 50.0, 80.0 * q, 50.0 * q, 30.0 * q) + person
+            for when, person, items in data for pid, q in items]
+    conn.executemany("""INSERT INTO sales (sold_at, product_id, product_name, quantity, unit_sell, unit_cost, total,
+                        cost_total, net_profit, customer_name, customer_phone, customer_address)
+                        VALUES (?,?,?,?,?,?,?,?,?,?,?,?)""", rows)
+    conn.commit()
+    return conn, len(rows)
+
+
+def sizes(path):
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    objects = {name: size for name, size in conn.execute(
+        "SELECT name, SUM(pgsize) FROM dbstat GROUP BY name ORDER BY 2 DESC")}
+    conn.close()
+    return os.path.getsize(path), objects
+
+
+def timed(conn, sql, params, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def run_queries(conn, version, params, repeat):
+    result = [timed(conn, q[1 if version == 5 else 2], params[q[0]], repeat) for q in QUERIES]
+    t0 = time.perf_counter()
+    analytics.analyze(conn, "sales")
+    result.append((time.perf_counter() - t0) * 1000)
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--baskets", type=int, default=200000)
+    ap.add_argument("--max-items", type=int, default=5)
+    ap.add_argument("--customers", type=int, default=20000)
+    ap.add_argument("--products", type=int, default=500)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    data = generate(args.baskets, args.max_items, args.customers, args.products)
+    with tempfile.TemporaryDirectory() as tmp:
+        v5, v6 = os.path.join(tmp, "v5.sqlite3"), os.path.join(tmp, "v6.sqlite3")
+        conn, lines = build_v5(v5, data, args.products)
+        conn.close()
+        print(f"{args.baskets} baskets, {lines} lines ({lines / args.baskets:.1f} items/basket), {args.customers} customers")
+        shutil.copy(v5, v6)
+        conn = sqlite3.connect(v6)
+        t0 = time.perf_counter()
+        migrate(conn)
+        print(f"migration 5 -> 6: {time.perf_counter() - t0:.1f}s\n")
+        conn.close()
+
+        (size5, obj5), (size6, obj6) = sizes(v5), sizes(v6)
+        print(f"database size  v5 {size5 / 2**20:8.1f} MB   v6 {size6 / 2**20:8.1f} MB   ({1 - size6 / size5:.0%} smaller)")
+        rows5 = sum(v for k, v in obj5.items() if k == "sales" or k.startswith("idx_sales"))
+        rows6 = sum(v for k, v in obj6.items() if k in ("orders", "order_lines", "customers")
+                    or k.startswith(("idx_orders", "idx_order_lines", "idx_customers")))
+        print(f"order data     v5 {rows5 / 2**20:8.1f} MB   v6 {rows6 / 2**20:8.1f} MB   ({1 - rows6 / rows5:.0%} smaller)")
+        print("  v6:", ", ".join(f"{k} {obj6[k] / 2**20:.1f} MB" for k in ("order_lines", "orders", "customers")), "\n")
+
+        mid = lines // 2
+        person = data[len(data) // 3][1]
+        params = {q[0]: () for q in QUERIES}
+        params["orders page: deep keyset window"] = (mid,)
+        params["customer history"] = person[:2]
+        params["reports: month total"] = ("2025-03-01", "2025-04-01")
+        timings = {}
+        for version, path in ((5, v5), (6, v6)):
+            conn = sqlite3.connect(path)
+            for q in QUERIES:  # warm the page cache
+                conn.execute(q[1 if version == 5 else 2], params[q[0]]).fetchall()
+            timings[version] = run_queries(conn, version, params, args.repeat)
+            conn.close()
+
+    for title, t5, t6 in zip([q[0] for q in QUERIES] + ["analytics.analyze (full scan)"], timings[5], timings[6]):
+        print(f"{title:32s} v5 {t5:9.2f} ms   v6 {t6:9.2f} ms   x{t5 / max(t6, 1e-6):.1f}")
+
+
+if __name__ == "__main__":
+    main()
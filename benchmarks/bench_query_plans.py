@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+bench_query_plans.py
+مقارنة خطة التنفيذ (EXPLAIN QUERY PLAN) وزمن الاستعلامات قبل وبعد فهارس migrations.py
+
+التشغيل:
+    python benchmarks/bench_query_plans.py --rows 300000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from migrations import migrate  # noqa: E402
+from sales_rollup import is_view  # noqa: E402
+
+# (العنوان، الاستعلام قبل، الاستعلام بعد، المعاملات قبل، المعاملات بعد)
+QUERIES = [
+    ("reports: date range",
+     "SELECT COUNT(*), SUM(total) FROM sales WHERE date(sold_at) >= date(?) AND date(sold_at) <= date(?)",
+     "SELECT COUNT(*), SUM(total) FROM sales WHERE sold_at >= ? AND sold_at < ?",
+     ("2025-03-01", "2025-03-31"), ("2025-03-01", "2025-04-01")),
+    ("dashboard: today",
+     "SELECT COUNT(*), SUM(total) FROM sales WHERE date(sold_at) = ?",
+     "SELECT ops, revenue FROM sales_daily WHERE day = ?",
+     ("2025-03-15",), ("2025-03-15",)),
+    ("sales by product_id",
+     "SELECT COUNT(*) FROM sales WHERE product_id = ?",
+     "SELECT COUNT(*) FROM sales WHERE product_id = ?",
+     (42,), (42,)),
+    ("add_order: products by name",
+     "SELECT id FROM products WHERE name = ?",
+     "SELECT id FROM products WHERE name = ?",
+     ("عطر 42",), ("عطر 42",)),
+    ("orders: date range",
+     "SELECT COUNT(*) FROM orders WHERE date >= ? AND date < ?",
+     "SELECT COUNT(*) FROM orders WHERE sold_at >= ? AND sold_at < ?",
+     ("2025-03-01", "2025-04-01"), ("2025-03-01", "2025-04-01")),
+]
+
+
+def fill(conn, rows, products=500, seed=7, batch=100000):
+    """
+    بيانات تجريبية: sales و orders بنفس عدد الصفوف موزعة على 3 سنوات (تُدرج على دفعات).
+    قبل الترحيل 6 في جدولي sales و orders القديمين، وبعده في customers / orders / order_lines
+    (طلب من صنف واحد لكل صف).
+    """
+    rnd = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    span = 3 * 365 * 24 * 3600
+    conn.executemany("INSERT INTO products (name, qty, cost_price, sell_price, price, quantity) VALUES (?,?,?,?,?,?)",
+                     [(f"عطر {i}", 100, 50.0, 80.0, 80.0, 100) for i in range(1, products + 1)])
+    normalized = is_view(conn.cursor(), "sales")
+    if normalized:
+        conn.executemany("INSERT OR IGNORE INTO customers (id, name, phone, address) VALUES (?, ?, '0100', 'القاهرة')",
+                         [(k, f"عميل {k}") for k in range(1, 20001)])
+        next_id = conn.execute("SELECT IFNULL(MAX(id), 0) + 1 FROM orders").fetchone()[0]
+    step = span / max(rows, 1)
+    for first in range(0, rows, batch):
+        generated = []
+        for i in range(first, min(first + batch, rows)):
+            ts = start + timedelta(seconds=int(i * step + rnd.random() * step))
+            generated.append((ts.strftime("%Y-%m-%d %H:%M:%S"), rnd.randint(1, products), rnd.randint(1, 3),
+                              rnd.randint(1, 20000), rnd.randint(1, 20000)))
+        if normalized:
+            heads, lines = [], []
+            for when, pid, q, sale_customer, order_customer in generated:
+                for customer, sold_at in ((sale_customer, when), (order_customer, when[:16])):
+                    heads.append((next_id, customer, sold_at))
+                    lines.append((next_id, pid, q, 80.0, 50.0, 80.0 * q))
+                    next_id += 1
+            conn.executemany("INSERT INTO orders (id, customer_id, sold_at) VALUES (?,?,?)", heads)
+            conn.executemany("""INSERT INTO order_lines (order_id, product_id, quantity, unit_sell, unit_cost, total)
+                                VALUES (?,?,?,?,?,?)""", lines)
+            continue
+        conn.executemany("""INSERT INTO sales (sold_at, product_id, product_name, quantity, unit_sell, unit_cost, total,
+                            cost_total, net_profit, customer_name, customer_phone, customer_address) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)""",
+                         [(when, pid, f"عطر {pid}", q, 80.0, 50.0, 80.0 * q, 50.0 * q, 30.0 * q, f"عميل {c}", "0100", "القاهرة")
+                          for when, pid, q, c, _ in generated])
+        conn.executemany("INSERT INTO orders (customer, product, qty, total, date) VALUES (?,?,?,?,?)",
+                         [(f"عميل {c}", f"عطر {pid}", q, 80.0 * q, when[:16]) for when, pid, q, _, c in generated])
+    conn.commit()
+
+
+def run(conn, sql, params, repeat):
+    plan = " | ".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(sql, params).fetchall()
+    return plan, (time.perf_counter() - t0) / repeat * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=300000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.sqlite3"))
+        migrate(conn, target=1)
+        fill(conn, args.rows)
+        before = [run(conn, q[1], q[3], args.repeat) for q in QUERIES]
+        t0 = time.perf_counter()
+        migrate(conn)
+        print(f"migrate(): {time.perf_counter() - t0:.2f}s for {args.rows} sales rows\n")
+        after = [run(conn, q[2], q[4], args.repeat) for q in QUERIES]
+        conn.close()
+
+    for q, (plan_b, ms_b), (plan_a, ms_a) in zip(QUERIES, before, after):
+        print(q[0])
+        print(f"  before {ms_b:9.2f} ms  {plan_b}")
+        print(f"  after  {ms_a:9.2f} ms  {plan_a}")
+        print(f"  speedup x{ms_b / max(ms_a, 1e-6):.0f}\n")
+
+
+if __name__ == "__main__":
+    main()
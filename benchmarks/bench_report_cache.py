@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+bench_report_cache.py
+ملفات التقارير الجاهزة (report_cache.py): تصدير Excel للطلبات كما في صفحة التقارير (SalesQuery + stream_rows_to_xlsx)
+- أول طلب (بناء) مقابل الطلب التالي لنفس الفلاتر (الملف الجاهز) لأمس / الشهر حتى اليوم / الشهر الماضي / سنة
+- زمن data_stamp وحده (يُحسب في كل طلب)
+- بعد بيع اليوم: الشهر الماضي يبقى جاهزاً والشهر حتى اليوم يُبنى من جديد؛ تعديل عميل يُبطل الكل
+- prebuild (البناء الليلي) والحذف عند تجاوز MAX_FILES
+
+التشغيل:
+    python benchmarks/bench_report_cache.py --sales 1000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import report_cache  # noqa: E402
+import services  # noqa: E402
+from db import connect, run_in_transaction  # noqa: E402
+from excel_export import stream_rows_to_xlsx  # noqa: E402
+from sales_archive import sales_query  # noqa: E402
+from synthetic_data import generate_db  # noqa: E402
+
+COLUMNS = ("order_id", "customer_name", "product_name", "quantity", "total", "sold_at")
+
+
+def builder(db_path):
+    """نفس build_orders_excel في تطبيق Streamlit (بدون استيراد الواجهة)."""
+    def build(output, progress=None, cancel=None, q="", f_from="", f_to=""):
+        conn = connect(db_path, readonly=True)
+        try:
+            c = conn.cursor()
+            query = sales_query(c, COLUMNS, q, f_from, f_to)
+            stream_rows_to_xlsx(query.iter_rows(c, key=False), ["id"] + list(COLUMNS[1:]), output,
+                                sheet_title="orders", progress=progress, cancel=cancel, total=query.count(c))
+        finally:
+            conn.close()
+        return output
+    return build
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sales", type=int, default=1000000)
+    ap.add_argument("--years", type=float, default=2)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "store.sqlite3")
+        t0 = time.perf_counter()
+        generate_db(path, args.sales, years=args.years)
+        print(f"{args.sales} sales in {time.perf_counter() - t0:.0f}s", file=sys.stderr)
+        report_cache.register("orders_xlsx", ".xlsx", builder(path))
+        cache = report_cache.ReportCache(path, os.path.join(tmp, "cache"))
+
+        today = date.today()
+        periods = {name: (f, t) for name, f, t in report_cache.common_periods(today)}
+        periods["last 365 days"] = ((today - timedelta(days=364)).isoformat(), today.isoformat())
+
+        def get(period):
+            f_from, f_to = periods[period]
+            return cache.get("orders_xlsx", {"f_from": f_from, "f_to": f_to})
+
+        for period in periods:
+            (p, hit1), cold = timed(lambda: get(period))
+            (_p, hit2), warm = timed(lambda: get(period))
+            print(f"{period:16s} build {cold:9.1f} ms  cached {warm:7.2f} ms  "
+                  f"{os.path.getsize(p) / 2**20:6.1f} MB  {'OK' if not hit1 and hit2 else 'UNEXPECTED'}")
+
+        for period in ("yesterday", "last 365 days"):
+            params = cache._params({"f_from": periods[period][0], "f_to": periods[period][1]})
+            samples = sorted(timed(lambda: cache.stamp(params))[1] for _ in range(50))
+            print(f"{'data_stamp ' + period:28s} p50 {samples[25]:7.2f} ms  max {samples[-1]:7.2f} ms")
+
+        conn = connect(path)
+        product = conn.execute("SELECT name FROM products ORDER BY id LIMIT 1").fetchone()[0]
+        run_in_transaction(conn, lambda c: services.add_order(c, "عميل تجريبي", product, 1))
+        after = {period: get(period)[1] for period in periods}
+        expect = {"yesterday": True, "month_to_date": False, "last_month": True, "last 365 days": False}
+        print(f"{'after a sale today':28s} {after}  {'OK' if after == expect else 'UNEXPECTED'}")
+
+        cid = conn.execute("SELECT id FROM customers ORDER BY id LIMIT 1").fetchone()[0]
+        run_in_transaction(conn, lambda c: c.execute("UPDATE customers SET phone = '0790000000' WHERE id = ?", (cid,)))
+        conn.close()
+        after = {period: get(period)[1] for period in periods}
+        print(f"{'after a customer edit':28s} {after}  {'OK' if not any(after.values()) else 'UNEXPECTED'}")
+        print(f"{'cache':28s} {cache.stats()['files']} files (older versions removed), "
+              f"{cache.hits} hits / {cache.misses} misses")
+
+        report_cache._caches[os.path.abspath(path)] = cache
+        done, ms = timed(lambda: report_cache.prebuild(path, ["orders_xlsx"], today))
+        print(f"{'prebuild (all cached)':28s} {ms:9.1f} ms  {done}")
+
+        small = report_cache.ReportCache(path, cache.dir, max_files=3)
+        removed = small.evict()
+        print(f"{'evict to 3 files (LRU)':28s} removed {removed}, kept {[e['name'][:24] for e in small.entries()]}")
+
+
+if __name__ == "__main__":
+    main()
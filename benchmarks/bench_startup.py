@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+bench_startup.py
+زمن بدء تطبيق سطح المكتب bayt_alyasmeen_dashboard.py
+- زمن الاستيراد (python -X importtime) وأثقل الوحدات المستوردة عند البدء
+- الزمن حتى ظهور النافذة (frame) وحتى ظهور أرقام لوحة التحكم (data) — يحتاج شاشة (DISPLAY)
+يخرج بالرمز 1 إذا تجاوز أي قياس الحد المسموح (لاكتشاف أي تراجع في سرعة البدء).
+
+التشغيل:
+    python benchmarks/bench_startup.py [--repeat 5] [--max-import-ms 250] [--max-frame-ms 1500]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = "bayt_alyasmeen_dashboard"
+
+
+def import_profile():
+    """(زمن استيراد التطبيق بالمللي ثانية، قائمة (الوحدة، المللي ثانية) لأثقل الوحدات)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {APP}"],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    total, block, direct = None, [], []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(parts[1]) / 1000
+        except ValueError:
+            continue  # header line
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            # children are printed before their parent: block holds the app's subtree
+            if name.strip() == APP:
+                total = cumulative
+                direct = [(m, ms) for m, ms, d in block if d == 1]
+            block = []
+        else:
+            block.append((name.strip(), cumulative, depth))
+    return total, sorted(direct, key=lambda x: -x[1])[:10]
+
+
+def first_frame(timeout=60):
+    """(ms حتى ظهور النافذة، ms حتى أرقام لوحة التحكم) أو None بدون شاشة."""
+    if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+        return None
+    env = dict(os.environ, BAYT_STARTUP_PROBE="1")
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, APP + ".py")], cwd=ROOT, env=env,
+                            stdout=subprocess.PIPE, text=True)
+    marks = {}
+    try:
+        for line in proc.stdout:
+            if line.startswith("startup:"):
+                marks[line.strip().split(":", 1)[1]] = (time.perf_counter() - t0) * 1000
+            if "data" in marks or time.perf_counter() - t0 > timeout:
+                break
+    finally:
+        proc.wait(timeout=timeout)
+    return marks.get("frame"), marks.get("data")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--max-import-ms", type=float, default=250)
+    ap.add_argument("--max-frame-ms", type=float, default=1500)
+    args = ap.parse_args()
+
+    failed = False
+    runs = [import_profile() for _ in range(args.repeat)]
+    import_ms = statistics.median(r[0] for r in runs)
+    print(f"import {APP}: {import_ms:.0f} ms (median of {args.repeat}, limit {args.max_import_ms:.0f} ms)")
+    for name, ms in runs[-1][1]:
+        print(f"    {ms:8.1f} ms  {name}")
+    if import_ms > args.max_import_ms:
+        print("REGRESSION: import time over the limit")
+        failed = True
+
+    frames = [first_frame() for _ in range(args.repeat)]
+    if frames[0] is None:
+        print("time-to-first-frame: skipped (no display)")
+    else:
+        frame_ms = statistics.median(f[0] for f in frames if f[0] is not None)
+        data_ms = statistics.median(f[1] for f in frames if f[1] is not None)
+        print(f"first frame: {frame_ms:.0f} ms  first numbers: {data_ms:.0f} ms (limit {args.max_frame_ms:.0f} ms)")
+        if frame_ms > args.max_frame_ms:
+            print("REGRESSION: time-to-first-frame over the limit")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
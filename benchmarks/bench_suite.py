@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+bench_suite.py
+قياس شامل بدون واجهة للعمليات الأساسية على بيانات synthetic_data.py، والنتيجة JSON لمتابعة التراجع بين النسخ:
+- dashboard: أرقام show_dashboard (rollup_totals اليوم / الشهر / الكلي ولقطة المخزون) و order_stats (Streamlit)
+- orders: نوافذ load_orders (أول نافذة + العدد، التمرير keyset، القفز بـ OFFSET)
+- reports: load_table (sales_filter ببحث نصي وبفترة شهر: العدد + أول نافذة)
+- export: export_sales_to_excel لشهر كامل
+- invoice: create_invoice_pdf لعملية بيع، و generate_invoices لطلبات آخر يوم في ملف واحد (print_invoices)
+- write: services.add_order (Streamlit) و services.add_sale (سطح المكتب)، معاملة لكل عملية
+لكل عملية: عدد التكرارات و min / median / p95 / mean بالمللي ثانية.
+
+التشغيل:
+    python benchmarks/bench_suite.py --sales 1000000 --out results.json
+    python benchmarks/bench_suite.py --db big.sqlite3 --baseline results.json   # مقارنة بنتيجة سابقة
+--db: يُعاد استخدام الملف إن كان موجوداً (وإلا يُولّد فيه)؛ عمليات الكتابة تضيف طلبات إليه.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import bayt_alyasmeen_dashboard as app  # noqa: E402
+import invoices  # noqa: E402
+import services  # noqa: E402
+from db import connect, run_in_transaction  # noqa: E402
+from migrations import migrate  # noqa: E402
+from sales_rollup import rollup_totals  # noqa: E402
+from sales_search import sales_filter  # noqa: E402
+from synthetic_data import generate_db  # noqa: E402
+
+# نفس استعلامات صفحات bayt_alyasmeen_dashboard.py (PagedTreeview يضيف الترتيب والنافذة)
+ORDERS_SELECT = ("SELECT id,order_id,sold_at,product_name,quantity,unit_sell,total,net_profit,customer_name,customer_phone "
+                 "FROM sales WHERE 1=1")
+REPORTS_SELECT = ("SELECT id,sold_at,product_name,quantity,unit_sell,total,cost_total,net_profit,customer_name,customer_phone "
+                  "FROM sales WHERE {where}")
+WINDOW = 18 + 2 * 100  # ارتفاع جدول الطلبات + prefetch من الجهتين
+
+
+def git_version():
+    try:
+        out = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT, capture_output=True, text=True,
+                             timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def measure(fn, repeat, warmup=1):
+    """يشغل fn (warmup + repeat) مرة ويعيد إحصاءات الزمن بالمللي ثانية؛ extra من آخر نتيجة إن كانت dict."""
+    result = None
+    for _ in range(warmup):
+        result = fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    stats = {"n": repeat, "min_ms": round(times[0], 3), "median_ms": round(statistics.median(times), 3),
+             "p95_ms": round(times[min(len(times) - 1, int(round(0.95 * (len(times) - 1))))], 3),
+             "mean_ms": round(statistics.fmean(times), 3)}
+    if isinstance(result, dict):
+        stats.update(result)
+    return stats
+
+
+# ---------- العمليات ----------
+def dashboard_ops(cur):
+    today = date.today().isoformat()
+    month_start = date.today().replace(day=1).isoformat()
+    return {
+        "dashboard.show_dashboard_stats": lambda: (rollup_totals(cur), rollup_totals(cur, today, today),
+                                                   rollup_totals(cur, month_start)),
+        "dashboard.order_stats": lambda: services.order_stats(cur),
+        "dashboard.inventory_status": lambda: services.inventory_status(cur, 10),
+    }
+
+
+def orders_ops(cur, max_id):
+    def first_window():
+        total = rollup_totals(cur)[0]
+        cur.execute(ORDERS_SELECT + " ORDER BY id DESC LIMIT ? OFFSET ?", (WINDOW, 0))
+        return {"rows": len(cur.fetchall()), "total": total}
+
+    def scroll():
+        cur.execute(ORDERS_SELECT + " AND id < ? ORDER BY id DESC LIMIT ?", (max_id // 2, 100))
+        return {"rows": len(cur.fetchall())}
+
+    def jump():
+        cur.execute(ORDERS_SELECT + " ORDER BY id DESC LIMIT ? OFFSET ?", (WINDOW, max_id // 2))
+        return {"rows": len(cur.fetchall())}
+
+    return {"orders.load_orders": first_window, "orders.scroll_keyset": scroll, "orders.jump_offset": jump}
+
+
+def reports_ops(cur, month):
+    def load_table(q="", f_from="", f_to=""):
+        where, params = sales_filter(cur, q, f_from, f_to)
+        if params:
+            cur.execute(f"SELECT COUNT(*) FROM sales WHERE {where}", params)
+            total = cur.fetchone()[0]
+        else:
+            total = rollup_totals(cur)[0]
+        cur.execute(REPORTS_SELECT.format(where=where) + " ORDER BY id DESC LIMIT ? OFFSET ?", params + [WINDOW, 0])
+        return {"rows": len(cur.fetchall()), "total": total}
+
+    return {
+        "reports.load_table": lambda: load_table(),
+        "reports.load_table_search": lambda: load_table("الياسمين"),
+        "reports.load_table_search_short": lambda: load_table("نور"),
+        "reports.load_table_month": lambda: load_table("", *month),
+    }
+
+
+def export_op(tmp, month):
+    path = os.path.join(tmp, "export.xlsx")
+
+    def run():
+        rows = []
+        app.export_sales_to_excel(path, "", *month, progress=lambda done, total: rows.append(done))
+        return {"rows": rows[-1] if rows else 0, "bytes": os.path.getsize(path)}
+
+    return {"export.export_sales_to_excel_month": run}
+
+
+def invoice_ops(cur, db_path, tmp, sale_id, day):
+    app.INVOICES_DIR = os.path.join(tmp, "invoices")
+    sale = services.get_sale(cur, sale_id)
+
+    def single():
+        path = app.create_invoice_pdf(sale)
+        size = os.path.getsize(path)
+        os.remove(path)
+        return {"bytes": size}
+
+    def batch():
+        out, done = os.path.join(tmp, "batch"), []
+        path = os.path.join(out, "day.pdf")
+        invoices.generate_invoices(db_path, out, date_from=day.isoformat(), date_to=(day + timedelta(days=1)).isoformat(),
+                                   merge_path=path,
+                                   progress=lambda n, total: done.append(total))
+        size = os.path.getsize(path)
+        shutil.rmtree(out)
+        return {"invoices": done[-1], "bytes": size}
+
+    return {"invoice.create_invoice_pdf": single, "invoice.generate_invoices_day_merged": batch}
+
+
+def write_ops(conn, product_name, product_id):
+    return {
+        "write.add_order": lambda: run_in_transaction(
+            conn, lambda cur: services.add_order(cur, "عميلة القياس", product_name, 1)),
+        "write.add_sale": lambda: run_in_transaction(
+            conn, lambda cur: services.add_sale(cur, product_id, 1, "عميلة القياس", "0100", "القاهرة")),
+    }
+
+
+def init_db_op(tmp):
+    path = os.path.join(tmp, "empty.sqlite3")
+
+    def run():
+        if os.path.exists(path):
+            os.remove(path)
+        conn = connect(path)
+        migrate(conn)
+        conn.close()
+
+    return {"startup.migrate_empty_db": run}
+
+
+# ---------- التشغيل ----------
+def run_suite(db_path, tmp, repeat):
+    app.DB_PATH = db_path
+    conn = connect(db_path)
+    cur = conn.cursor()
+    cur.execute("SELECT MAX(id), MAX(sold_at) FROM sales")
+    max_id, last = cur.fetchone()
+    last_day = date.fromisoformat(last[:10])
+    month_start = last_day.replace(day=1) - timedelta(days=1)
+    month = (month_start.replace(day=1).isoformat(), month_start.isoformat())  # آخر شهر كامل
+    cur.execute("SELECT id FROM sales WHERE sold_at >= ? ORDER BY id LIMIT 1", (last_day.isoformat(),))
+    sale_id = cur.fetchone()[0]
+    cur.execute("SELECT id, name FROM products ORDER BY id LIMIT 1")
+    product_id, product_name = cur.fetchone()
+
+    groups = [
+        (dashboard_ops(cur), repeat * 10),
+        (orders_ops(cur, max_id), repeat * 5),
+        (reports_ops(cur, month), repeat),
+        (export_op(tmp, month), max(1, repeat // 2)),
+        (invoice_ops(cur, db_path, tmp, sale_id, last_day), repeat),
+        (init_db_op(tmp), repeat),
+        (write_ops(conn, product_name, product_id), repeat * 10),
+    ]
+    results = {}
+    for ops, n in groups:
+        for name, fn in ops.items():
+            print(f"  {name} ...", file=sys.stderr, flush=True)
+            results[name] = measure(fn, n)
+    conn.close()
+    return results
+
+
+def compare(results, baseline_path, threshold, min_delta_ms):
+    """يطبع نسبة median الحالية إلى النتيجة السابقة؛ يعيد أسماء العمليات الأبطأ من threshold (وبفارق min_delta_ms على الأقل)."""
+    with open(baseline_path, encoding="utf-8") as f:
+        base = json.load(f)["results"]
+    slower = []
+    for name, r in results.items():
+        if name not in base:
+            continue
+        ratio = r["median_ms"] / max(base[name]["median_ms"], 1e-6)
+        slow = ratio > threshold and r["median_ms"] - base[name]["median_ms"] >= min_delta_ms
+        flag = " REGRESSION" if slow else ""
+        print(f"{name:42s} {base[name]['median_ms']:10.2f} -> {r['median_ms']:10.2f} ms  x{ratio:.2f}{flag}",
+              file=sys.stderr)
+        if flag:
+            slower.append(name)
+    return slower
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sales", type=int, default=1000000)
+    ap.add_argument("--products", type=int, default=800)
+    ap.add_argument("--customers", type=int, default=50000)
+    ap.add_argument("--seed", type=int, default=11)
+    ap.add_argument("--end", type=date.fromisoformat, help="آخر يوم في البيانات (افتراضياً اليوم)")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--db", help="ملف البيانات (يُعاد استخدامه إن وُجد)")
+    ap.add_argument("--out", help="ملف JSON للنتيجة (افتراضياً stdout)")
+    ap.add_argument("--baseline", help="نتيجة JSON سابقة للمقارنة")
+    ap.add_argument("--threshold", type=float, default=1.25, help="نسبة التباطؤ التي تُعد تراجعاً")
+    ap.add_argument("--min-delta-ms", type=float, default=1.0, help="فروق أصغر من هذا تُعد ضوضاء")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "synthetic.sqlite3")
+        dataset = {"reused": bool(args.db and os.path.exists(db_path))}
+        if not dataset["reused"]:
+            t0 = time.perf_counter()
+            dataset.update(generate_db(db_path, args.sales, args.products, args.customers, end=args.end,
+                                       seed=args.seed))
+            dataset["generate_s"] = round(time.perf_counter() - t0, 1)
+        conn = sqlite3.connect(db_path)
+        dataset["sales"], dataset["orders"] = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM order_lines), (SELECT COUNT(*) FROM orders)").fetchone()
+        conn.close()
+        dataset["size_mb"] = round(os.path.getsize(db_path) / 2**20, 1)
+        print(f"dataset: {dataset}", file=sys.stderr)
+        results = run_suite(db_path, tmp, args.repeat)
+
+    report = {
+        "suite": "bench_suite",
+        "version": git_version(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "params": {"sales": args.sales, "products": args.products, "customers": args.customers,
+                   "seed": args.seed, "repeat": args.repeat},
+        "dataset": dataset,
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline and compare(results, args.baseline, args.threshold, args.min_delta_ms):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
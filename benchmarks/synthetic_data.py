@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+synthetic_data.py
+مولد بيانات تجريبية حتمي (نفس seed = نفس الملف) لقاعدة store.sqlite3 بعد migrations.py
+(المخطط المشترك بين bayt_alyasmeen_dashboard.py و init_db في تطبيق Streamlit):
+- منتجات بأعمدة التطبيقين (qty / cost_price / sell_price و price / quantity) وشعبية غير متساوية (Zipf)
+- عملاء بأسماء وهواتف وعناوين، بعضهم يتكرر شراؤه كثيراً
+- طلبات (سلال من عدة أصناف) موزعة على السنوات بنمو تدريجي، مواسم (رمضان / الأعياد / عيد الأم / الجمعة البيضاء)،
+  أيام الأسبوع وساعات اليوم (ذروة المساء)
+الإدراج بالجملة: Triggers التجميع والبحث على order_lines تُحذف أثناء التحميل ثم تُعاد ويُعاد بناء
+sales_daily و sales_fts مرة واحدة (أسرع بكثير من تشغيل الـ Triggers لكل صف).
+
+التشغيل (ملف منفصل يمكن إعادة استخدامه في bench_suite.py --db):
+    python benchmarks/synthetic_data.py out.sqlite3 --sales 2000000
+"""
+
+import argparse
+import bisect
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from migrations import migrate  # noqa: E402
+from sales_rollup import ensure_sales_rollup, rebuild_sales_rollup  # noqa: E402
+from sales_search import ensure_sales_fts, rebuild_sales_fts  # noqa: E402
+
+FIRST_NAMES = ["نور", "سارة", "منى", "هدى", "ريم", "ياسمين", "مريم", "فاطمة", "آية", "دينا", "أحمد", "محمد", "عمر", "خالد"]
+FAMILY_NAMES = ["حسن", "إبراهيم", "السيد", "عبد الله", "مصطفى", "علي", "محمود", "الشريف", "النجار", "فؤاد"]
+STREETS = ["شارع النصر", "شارع الجمهورية", "شارع التحرير", "طريق الكورنيش", "شارع الهرم", "شارع فيصل", "شارع البحر"]
+CITIES = ["القاهرة", "الجيزة", "الإسكندرية", "المنصورة", "طنطا", "أسيوط", "الزقازيق"]
+SCENTS = ["الياسمين", "العود", "المسك", "الورد الطائفي", "العنبر", "الفانيليا", "الصندل", "اللافندر", "البرغموت", "الزعفران"]
+LINES = ["الفاخر", "الكلاسيكي", "الليلي", "الملكي", "الصيفي", "المركز", "الخاص"]
+SIZES = [30, 50, 100]
+
+# وزن يوم الأسبوع (الاثنين = 0) وساعة اليوم
+WEEKDAY_WEIGHTS = [0.9, 0.9, 1.0, 1.3, 1.2, 0.8, 0.9]
+HOUR_WEIGHTS = [0.2, 0.1, 0.05, 0.05, 0.05, 0.1, 0.2, 0.4, 0.7, 1.0, 1.2, 1.3,
+                1.3, 1.2, 1.1, 1.1, 1.2, 1.5, 1.9, 2.3, 2.5, 2.2, 1.4, 0.6]
+# مواسم: (بداية الشهر/اليوم، عدد الأيام، المضاعف) — رمضان والعيد تقريبياً حسب السنة
+SEASONS = {
+    2022: [((4, 2), 32, 1.8), ((7, 9), 4, 1.5)],
+    2023: [((3, 23), 30, 1.8), ((6, 28), 4, 1.5)],
+    2024: [((3, 11), 31, 1.8), ((6, 16), 4, 1.5)],
+    2025: [((3, 1), 31, 1.8), ((6, 6), 4, 1.5)],
+    2026: [((2, 18), 32, 1.8), ((5, 27), 4, 1.5)],
+}
+FIXED_DAYS = [((2, 14), 1, 2.0), ((3, 21), 3, 2.5), ((11, 20), 10, 1.6), ((12, 31), 1, 1.7)]
+
+
+# ---------- التوزيعات ----------
+def zipf_cum_weights(n, s=1.1):
+    """أوزان تراكمية لعناصر مرتبة حسب الشعبية (العنصر 1 الأكثر)."""
+    return list(itertools.accumulate(1.0 / (k ** s) for k in range(1, n + 1)))
+
+
+def day_weights(start, days, growth=1.0):
+    """وزن كل يوم: نمو خطي (growth = الزيادة الكلية بنهاية الفترة) × يوم الأسبوع × المواسم."""
+    weights = []
+    for i in range(days):
+        d = start + timedelta(days=i)
+        w = (1 + growth * i / max(days - 1, 1)) * WEEKDAY_WEIGHTS[d.weekday()]
+        for (month, day), length, factor in SEASONS.get(d.year, []) + FIXED_DAYS:
+            first = date(d.year, month, day)
+            if first <= d < first + timedelta(days=length):
+                w *= factor
+        weights.append(w)
+    return weights
+
+
+def basket_size(rnd, max_items):
+    """حجم السلة: غالباً صنف أو اثنان، نادراً أكثر (هندسي مقطوع)."""
+    n = 1
+    while n < max_items and rnd.random() < 0.35:
+        n += 1
+    return n
+
+
+# ---------- الكيانات ----------
+def make_products(n, seed):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(1, n + 1):
+        cost = round(rnd.uniform(30, 400), 2)
+        sell = round(cost * rnd.uniform(1.3, 2.2), 2)
+        name = f"عطر {rnd.choice(SCENTS)} {rnd.choice(LINES)} {rnd.choice(SIZES)} مل #{i}"
+        stock = rnd.randint(0, 500)
+        rows.append((i, name, stock, cost, sell, sell, stock, f"تركيبة {rnd.choice(SCENTS)}"))
+    return rows
+
+
+def make_customers(n, seed):
+    rnd = random.Random(seed + 1)
+    return [(k, f"{rnd.choice(FIRST_NAMES)} {rnd.choice(FAMILY_NAMES)} {k}", f"01{rnd.choice('0125')}{k:08d}",
+             f"{rnd.choice(STREETS)} {rnd.randint(1, 250)} — {rnd.choice(CITIES)}") for k in range(1, n + 1)]
+
+
+def iter_orders(sales, start, days, products, customers, max_items=5, seed=11):
+    """
+    يولد (sold_at, customer_id, [(product_id, qty), ...]) مرتبة زمنياً حتى يصل عدد الأصناف إلى sales.
+    رقم العميل والمنتج 1 هو الأكثر تكراراً.
+    """
+    rnd = random.Random(seed)
+    sizes, emitted = [], 0
+    while emitted < sales:
+        sizes.append(min(basket_size(rnd, max_items), sales - emitted))
+        emitted += sizes[-1]
+    day_cum = list(itertools.accumulate(day_weights(start, days)))
+    hour_cum = list(itertools.accumulate(HOUR_WEIGHTS))
+    product_cum = zipf_cum_weights(products, 1.05)
+    customer_cum = zipf_cum_weights(customers, 0.7)
+    # الأيام تُسحب دفعة واحدة ثم تُرتب، فيتزايد id مع الزمن كما في الاستخدام الفعلي
+    order_days = sorted(rnd.choices(range(days), cum_weights=day_cum, k=len(sizes)))
+    for d, k in zip(order_days, sizes):
+        when = start + timedelta(days=d)
+        hour = bisect.bisect_left(hour_cum, rnd.random() * hour_cum[-1])
+        sold_at = f"{when.isoformat()} {hour:02d}:{rnd.randrange(60):02d}:{rnd.randrange(60):02d}"
+        items = [(bisect.bisect_left(product_cum, rnd.random() * product_cum[-1]) + 1,
+                  rnd.choice((1, 1, 1, 2, 2, 3))) for _ in range(k)]
+        yield sold_at, bisect.bisect_left(customer_cum, rnd.random() * customer_cum[-1]) + 1, items
+
+
+# ---------- الكتابة ----------
+def _drop_line_triggers(conn):
+    """يحذف Triggers الإدراج على order_lines (تُعاد عبر ensure_sales_rollup / ensure_sales_fts)."""
+    names = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='trigger' AND tbl_name='order_lines'")]
+    for name in names:
+        conn.execute(f"DROP TRIGGER {name}")
+
+
+def generate_db(path, sales=1000000, products=800, customers=50000, years=3, end=None, max_items=5,
+                seed=11, batch=50000, progress=None):
+    """
+    ينشئ قاعدة بيانات جديدة في path (يجب ألا تكون موجودة) بالمخطط الحالي ويعبئها.
+    end: آخر يوم في البيانات (افتراضياً اليوم، حتى تعمل أرقام "اليوم" و"هذا الشهر" في لوحة التحكم).
+    يعيد dict بالأعداد الفعلية.
+    """
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    end = end or date.today()
+    days = int(years * 365)
+    start = end - timedelta(days=days - 1)
+    conn = sqlite3.connect(path)
+    try:
+        migrate(conn)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("BEGIN")
+        product_rows = make_products(products, seed)
+        conn.executemany("""INSERT INTO products (id, name, qty, cost_price, sell_price, price, quantity, description)
+                            VALUES (?,?,?,?,?,?,?,?)""", product_rows)
+        conn.executemany("INSERT INTO customers (id, name, phone, address) VALUES (?,?,?,?)",
+                         make_customers(customers, seed))
+        prices = {r[0]: (r[4], r[3]) for r in product_rows}
+        _drop_line_triggers(conn)
+        order_id = line_id = 0
+        heads, lines = [], []
+        for sold_at, customer, items in iter_orders(sales, start, days, products, customers, max_items, seed):
+            order_id += 1
+            heads.append((order_id, customer, sold_at))
+            for pid, q in items:
+                line_id += 1
+                sell, cost = prices[pid]
+                lines.append((line_id, order_id, pid, q, sell, cost, round(sell * q, 2)))
+            if len(lines) >= batch:
+                conn.executemany("INSERT INTO orders (id, customer_id, sold_at) VALUES (?,?,?)", heads)
+                conn.executemany("""INSERT INTO order_lines (id, order_id, product_id, quantity, unit_sell, unit_cost, total)
+                                    VALUES (?,?,?,?,?,?,?)""", lines)
+                heads, lines = [], []
+                if progress:
+                    progress(line_id, sales)
+        conn.executemany("INSERT INTO orders (id, customer_id, sold_at) VALUES (?,?,?)", heads)
+        conn.executemany("""INSERT INTO order_lines (id, order_id, product_id, quantity, unit_sell, unit_cost, total)
+                            VALUES (?,?,?,?,?,?,?)""", lines)
+        ensure_sales_rollup(conn, commit=False)
+        ensure_sales_fts(conn, commit=False)
+        rebuild_sales_rollup(conn, commit=False)
+        rebuild_sales_fts(conn, commit=False)
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    return {"sales": line_id, "orders": order_id, "customers": customers, "products": products,
+            "first_day": start.isoformat(), "last_day": end.isoformat(), "seed": seed}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("path")
+    ap.add_argument("--sales", type=int, default=1000000, help="عدد أسطر البيع (order_lines)")
+    ap.add_argument("--products", type=int, default=800)
+    ap.add_argument("--customers", type=int, default=50000)
+    ap.add_argument("--years", type=float, default=3)
+    ap.add_argument("--seed", type=int, default=11)
+    ap.add_argument("--end", type=date.fromisoformat, help="آخر يوم YYYY-MM-DD (افتراضياً اليوم)")
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    info = generate_db(args.path, args.sales, args.products, args.customers, args.years, args.end, seed=args.seed,
+                       progress=lambda done, total: print(f"\r{done}/{total}", end="", flush=True))
+    print(f"\n{info['sales']} sales in {info['orders']} orders ({info['first_day']} .. {info['last_day']}) "
+          f"in {time.perf_counter() - t0:.1f}s, {os.path.getsize(args.path) / 2**20:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+change_feed.py
+سجل التغييرات لتحديث الواجهات في مكانها بدلاً من إعادة بناء الصفحة وإعادة كل الاستعلامات
+- Triggers تكتب في change_log (seq متزايد): أسطر الطلبات (إضافة / تعديل / حذف) وتعديل الطلب أو العميل
+  أو اسم المنتج (تتغير به أسطر ظاهرة)؛ تغييرات المخزون من inventory_log (inventory.py)
+- PRAGMA data_version: فحص شبه مجاني لكل اتصال يتغير فقط إن كتب اتصال آخر (تطبيق آخر أو thread الكتابة)،
+  فلا يُقرأ السجل إلا بعد كتابة فعلية
+- ChangeFeed.poll(cur): None إن لم يتغير شيء، وإلا التغييرات منذ آخر poll؛ read_changes(cur, since) لخادم الـ API
+- أرشفة شهر (sales_archive.py) تكتب سطراً واحداً (op = 'r') بدل سطر لكل صف: reset لكل المستهلكين
+"""
+
+import threading
+
+from sales_rollup import ARCHIVE_GUARD_WHEN, ensure_archive_guard
+
+LOG_KEEP = 20000   # آخر التغييرات المحفوظة؛ المستهلك الأقدم منها يحصل على reset (إعادة تحميل كاملة)
+POLL_MS = 1000     # فترة poll في تطبيق سطح المكتب
+
+# (اسم الـ Trigger، الحدث، الجدول في السجل، الرقم، نوع التغيير)
+_TRIGGERS = [
+    ("order_lines_changes_ai", "AFTER INSERT ON order_lines", "order_lines", "NEW.id", "i"),
+    ("order_lines_changes_au", "AFTER UPDATE ON order_lines", "order_lines", "NEW.id", "u"),
+    ("order_lines_changes_ad", "AFTER DELETE ON order_lines " + ARCHIVE_GUARD_WHEN, "order_lines", "OLD.id", "d"),
+    ("orders_changes_au", "AFTER UPDATE OF sold_at, customer_id ON orders", "orders", "NEW.id", "u"),
+    ("customers_changes_au", "AFTER UPDATE OF name, phone, address ON customers", "customers", "NEW.id", "u"),
+    ("products_changes_au", "AFTER UPDATE OF name ON products WHEN OLD.name IS NOT NEW.name", "products", "NEW.id", "u"),
+]
+
+
+# ---------- الجدول والـ Triggers ----------
+def ensure_change_log(conn, commit=True):
+    """ينشئ change_log والـ Triggers (تستدعيه migrations.py)."""
+    cur = conn.cursor()
+    ensure_archive_guard(cur)
+    cur.execute("""CREATE TABLE IF NOT EXISTS change_log (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tbl TEXT NOT NULL,
+                    row_id INTEGER NOT NULL,
+                    op TEXT NOT NULL)""")
+    for name, event, table, row_id, op in _TRIGGERS:
+        cur.execute(f"""CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN
+                        INSERT INTO change_log (tbl, row_id, op) VALUES ('{table}', {row_id}, '{op}');
+                        END""")
+    # same trimming as inventory_log: every 1000 changes, without a separate job
+    cur.execute(f"""CREATE TRIGGER IF NOT EXISTS change_log_trim AFTER INSERT ON change_log
+                    WHEN NEW.seq % 1000 = 0 BEGIN
+                    DELETE FROM change_log WHERE seq <= NEW.seq - {LOG_KEEP};
+                    END""")
+    if commit:
+        conn.commit()
+
+
+# ---------- القراءة ----------
+def last_seq(cur):
+    cur.execute("SELECT IFNULL(MAX(seq), 0) FROM change_log")
+    return cur.fetchone()[0]
+
+
+def read_changes(cur, since):
+    """
+    التغييرات بعد seq = since:
+    {seq, inserted, updated, deleted (أرقام أسطر order_lines), tables (جداول أخرى تغيرت), reset}
+    سطر أُضيف ثم حُذف بعد since لا يظهر؛ reset = True إن قُص جزء من السجل بعد since أو أُرشف شهر
+    (أعد التحميل كاملاً).
+    """
+    changes = {"seq": since, "inserted": set(), "updated": set(), "deleted": set(), "tables": set(), "reset": False}
+    cur.execute("SELECT MIN(seq), MAX(seq) FROM change_log")
+    lo, hi = cur.fetchone()
+    if hi is None or hi <= since:
+        return changes
+    changes["seq"] = hi
+    if lo > since + 1:
+        changes["reset"] = True
+        return changes
+    inserted, updated, deleted = changes["inserted"], changes["updated"], changes["deleted"]
+    cur.execute("SELECT tbl, row_id, op FROM change_log WHERE seq > ? AND seq <= ? ORDER BY seq", (since, hi))
+    for table, row_id, op in cur.fetchall():
+        if op == "r":
+            changes["reset"] = True
+        elif table != "order_lines":
+            changes["tables"].add(table)
+        elif op == "i":
+            if row_id in deleted:  # the same id deleted and inserted again
+                deleted.discard(row_id)
+                updated.add(row_id)
+            else:
+                inserted.add(row_id)
+        elif op == "u":
+            if row_id not in inserted:
+                updated.add(row_id)
+        elif row_id in inserted:
+            inserted.discard(row_id)
+        else:
+            updated.discard(row_id)
+            deleted.add(row_id)
+    return changes
+
+
+def touches_sales(changes):
+    """هل تغيرت أرقام أو أسطر المبيعات (لا المخزون وحده)."""
+    return bool(changes["reset"] or changes["inserted"] or changes["updated"] or changes["deleted"]
+                or changes["tables"])
+
+
+class ChangeFeed:
+    """
+    feed = ChangeFeed();  changes = feed.poll(cur)  (من أي thread / اتصال قراءة)
+    أول poll يحدد نقطة البداية فقط (الصفحة تحمّل بياناتها كاملة عند فتحها) ويعيد None.
+    النتيجة مثل read_changes + stock (تغير المخزون: InventorySnapshot.refresh يقرأ المتغير فقط).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}   # id(connection) -> آخر PRAGMA data_version رآه هذا الاتصال
+        self.seq = None
+        self.stock_seq = None
+
+    def poll(self, cur):
+        cur.execute("PRAGMA data_version")
+        version = cur.fetchone()[0]
+        key = id(cur.connection)
+        with self._lock:
+            # unchanged data_version: nothing was committed since this connection last looked
+            if self.seq is not None and self._versions.get(key) == version:
+                return None
+            self._versions[key] = version
+            cur.execute("SELECT IFNULL(MAX(seq), 0) FROM inventory_log")
+            stock_seq = cur.fetchone()[0]
+            if self.seq is None:
+                self.seq, self.stock_seq = last_seq(cur), stock_seq
+                return None
+            changes = read_changes(cur, self.seq)
+            changes["stock"] = stock_seq != self.stock_seq
+            self.seq, self.stock_seq = changes["seq"], stock_seq
+        if not (changes["stock"] or touches_sales(changes)):
+            return None
+        return changes
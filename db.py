@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+db.py
+مصنع الاتصالات بقاعدة البيانات store.sqlite3 (يستخدمه التطبيقان وكل الأدوات)
+- وضع WAL: القراءة لا تنتظر الكتابة، وتطبيق سطح المكتب و Streamlit يعملان معاً
+- busy_timeout + إعادة المحاولة بتأخير متزايد (backoff) عند "database is locked"
+- synchronous=NORMAL وذاكرة cache أكبر للصفحات
+- اتصالات للقراءة فقط (mode=ro) لاستعلامات التقارير والتصدير
+- ConnectionPool: اتصالات معاد استخدامها (ومعها الجمل المجهزة المخزنة في كل اتصال) لخادم الـ API
+- كل جملة SQL تُقاس عبر profiling.ProfiledConnection (إلا مع BAYT_PROFILE=0)
+"""
+
+import queue
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import profiling
+
+BUSY_TIMEOUT = 5.0        # ثوانٍ ينتظرها الاتصال قبل أن يعيد "database is locked"
+CACHE_KB = 32 * 1024      # cache_size لكل اتصال (بالكيلوبايت)
+RETRY_ATTEMPTS = 6
+RETRY_BASE_DELAY = 0.05   # التأخير يتضاعف مع كل محاولة حتى RETRY_MAX_DELAY
+RETRY_MAX_DELAY = 2.0
+STATEMENT_CACHE = 256     # جمل SQL مجهزة (prepared) تبقى مخزنة في كل اتصال
+_FACTORY = profiling.ProfiledConnection if profiling.ENABLED else sqlite3.Connection
+
+
+def connect(db_path, readonly=False, timeout=BUSY_TIMEOUT, check_same_thread=True):
+    """اتصال جاهز بالإعدادات المشتركة. readonly=True يفتح الملف للقراءة فقط (يجب أن يكون موجوداً)."""
+    if readonly:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=timeout,
+                               check_same_thread=check_same_thread, cached_statements=STATEMENT_CACHE,
+                               factory=_FACTORY)
+        conn.execute("PRAGMA query_only = ON")
+    else:
+        conn = sqlite3.connect(db_path, timeout=timeout, check_same_thread=check_same_thread,
+                               cached_statements=STATEMENT_CACHE, factory=_FACTORY)
+        try:
+            # persistent in the file: only needs to succeed once, from any writer
+            conn.execute("PRAGMA journal_mode = WAL")
+        except sqlite3.OperationalError as e:
+            if not is_locked_error(e):
+                raise
+    conn.execute(f"PRAGMA busy_timeout = {int(timeout * 1000)}")
+    # NORMAL is durable in WAL mode except for the last commits on power loss
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = {-int(CACHE_KB)}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+def is_locked_error(exc):
+    if not isinstance(exc, sqlite3.OperationalError):
+        return False
+    msg = str(exc).lower()
+    return "locked" in msg or "busy" in msg
+
+
+def _backoff(attempt):
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt))
+    time.sleep(delay * (0.5 + random.random() / 2))
+
+
+def with_retry(fn, attempts=RETRY_ATTEMPTS):
+    """يستدعي fn() ويعيد المحاولة عند قفل القاعدة فقط؛ الأخطاء الأخرى تصل كما هي."""
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except sqlite3.OperationalError as e:
+            if not is_locked_error(e) or attempt == attempts - 1:
+                raise
+            _backoff(attempt)
+
+
+def run_in_transaction(conn, fn, attempts=RETRY_ATTEMPTS):
+    """
+    يشغل fn(cur) داخل BEGIN IMMEDIATE ثم commit، ويعيد نتيجتها.
+    IMMEDIATE يحجز قفل الكتابة من البداية فلا تفشل المعاملة في منتصفها عند ترقية القفل،
+    وعند القفل تُلغى المعاملة بالكامل وتُعاد من أولها.
+    """
+    def attempt():
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(cur)
+            conn.commit()
+            return result
+        except BaseException:
+            conn.rollback()
+            raise
+    return with_retry(attempt, attempts)
+
+
+# ---------- مجمع الاتصالات ----------
+class ConnectionPool:
+    """
+    عدد ثابت من الاتصالات تُستعار وتُعاد (with pool.connection() as conn).
+    الاتصال يبقى مفتوحاً فتبقى جمله المجهزة في الذاكرة، ولا يتكرر فتح الملف وقراءة المخطط مع كل طلب.
+    """
+
+    def __init__(self, db_path, size=4, readonly=False):
+        self.size = size
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(connect(db_path, readonly=readonly, check_same_thread=False))
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self._idle.get(timeout=timeout)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self):
+        for _ in range(self.size):
+            self._idle.get().close()
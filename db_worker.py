@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+db_worker.py
+وصول غير متزامن لقاعدة البيانات من واجهة Tkinter
+- الاستعلامات تعمل في threads منفصلة، ولكل thread اتصال sqlite3 خاص به
+- thread واحد للكتابة (الكتابات متسلسلة) + عدد صغير من threads للقراءة (اتصالات read-only)
+- النتائج تعود إلى thread الواجهة عبر طابور يُقرأ بـ root.after، فلا تتجمد النافذة
+- خطأ في callback / errback يُطبع ولا يوقف تسليم النتائج التالية؛ تعذر فتح الاتصال يصل إلى errback كل مهمة
+"""
+
+import queue
+import threading
+import traceback
+
+from db import connect, run_in_transaction
+
+
+class DbWorker:
+    """
+    db = DbWorker(root, DB_PATH, init=migrate)
+    db.submit(lambda cur: ..., callback=lambda result: ..., errback=lambda exc: ..., write=False)
+    الدالة تستقبل مؤشراً (cursor) وتعمل في الخلفية؛ callback / errback تُستدعى في thread الواجهة.
+    وظائف الكتابة (write=True) تعمل داخل BEGIN IMMEDIATE مع commit تلقائي، وتُعاد عند قفل القاعدة
+    من عملية أخرى (db.run_in_transaction)؛ عند الخطأ يتم rollback.
+    """
+
+    def __init__(self, root, db_path, init=None, readers=2, poll_ms=30, start=True):
+        self.root = root
+        self.db_path = db_path
+        self.poll_ms = poll_ms
+        self.started = False
+        self._writes = queue.Queue()
+        self._reads = queue.Queue()
+        self._results = queue.Queue()
+        self._ready = threading.Event()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._serve, args=(self._writes, True, init), daemon=True, name="db-writer")]
+        self._threads += [threading.Thread(target=self._serve, args=(self._reads, False, None), daemon=True, name=f"db-reader-{i}")
+                          for i in range(readers)]
+        if start:
+            self.start()
+
+    def start(self):
+        """يفتح الاتصالات ويبدأ التنفيذ (start=False يؤجل ذلك، مثلاً إلى ما بعد ظهور النافذة)."""
+        if self.started:
+            return
+        self.started = True
+        for t in self._threads:
+            t.start()
+        self.root.after(self.poll_ms, self._poll)
+
+    def connect(self, readonly=False):
+        return connect(self.db_path, readonly=readonly)
+
+    # ---------- من thread الواجهة ----------
+    def submit(self, fn, callback=None, errback=None, write=False):
+        (self._writes if write else self._reads).put((fn, callback, errback))
+
+    def close(self):
+        self._closed = True
+        if not self.started:
+            return
+        for _ in self._threads:
+            self._writes.put(None)
+            self._reads.put(None)
+
+    def _poll(self):
+        try:
+            while True:
+                ok, value, callback, errback = self._results.get_nowait()
+                try:
+                    if ok and callback:
+                        callback(value)
+                    elif not ok:
+                        if errback:
+                            errback(value)
+                        else:
+                            print("db worker error:", value)
+                except Exception:
+                    # one broken callback (e.g. a page closed while its job ran) must not stop the others
+                    print("db worker callback error:")
+                    traceback.print_exc()
+        except queue.Empty:
+            pass
+        finally:
+            if not self._closed:
+                self.root.after(self.poll_ms, self._poll)
+
+    # ---------- threads الخلفية ----------
+    def _serve(self, jobs, write, init):
+        conn, failed = None, None
+        if write:
+            try:
+                conn = self.connect()
+                if init:
+                    init(conn)
+            except Exception as e:
+                failed = e if conn is None else None
+                self._results.put((False, e, None, None))
+            finally:
+                # readers wait for the schema; they must not wait forever if the writer could not open
+                self._ready.set()
+        else:
+            self._ready.wait()
+            try:
+                conn = self.connect(readonly=True)
+            except Exception as e:
+                failed = e
+        cur = conn.cursor() if conn is not None else None
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            fn, callback, errback = job
+            if failed is not None:
+                # no connection: every job fails with the reason instead of never answering
+                self._results.put((False, failed, callback, errback))
+                continue
+            try:
+                result = run_in_transaction(conn, fn) if write else fn(cur)
+                self._results.put((True, result, callback, errback))
+            except Exception as e:
+                self._results.put((False, e, callback, errback))
+        if conn is not None:
+            conn.close()
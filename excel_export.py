@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+excel_export.py
+تصدير Excel متدفق (streaming) بذاكرة ثابتة
+- openpyxl في وضع write_only (الصفوف تُكتب مباشرة ولا تبقى في الذاكرة)
+- الصفوف تُكتب دفعةً دفعة من مصدر دفعات (sales_archive.SalesQuery.iter_rows: الجدول الحي + الأرشيف) بدلاً من fetchall
+- progress(done, total) لعرض التقدم في الواجهتين، و cancel (threading.Event) للإلغاء
+"""
+
+class ExportCancelled(Exception):
+    pass
+
+
+def stream_rows_to_xlsx(chunks, headers, output, sheet_title="Sheet", progress=None, cancel=None, total=None):
+    """
+    يكتب دفعات الصفوف (iterable من قوائم، مثل sales_archive.SalesQuery.iter_rows) إلى output
+    (مسار ملف أو BytesIO) ويعيد عدد الصفوف.
+    يرفع ExportCancelled إذا تم ضبط cancel أثناء التصدير (الملف الجزئي لا يُحفظ).
+    """
+    from openpyxl import Workbook  # loaded on first export only
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title)
+    ws.append(list(headers))
+    done = 0
+    if progress:
+        progress(done, total)
+    for rows in chunks:
+        if cancel is not None and cancel.is_set():
+            ws.close()
+            raise ExportCancelled()
+        for row in rows:
+            ws.append(row)
+        done += len(rows)
+        if progress:
+            progress(done, total)
+    if cancel is not None and cancel.is_set():
+        ws.close()
+        raise ExportCancelled()
+    wb.save(output)
+    return done
+
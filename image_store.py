@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+image_store.py
+مخزن صور بالمحتوى (content-addressed) لصور العطور والشعار
+- الملف يُحفظ باسم بصمته sha256 فلا تتكرر نفس الصورة على القرص مهما رُفعت
+- المصغرات (icon / ui / invoice) تُولّد مرة واحدة وقت الرفع
+- thumbnail_path(path, kind) تعيد المصغرة لأي صورة (تُستخدم في الواجهتين وفي الفواتير)،
+  والصور القديمة خارج المخزن تُضاف إليه عند أول طلب
+"""
+
+import hashlib
+import os
+import re
+import shutil
+
+from PIL import Image
+
+STORE_SUBDIR = "store"
+# kind -> (أقصى بعد بالبكسل، الصيغة)
+THUMB_SIZES = {
+    "icon": (80, "PNG"),        # شعار الشريط العلوي في تطبيق سطح المكتب
+    "ui": (160, "PNG"),         # العرض في Streamlit
+    "invoice": (360, "JPEG"),   # إطار 180pt في الفاتورة بدقة مضاعفة
+}
+_HASHED = re.compile(r"^([0-9a-f]{64})\.\w+$")
+_known = {}  # مسار صورة قديمة -> مسار نسختها في المخزن
+
+
+def _store_dir(images_dir, digest):
+    return os.path.join(images_dir, STORE_SUBDIR, digest[:2])
+
+
+def _ext(name):
+    ext = os.path.splitext(name or "")[1].lower()
+    return ext if ext in (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp") else ".img"
+
+
+def _thumb_file(original, kind):
+    base = os.path.splitext(original)[0]
+    fmt = THUMB_SIZES[kind][1]
+    return f"{base}_{kind}.{'jpg' if fmt == 'JPEG' else 'png'}"
+
+
+def _make_thumbnails(original):
+    try:
+        with Image.open(original) as im:
+            im.load()
+            for kind, (size, fmt) in THUMB_SIZES.items():
+                dst = _thumb_file(original, kind)
+                if os.path.exists(dst):
+                    continue
+                th = im.copy()
+                th.thumbnail((size, size))
+                if fmt == "JPEG" and th.mode not in ("RGB", "L"):
+                    bg = Image.new("RGB", th.size, "white")
+                    th = th.convert("RGBA")
+                    bg.paste(th, mask=th.split()[-1])
+                    th = bg
+                tmp = f"{dst}.{os.getpid()}.tmp"
+                th.save(tmp, fmt, quality=85, optimize=True)
+                os.replace(tmp, dst)
+    except Exception as e:
+        print("thumbnail error:", e)
+
+
+# ---------- الإضافة ----------
+def store_image_bytes(data, name, images_dir):
+    """يحفظ الصورة (bytes) في المخزن إن لم تكن موجودة ويولد مصغراتها، ويعيد مسار الأصل."""
+    digest = hashlib.sha256(data).hexdigest()
+    folder = _store_dir(images_dir, digest)
+    dst = os.path.join(folder, digest + _ext(name))
+    if not os.path.exists(dst):
+        os.makedirs(folder, exist_ok=True)
+        tmp = f"{dst}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dst)
+    _make_thumbnails(dst)
+    return dst
+
+
+def store_image_file(src_path, images_dir):
+    digest = hashlib.sha256()
+    with open(src_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest = digest.hexdigest()
+    folder = _store_dir(images_dir, digest)
+    dst = os.path.join(folder, digest + _ext(src_path))
+    if not os.path.exists(dst):
+        os.makedirs(folder, exist_ok=True)
+        tmp = f"{dst}.{os.getpid()}.tmp"
+        shutil.copy(src_path, tmp)
+        os.replace(tmp, dst)
+    _make_thumbnails(dst)
+    return dst
+
+
+# ---------- البحث ----------
+def thumbnail_path(image_path, kind="ui", images_dir=None):
+    """
+    مسار المصغرة من النوع kind لصورة مخزنة (أو None إن لم توجد الصورة).
+    صورة قديمة (خارج المخزن) تُنسخ إليه أول مرة؛ images_dir افتراضياً مجلد الصورة نفسها.
+    """
+    if not image_path or not os.path.exists(image_path):
+        return None
+    original = image_path
+    if not _HASHED.match(os.path.basename(image_path)):
+        original = _known.get(image_path)
+        if original is None or not os.path.exists(original):
+            original = store_image_file(image_path, images_dir or os.path.dirname(os.path.abspath(image_path)))
+            _known[image_path] = original
+    thumb = _thumb_file(original, kind)
+    if not os.path.exists(thumb):
+        _make_thumbnails(original)
+    return thumb if os.path.exists(thumb) else None
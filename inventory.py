@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+inventory.py
+لقطة المخزون في الذاكرة (لكل عملية ولكل ملف قاعدة بيانات) مع تنبيهات نقص المخزون
+- المخزون = products.qty (العمود quantity نسخة منه لتطبيق Streamlit، services.adjust_stock يعدلهما معاً)
+- حد إعادة الطلب لكل منتج في products.reorder_level (DEFAULT_REORDER_LEVEL إن كان فارغاً)
+- Triggers على products تكتب رقم المنتج المتغير في inventory_log؛ refresh يقرأ فقط ما بعد آخر seq
+  ويحدّث الإجماليات (الكمية، القيمة بسعر الشراء وسعر البيع، الناقص، النافد) بـ O(1) لكل تغيير
+  — فتظهر كتابات التطبيق الآخر وخادم الـ API أيضاً
+- reconcile: مراجعة دورية (كل RECONCILE_INTERVAL ثانية عند refresh) تقارن اللقطة بالجدول كاملاً وتصلحها
+"""
+
+import threading
+import time
+
+DEFAULT_REORDER_LEVEL = 5
+RECONCILE_INTERVAL = 600   # ثوانٍ بين المراجعات الكاملة
+LOG_KEEP = 10000           # آخر التغييرات المحفوظة في inventory_log (اللقطة الأقدم تُعاد تحميلها كاملة)
+_FIELDS = "id, name, IFNULL(qty, 0), IFNULL(cost_price, 0), IFNULL(sell_price, 0), reorder_level"
+
+
+# ---------- الجدول والـ Triggers ----------
+def ensure_inventory_log(conn, commit=True):
+    """ينشئ inventory_log والـ Triggers على products (تستدعيه migrations.py)."""
+    cur = conn.cursor()
+    cur.execute("""CREATE TABLE IF NOT EXISTS inventory_log (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    product_id INTEGER NOT NULL)""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS products_inventory_ai AFTER INSERT ON products BEGIN
+                    INSERT INTO inventory_log (product_id) VALUES (NEW.id);
+                    END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS products_inventory_au
+                    AFTER UPDATE OF name, qty, cost_price, sell_price, reorder_level ON products
+                    WHEN OLD.name IS NOT NEW.name OR OLD.qty IS NOT NEW.qty OR OLD.cost_price IS NOT NEW.cost_price
+                      OR OLD.sell_price IS NOT NEW.sell_price OR OLD.reorder_level IS NOT NEW.reorder_level BEGIN
+                    INSERT INTO inventory_log (product_id) VALUES (NEW.id);
+                    END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS products_inventory_ad AFTER DELETE ON products BEGIN
+                    INSERT INTO inventory_log (product_id) VALUES (OLD.id);
+                    END""")
+    # trims the log every 1000 changes, so it stays at LOG_KEEP rows without a separate job
+    cur.execute(f"""CREATE TRIGGER IF NOT EXISTS inventory_log_trim AFTER INSERT ON inventory_log
+                    WHEN NEW.seq % 1000 = 0 BEGIN
+                    DELETE FROM inventory_log WHERE seq <= NEW.seq - {LOG_KEEP};
+                    END""")
+    if commit:
+        conn.commit()
+
+
+# ---------- اللقطة ----------
+class InventorySnapshot:
+    """
+    snap.refresh(cur)  ثم  snap.totals() / snap.low_stock() / snap.stock(product_id)
+    refresh آمن من عدة threads (DbWorker) ويعيد عدد المنتجات التي تغيرت.
+    """
+
+    def __init__(self, default_level=DEFAULT_REORDER_LEVEL, reconcile_interval=RECONCILE_INTERVAL):
+        self.default_level = default_level
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._items = {}       # id -> (name, qty, cost, sell, level)
+        self._low = set()
+        self._seq = None       # آخر seq مطبق من inventory_log (None = لم تُحمّل بعد)
+        self._units = 0
+        self._value_cost = 0.0
+        self._value_sell = 0.0
+        self._out = 0
+        self._last_reconcile = 0.0
+        self.last_report = None
+
+    # ---------- التحديث ----------
+    def _apply(self, pid, row):
+        """يستبدل بيانات منتج (أو يحذفه إن كان row = None) ويعدل الإجماليات: O(1)."""
+        old = self._items.pop(pid, None)
+        if old is not None:
+            self._contribute(old, -1)
+            self._low.discard(pid)
+        if row is None:
+            return
+        item = (row[0], int(row[1]), float(row[2]), float(row[3]), self.default_level if row[4] is None else int(row[4]))
+        self._items[pid] = item
+        self._contribute(item, 1)
+        if item[1] <= item[4]:
+            self._low.add(pid)
+
+    def _contribute(self, item, sign):
+        qty = max(item[1], 0)
+        self._units += sign * qty
+        self._value_cost += sign * qty * item[2]
+        self._value_sell += sign * qty * item[3]
+        self._out += sign * (item[1] <= 0)
+
+    def _load_all(self, cur):
+        cur.execute("SELECT IFNULL(MAX(seq), 0) FROM inventory_log")
+        seq = cur.fetchone()[0]
+        cur.execute(f"SELECT {_FIELDS} FROM products")
+        rows = cur.fetchall()
+        self._items, self._low = {}, set()
+        self._units, self._value_cost, self._value_sell, self._out = 0, 0.0, 0.0, 0
+        for r in rows:
+            self._apply(r[0], r[1:])
+        self._seq = seq
+        return len(rows)
+
+    def refresh(self, cur):
+        """يطبق التغييرات منذ آخر refresh (أو يحمّل الكل أول مرة)، ويشغل reconcile إن حان وقتها."""
+        with self._lock:
+            if self._seq is None:
+                changed = self._load_all(cur)
+                self._last_reconcile = time.monotonic()
+                return changed
+            cur.execute("SELECT MIN(seq), MAX(seq) FROM inventory_log")
+            lo, hi = cur.fetchone()
+            if hi is None or hi <= self._seq:
+                changed = 0
+            elif lo > self._seq + 1:
+                changed = self._load_all(cur)  # older changes were trimmed from the log
+            else:
+                cur.execute("SELECT DISTINCT product_id FROM inventory_log WHERE seq > ? AND seq <= ?", (self._seq, hi))
+                ids = [r[0] for r in cur.fetchall()]
+                for i in range(0, len(ids), 500):
+                    chunk = ids[i:i + 500]
+                    cur.execute(f"SELECT {_FIELDS} FROM products WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+                    found = {r[0]: r[1:] for r in cur.fetchall()}
+                    for pid in chunk:
+                        self._apply(pid, found.get(pid))
+                self._seq = hi
+                changed = len(ids)
+            due = time.monotonic() - self._last_reconcile >= self.reconcile_interval
+        if due:
+            self.reconcile(cur)
+        return changed
+
+    def reconcile(self, cur):
+        """
+        يقارن اللقطة بجدول products كاملاً ويصحح أي اختلاف (لا يجب أن يوجد إلا إذا عُدل الجدول
+        بدون الـ Triggers). يعيد التقرير: عدد المنتجات والاختلافات وفرق الإجماليات.
+        """
+        with self._lock:
+            before = (dict(self._items), self._units, self._value_cost, self._value_sell)
+            t0 = time.perf_counter()
+            self._load_all(cur)
+            mismatched = [pid for pid in set(before[0]) | set(self._items) if before[0].get(pid) != self._items.get(pid)]
+            self._last_reconcile = time.monotonic()
+            self.last_report = {
+                "at": time.strftime("%Y-%m-%d %H:%M:%S"), "products": len(self._items),
+                "mismatched": len(mismatched), "mismatched_ids": sorted(mismatched)[:20],
+                "units_diff": self._units - before[1], "value_cost_diff": round(self._value_cost - before[2], 2),
+                "value_sell_diff": round(self._value_sell - before[3], 2),
+                "ms": round((time.perf_counter() - t0) * 1000, 1)}
+            report = self.last_report
+        if report["mismatched"]:
+            print("inventory reconcile:", report)
+        return report
+
+    # ---------- القراءة ----------
+    def totals(self):
+        with self._lock:
+            return {"products": len(self._items), "units": self._units, "value_cost": round(self._value_cost, 2),
+                    "value_sell": round(self._value_sell, 2), "low_stock": len(self._low), "out_of_stock": self._out,
+                    "last_reconcile": self.last_report}
+
+    def low_stock(self, limit=None):
+        """المنتجات التي وصلت إلى حد إعادة الطلب أو أقل، الأبعد عن الحد أولاً."""
+        with self._lock:
+            rows = [{"id": pid, "name": self._items[pid][0], "qty": self._items[pid][1],
+                     "reorder_level": self._items[pid][4]} for pid in self._low]
+        rows.sort(key=lambda r: (r["qty"] - r["reorder_level"], r["qty"], r["id"]))
+        return rows[:limit] if limit else rows
+
+    def stock(self, product_id):
+        with self._lock:
+            item = self._items.get(product_id)
+        return None if item is None else {"id": product_id, "name": item[0], "qty": item[1],
+                                          "cost_price": item[2], "sell_price": item[3], "reorder_level": item[4]}
+
+
+# ---------- لقطة لكل ملف قاعدة بيانات ----------
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def snapshot_for(cur):
+    """اللقطة المشتركة في هذه العملية لملف قاعدة البيانات المفتوح في cur (بدون refresh)."""
+    cur.execute("PRAGMA database_list")
+    path = next((r[2] for r in cur.fetchall() if r[1] == "main"), "")
+    with _snapshots_lock:
+        snap = _snapshots.get(path)
+        if snap is None:
+            snap = _snapshots[path] = InventorySnapshot()
+    return snap
+
+
+def inventory_view(cur, limit=20):
+    """refresh ثم {الإجماليات + أول limit من المنتجات الناقصة} — للوحة التحكم والـ API."""
+    snap = snapshot_for(cur)
+    snap.refresh(cur)
+    view = snap.totals()
+    view["low_stock_items"] = snap.low_stock(limit)
+    return view
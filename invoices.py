@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+invoices.py
+رسم فواتير PDF لعمليات البيع (جدول sales) + توليد دفعات فواتير على عدة عمليات (process pool)
+- draw_invoice: فاتورة من عدة أصناف على قالب ثابت (form XObject) يُبنى مرة واحدة لكل ملف،
+  و draw_sale_invoice لعملية بيع واحدة (يستخدمها create_invoice_pdf)
+- الصور (صورة المنتج + الشعار) تُؤخذ من مصغرات image_store وتُفك مرة واحدة لكل عملية في الدفعة
+- النص العربي بخط TTF مسجل مرة واحدة ومُشكّل عبر arabic_text (مع ذاكرة مؤقتة)
+- generate_invoices: فاتورة لكل طلب (كل أصنافه) لمجموعة أرقام عمليات أو لفترة زمنية، ملف لكل فاتورة أو ملف واحد مدمج
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen import canvas
+from PIL import Image
+
+from arabic_text import register_fonts, shape
+from db import connect
+from image_store import thumbnail_path
+from sales_archive import archived_rows
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+PRODUCT_IMAGE_BOX = 180
+LOGO_BOX = 70
+IMAGE_DPI_SCALE = 2  # الصورة المضمنة بدقة ضعف حجم الإطار فقط بدلاً من الأصل الكامل
+
+SALE_INVOICE_SQL = """SELECT s.id, s.sold_at, s.product_id, s.product_name, s.quantity, s.unit_sell, s.total, s.cost_total,
+                             s.net_profit, s.customer_name, s.customer_phone, s.customer_address, p.image_path, s.order_id
+                      FROM sales s LEFT JOIN products p ON p.id = s.product_id"""
+SALE_INVOICE_FIELDS = ("id", "sold_at", "product_id", "product_name", "quantity", "unit_sell", "total", "cost_total",
+                       "net_profit", "customer_name", "customer_phone", "customer_address", "image_path", "order_id")
+
+
+# ---------- الصور ----------
+_image_cache = {}
+
+
+def cached_image(path, box, kind="invoice"):
+    """ImageReader لمصغرة الصورة (image_store) بحجم لا يتجاوز box*IMAGE_DPI_SCALE، محفوظة في الذاكرة لكل (مسار، حجم)."""
+    if not path or not os.path.exists(path):
+        return None
+    key = (path, box)
+    if key not in _image_cache:
+        try:
+            im = Image.open(thumbnail_path(path, kind) or path)
+            im.thumbnail((box * IMAGE_DPI_SCALE, box * IMAGE_DPI_SCALE))
+            if im.mode not in ("RGB", "L"):
+                im = im.convert("RGB")
+            _image_cache[key] = ImageReader(im)
+        except Exception:
+            _image_cache[key] = None
+    return _image_cache[key]
+
+
+def clear_image_cache():
+    _image_cache.clear()
+
+
+# ---------- قالب الفاتورة ----------
+# الأجزاء الثابتة (الشعار، اسم المتجر، العناوين، إطار الجدول، التذييل) تُرسم مرة واحدة لكل ملف PDF
+# كـ form XObject، وكل فاتورة تستدعيه (doForm) ثم ترسم قيمها فقط.
+PAGE_W, PAGE_H = A4
+MARGIN = 40
+ROW_H = 18
+ITEMS_PER_PAGE = 12
+TABLE_TOP = PAGE_H - 200                          # سطر عناوين الأعمدة
+TABLE_BOTTOM = TABLE_TOP - (ITEMS_PER_PAGE + 1) * ROW_H + 6
+TOTALS_TOP = TABLE_BOTTOM - 20
+# (العنوان، x، المحاذاة) من اليمين لليسار
+COLUMNS = [("المنتج", PAGE_W - MARGIN - 8, "right"), ("الكمية", 300, "center"),
+           ("سعر الوحدة", 210, "center"), ("الإجمالي", 100, "center")]
+# (العنوان، y) — القيمة تُكتب يسار العنوان
+HEADER_FIELDS = [("التاريخ:", PAGE_H - 80), ("الاسم:", PAGE_H - 125), ("الهاتف:", PAGE_H - 140), ("العنوان:", PAGE_H - 155)]
+TOTAL_FIELDS = [("إجمالي البيع:", TOTALS_TOP), ("تكلفة الإجمالي:", TOTALS_TOP - 15), ("صافي الربح:", TOTALS_TOP - 30)]
+USE_TEMPLATE = True  # False: يرسم الأجزاء الثابتة في كل صفحة (للمقارنة في benchmarks/bench_invoices.py)
+_value_x = {}  # label -> x لبداية القيمة (يسار العنوان)
+
+
+def _value_right(label, font, size=10):
+    key = (label, font, size)
+    if key not in _value_x:
+        _value_x[key] = PAGE_W - MARGIN - pdfmetrics.stringWidth(shape(label), font, size) - 4
+    return _value_x[key]
+
+
+def _static_form(c, logo_path):
+    """اسم الـ form الثابت لهذا الملف (يُبنى أول مرة فقط لكل canvas وشعار)."""
+    name = f"invoice_static_{abs(hash(logo_path or '')):x}"
+    if not c.hasForm(name):
+        c.beginForm(name)
+        _draw_static(c, logo_path)
+        c.endForm()
+    return name
+
+
+def _draw_static(c, logo_path):
+    """الأجزاء الثابتة من الفاتورة (نفسها في كل صفحة)."""
+    regular, bold = register_fonts()
+    logo = cached_image(logo_path, LOGO_BOX, kind="ui")
+    if logo:
+        c.drawImage(logo, MARGIN, PAGE_H - MARGIN - LOGO_BOX, width=LOGO_BOX, height=LOGO_BOX,
+                    preserveAspectRatio=True, mask="auto")
+    c.setFont(bold, 16)
+    c.drawRightString(PAGE_W - MARGIN, PAGE_H - 60, shape("بيت الياسمين للعطور"))
+    c.setFont(bold, 12)
+    c.drawRightString(PAGE_W - MARGIN, PAGE_H - 110, shape("بيانات المستلم:"))
+    c.setFont(regular, 10)
+    for label, y in HEADER_FIELDS + TOTAL_FIELDS:
+        c.drawRightString(PAGE_W - MARGIN, y, shape(label))
+    c.drawString(MARGIN, PAGE_H - 140, shape("فاتورة رقم:"))
+    # items table
+    c.setFillGray(0.93)
+    c.rect(MARGIN, TABLE_TOP - 6, PAGE_W - 2 * MARGIN, ROW_H, stroke=0, fill=1)
+    c.setFillGray(0)
+    c.rect(MARGIN, TABLE_BOTTOM, PAGE_W - 2 * MARGIN, TABLE_TOP + ROW_H - 6 - TABLE_BOTTOM, stroke=1, fill=0)
+    c.setFont(bold, 10)
+    for label, x, align in COLUMNS:
+        _draw_cell(c, x, TABLE_TOP, shape(label), align)
+    c.setFont(regular, 10)
+    c.drawString(MARGIN, 60, shape("شكراً لتعاملكم مع بيت الياسمين للعطور"))
+
+
+def _draw_cell(c, x, y, text, align):
+    if align == "right":
+        c.drawRightString(x, y, text)
+    elif align == "center":
+        c.drawCentredString(x, y, text)
+    else:
+        c.drawString(x, y, text)
+
+
+def draw_invoice(c, header, items, logo_path=None):
+    """
+    يرسم فاتورة من عدة أصناف على الـ canvas (بدون showPage للصفحة الأخيرة / save).
+    header: dict فيه id, sold_at, customer_name, customer_phone, customer_address
+    items: قائمة dict فيها product_name, quantity, unit_sell, total, cost_total, net_profit (و image_path اختيارياً)
+    أكثر من ITEMS_PER_PAGE صنف تُكمل في صفحات تالية، والإجماليات في الصفحة الأخيرة.
+    """
+    regular, _bold = register_fonts()
+    form = _static_form(c, logo_path) if USE_TEMPLATE else None
+    pages = [items[i:i + ITEMS_PER_PAGE] for i in range(0, len(items), ITEMS_PER_PAGE)] or [[]]
+    for page_no, page_items in enumerate(pages):
+        if page_no:
+            c.showPage()
+        if form:
+            c.doForm(form)
+        else:
+            _draw_static(c, logo_path)
+        c.setFont(regular, 10)
+        values = [header.get("sold_at"), header.get("customer_name"), header.get("customer_phone"), header.get("customer_address")]
+        for (label, y), value in zip(HEADER_FIELDS, values):
+            c.drawRightString(_value_right(label, regular), y, shape(value or ""))
+        c.drawString(MARGIN + 60, PAGE_H - 140, f"{header.get('id', '')}")
+        y = TABLE_TOP
+        for item in page_items:
+            y -= ROW_H
+            cells = [shape(item["product_name"]), f"{item['quantity']}", f"{item['unit_sell']:.2f}", f"{item['total']:.2f}"]
+            for (_label, x, align), text in zip(COLUMNS, cells):
+                _draw_cell(c, x, y, text, align)
+    totals = [sum(float(i[k] or 0) for i in items) for k in ("total", "cost_total", "net_profit")]
+    for (label, y), value in zip(TOTAL_FIELDS, totals):
+        c.drawRightString(_value_right(label, regular), y, f"{value:.2f}")
+    # image of the first item, under the totals
+    try:
+        img = cached_image(items[0].get("image_path") if items else None, PRODUCT_IMAGE_BOX)
+        if img:
+            c.drawImage(img, MARGIN, TOTALS_TOP - 40 - PRODUCT_IMAGE_BOX, width=PRODUCT_IMAGE_BOX,
+                        height=PRODUCT_IMAGE_BOX, preserveAspectRatio=True)
+    except Exception:
+        pass
+
+
+def draw_sale_invoice(c, sale_row, logo_path=None):
+    """فاتورة عملية بيع واحدة (صف من جدول sales = صنف واحد) على الصفحة الحالية."""
+    draw_invoice(c, sale_row, [sale_row], logo_path)
+
+
+def invoice_filename(sale_row):
+    name = str(sale_row.get("customer_name") or "").replace(os.sep, "_").replace("/", "_")
+    return f"فاتورة_{sale_row['id']}_{name}.pdf"
+
+
+def group_invoices(rows):
+    """صفوف الأسطر (مرتبة برقم الطلب) -> [(رأس الفاتورة، الأصناف)]: فاتورة واحدة لكل طلب برقم الطلب."""
+    invoices = []
+    for row in rows:
+        order_id = row.get("order_id") or row["id"]
+        if invoices and invoices[-1][0]["id"] == order_id:
+            invoices[-1][1].append(row)
+        else:
+            invoices.append((dict(row, id=order_id), [row]))
+    return invoices
+
+
+# ---------- الدفعات ----------
+def fetch_sale_rows(db_path, sale_ids=None, date_from=None, date_to=None):
+    """أسطر الفواتير (dict) لأرقام عمليات محددة أو لفترة [date_from, date_to) على sold_at، مرتبة بالطلب
+    (تشمل الأشهر المؤرشفة)."""
+    conn = connect(db_path, readonly=True)
+    try:
+        sql, params = SALE_INVOICE_SQL + " WHERE 1=1", []
+        if sale_ids is not None:
+            ids = [int(i) for i in sale_ids]
+            if not ids:
+                return []
+            sql += f" AND s.id IN ({','.join('?' * len(ids))})"
+            params += ids
+        if date_from:
+            sql += " AND s.sold_at >= ?"
+            params.append(date_from)
+        if date_to:
+            sql += " AND s.sold_at < ?"
+            params.append(date_to)
+        sql += " ORDER BY s.order_id, s.id"
+        rows = [dict(zip(SALE_INVOICE_FIELDS, r)) for r in conn.execute(sql, params)]
+        archived = archived_rows(conn.cursor(), SALE_INVOICE_FIELDS[:-2] + ("order_id",), date_from, date_to, sale_ids)
+        if archived:
+            images = dict(conn.execute("SELECT id, image_path FROM products"))
+            rows += [dict(zip(SALE_INVOICE_FIELDS[:-2] + ("order_id",), r)) for r in archived]
+            for row in rows:
+                row.setdefault("image_path", images.get(row["product_id"]))
+            rows.sort(key=lambda row: (row["order_id"], row["id"]))
+        return rows
+    finally:
+        conn.close()
+
+
+def _init_worker():
+    clear_image_cache()
+    register_fonts()
+
+
+def _render_files(invoices, out_dir, logo_path):
+    paths = []
+    for header, items in invoices:
+        path = os.path.join(out_dir, invoice_filename(header))
+        c = canvas.Canvas(path, pagesize=A4)
+        draw_invoice(c, header, items, logo_path)
+        c.save()
+        paths.append(path)
+    return paths
+
+
+def _render_merged(invoices, path, logo_path):
+    c = canvas.Canvas(path, pagesize=A4)
+    for header, items in invoices:
+        draw_invoice(c, header, items, logo_path)
+        c.showPage()
+    c.save()
+    return [path]
+
+
+def _chunks(rows, size):
+    for i in range(0, len(rows), size):
+        yield i // size, rows[i:i + size]
+
+
+def generate_invoices(db_path, out_dir, sale_ids=None, date_from=None, date_to=None, logo_path=None,
+                      merge_path=None, workers=None, chunk_size=100, progress=None):
+    """
+    يولد فواتير (واحدة لكل طلب بكل أصنافه) لعمليات البيع المحددة على عدة عمليات (processes).
+    merge_path: إن حُدد تُجمع كل الفواتير في ملف PDF واحد متعدد الصفحات (يعاد [merge_path]).
+    progress(done, total) يُستدعى بعد انتهاء كل دفعة. يعيد قائمة مسارات الملفات الناتجة.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    invoices = group_invoices(fetch_sale_rows(db_path, sale_ids, date_from, date_to))
+    total = len(invoices)
+    if progress:
+        progress(0, total)
+    if not invoices:
+        return []
+    if merge_path and not PYPDF_AVAILABLE:
+        # no PDF merger installed: render the combined file in this process (images still cached once)
+        clear_image_cache()
+        result = _render_merged(invoices, merge_path, logo_path)
+        if progress:
+            progress(total, total)
+        return result
+
+    parts, done = {}, 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {}
+        for idx, chunk in _chunks(invoices, chunk_size):
+            if merge_path:
+                part = os.path.join(out_dir, f".{os.path.basename(merge_path)}.part{idx:05d}.pdf")
+                fut = pool.submit(_render_merged, chunk, part, logo_path)
+            else:
+                fut = pool.submit(_render_files, chunk, out_dir, logo_path)
+            futures[fut] = (idx, len(chunk))
+        for fut in as_completed(futures):
+            idx, n = futures[fut]
+            parts[idx] = fut.result()
+            done += n
+            if progress:
+                progress(done, total)
+
+    ordered = [p for idx in sorted(parts) for p in parts[idx]]
+    if not merge_path:
+        return ordered
+    writer = PdfWriter()
+    for part in ordered:
+        for page in PdfReader(part).pages:
+            writer.add_page(page)
+    with open(merge_path, "wb") as f:
+        writer.write(f)
+    for part in ordered:
+        os.remove(part)
+    return [merge_path]
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+lookup.py
+فهرس بحث بالبادئة في الذاكرة للمنتجات والعملاء (الإكمال التلقائي في التطبيقين وخادم الـ API)
+- المنتجات باسمها بعد التوحيد (normalize_arabic) أو برقمها (لا يوجد عمود SKU: رقم المنتج هو الكود)
+- العملاء برقم الهاتف (الأرقام فقط) أو بالاسم بعد التوحيد
+- كل فهرس قائمتان مرتبتان (المفتاح، الرقم) والبحث bisect: O(log n) + عدد النتائج، بدون أي استعلام
+- يُحمّل عند أول بحث فقط؛ بعده refresh يقرأ ما تغير فقط: المنتجات من inventory_log (inventory.py)،
+  العملاء الجدد (id أكبر من آخر رقم) والمعدلون من change_log (change_feed.py)
+  — فيظهر ما أضافه add_product / add_order / create_order هنا أو في التطبيق الآخر أو خادم الـ API
+"""
+
+import re
+import threading
+from bisect import bisect_left, bisect_right
+
+from sales_search import normalize_arabic, normalize_arabic_many
+
+LIMIT = 10
+_NOT_DIGIT = re.compile(r"\D+")
+_PHONE_PUNCT = re.compile(r"[\s+\-()]+")
+_PRODUCT_FIELDS = "id, name, IFNULL(sell_price, 0), IFNULL(qty, 0)"
+_CUSTOMER_FIELDS = "id, name, phone, address"
+
+
+def name_key(text):
+    """مفتاح البحث بالاسم: نفس توحيد البحث النصي ومسافة واحدة بين الكلمات."""
+    return " ".join(normalize_arabic(text).split())
+
+
+def phone_key(text):
+    """مفتاح البحث بالهاتف: الأرقام فقط (والأرقام العربية الهندية تُحوّل إلى 0-9)."""
+    return _NOT_DIGIT.sub("", normalize_arabic(text))
+
+
+def name_keys(texts):
+    """name_key لكل النصوص دفعة واحدة (التحميل الأول)."""
+    return [" ".join(k.split()) for k in normalize_arabic_many(texts)]
+
+
+def phone_keys(texts):
+    return [_NOT_DIGIT.sub("", k) for k in normalize_arabic_many(texts)]
+
+
+class _SortedIndex:
+    """مفاتيح مرتبة (نصوص) مع رقم الصف المقابل؛ الإضافة والحذف bisect + insert في القائمتين."""
+
+    def __init__(self, keys=(), ids=()):
+        order = sorted((i for i, k in enumerate(keys) if k), key=keys.__getitem__)
+        self.keys = [keys[i] for i in order]
+        self.ids = [ids[i] for i in order]
+
+    def add(self, key, row_id):
+        if key:
+            i = bisect_right(self.keys, key)
+            self.keys.insert(i, key)
+            self.ids.insert(i, row_id)
+
+    def remove(self, key, row_id):
+        if not key:
+            return
+        i, end = bisect_left(self.keys, key), bisect_right(self.keys, key)
+        for j in range(i, end):
+            if self.ids[j] == row_id:
+                del self.keys[j], self.ids[j]
+                return
+
+    def prefix(self, prefix, limit):
+        """أرقام الصفوف التي يبدأ مفتاحها بـ prefix، بترتيب المفتاح."""
+        out = []
+        i = bisect_left(self.keys, prefix)
+        keys, n = self.keys, len(self.keys)
+        while i < n and len(out) < limit and keys[i].startswith(prefix):
+            out.append(self.ids[i])
+            i += 1
+        return out
+
+
+class LookupIndex:
+    """
+    idx.refresh(cur)  ثم  idx.products(prefix) / idx.customers(prefix) / idx.product(product_id)
+    refresh آمن من عدة threads (DbWorker) ويعيد عدد المنتجات والعملاء الذين تغيروا.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._products = {}      # id -> (name, sell_price, qty)
+        self._customers = {}     # id -> (name, phone, address)
+        self._product_names = _SortedIndex()
+        self._customer_names = _SortedIndex()
+        self._customer_phones = _SortedIndex()
+        self._product_seq = None  # آخر seq مطبق من inventory_log (None = لم تُحمّل بعد)
+        self._change_seq = None   # آخر seq مطبق من change_log
+        self._customer_max = 0    # أكبر رقم عميل محمّل
+
+    # ---------- التحميل والتحديث ----------
+    def _load_products(self, cur):
+        cur.execute("SELECT IFNULL(MAX(seq), 0) FROM inventory_log")
+        seq = cur.fetchone()[0]
+        cur.execute(f"SELECT {_PRODUCT_FIELDS} FROM products")
+        self._products = {r[0]: (r[1] or "", float(r[2]), int(r[3])) for r in cur.fetchall()}
+        self._product_names = _SortedIndex(name_keys([p[0] for p in self._products.values()]), list(self._products))
+        self._product_seq = seq
+        return len(self._products)
+
+    def _load_customers(self, cur):
+        cur.execute("SELECT IFNULL(MAX(seq), 0) FROM change_log")
+        seq = cur.fetchone()[0]
+        cur.execute(f"SELECT {_CUSTOMER_FIELDS} FROM customers")
+        self._customers = {r[0]: r[1:] for r in cur.fetchall()}
+        ids = list(self._customers)
+        self._customer_names = _SortedIndex(name_keys([c[0] for c in self._customers.values()]), ids)
+        self._customer_phones = _SortedIndex(phone_keys([c[1] for c in self._customers.values()]), ids)
+        self._customer_max = max(self._customers, default=0)
+        self._change_seq = seq
+        return len(self._customers)
+
+    def _set_product(self, pid, row):
+        old = self._products.pop(pid, None)
+        if old is not None:
+            self._product_names.remove(name_key(old[0]), pid)
+        if row is not None:
+            self._products[pid] = (row[0] or "", float(row[1]), int(row[2]))
+            self._product_names.add(name_key(row[0]), pid)
+
+    def _set_customer(self, cid, row):
+        old = self._customers.pop(cid, None)
+        if old is not None:
+            self._customer_names.remove(name_key(old[0]), cid)
+            self._customer_phones.remove(phone_key(old[1]), cid)
+        if row is not None:
+            self._customers[cid] = row
+            self._customer_names.add(name_key(row[0]), cid)
+            self._customer_phones.add(phone_key(row[1]), cid)
+            self._customer_max = max(self._customer_max, cid)
+
+    def _refresh_products(self, cur):
+        # two subqueries: MIN and MAX in one SELECT would scan the whole log instead of using the key
+        cur.execute("SELECT (SELECT MIN(seq) FROM inventory_log), (SELECT MAX(seq) FROM inventory_log)")
+        lo, hi = cur.fetchone()
+        if hi is None or hi <= self._product_seq:
+            return 0
+        if lo > self._product_seq + 1:
+            return self._load_products(cur)  # older changes were trimmed from the log
+        cur.execute("SELECT DISTINCT product_id FROM inventory_log WHERE seq > ? AND seq <= ?", (self._product_seq, hi))
+        ids = [r[0] for r in cur.fetchall()]
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            cur.execute(f"SELECT {_PRODUCT_FIELDS} FROM products WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            found = {r[0]: r[1:] for r in cur.fetchall()}
+            for pid in chunk:
+                self._set_product(pid, found.get(pid))
+        self._product_seq = hi
+        return len(ids)
+
+    def _refresh_customers(self, cur):
+        cur.execute("SELECT (SELECT MIN(seq) FROM change_log), (SELECT MAX(seq) FROM change_log)")
+        lo, hi = cur.fetchone()
+        changed = []
+        if hi is not None and hi > self._change_seq:
+            if lo > self._change_seq + 1:
+                return self._load_customers(cur)
+            # the seq range comes from the primary key; only the new log rows are read
+            cur.execute("SELECT DISTINCT row_id FROM change_log WHERE seq > ? AND seq <= ? AND tbl = 'customers'",
+                        (self._change_seq, hi))
+            changed = [r[0] for r in cur.fetchall()]
+            self._change_seq = hi
+        # new customers are inserted without a log row (customer_id in services.py): id above the last one seen
+        cur.execute(f"SELECT {_CUSTOMER_FIELDS} FROM customers WHERE id > ?", (self._customer_max,))
+        rows = cur.fetchall()
+        for i in range(0, len(changed), 500):
+            chunk = changed[i:i + 500]
+            cur.execute(f"SELECT {_CUSTOMER_FIELDS} FROM customers WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            rows += cur.fetchall()
+        for r in rows:
+            self._set_customer(r[0], r[1:])
+        return len(rows)
+
+    def refresh(self, cur):
+        """يطبق التغييرات منذ آخر refresh (أو يحمّل الكل أول مرة)."""
+        with self._lock:
+            if self._product_seq is None:
+                return self._load_products(cur) + self._load_customers(cur)
+            return self._refresh_products(cur) + self._refresh_customers(cur)
+
+    # ---------- البحث ----------
+    def products(self, prefix, limit=LIMIT):
+        """المنتجات التي يبدأ اسمها بـ prefix (بعد التوحيد)، أو المنتج بهذا الرقم إن كان prefix رقماً."""
+        key = name_key(prefix)
+        if not key:
+            return []
+        with self._lock:
+            ids = self._product_names.prefix(key, limit)
+            if key.isdigit() and int(key) in self._products and int(key) not in ids:
+                ids = [int(key)] + ids[:limit - 1]
+            return [self._product_row(pid) for pid in ids]
+
+    def product(self, product_id):
+        with self._lock:
+            return self._product_row(product_id) if product_id in self._products else None
+
+    def _product_row(self, pid):
+        name, price, qty = self._products[pid]
+        return {"id": pid, "name": name, "sell_price": price, "qty": qty}
+
+    def customers(self, prefix, limit=LIMIT):
+        """العملاء الذين يبدأ هاتفهم (إن كان prefix أرقاماً) أو اسمهم بـ prefix."""
+        compact = _PHONE_PUNCT.sub("", normalize_arabic(prefix))
+        key = name_key(prefix)
+        with self._lock:
+            if compact.isdigit():
+                ids = self._customer_phones.prefix(compact, limit)
+            elif key:
+                ids = self._customer_names.prefix(key, limit)
+            else:
+                ids = []
+            return [dict(zip(("id", "name", "phone", "address"), (cid,) + tuple(self._customers[cid]))) for cid in ids]
+
+    def sizes(self):
+        with self._lock:
+            return {"products": len(self._products), "customers": len(self._customers)}
+
+
+# ---------- فهرس لكل ملف قاعدة بيانات ----------
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def index_for(cur):
+    """الفهرس المشترك في هذه العملية لملف قاعدة البيانات المفتوح في cur (بدون refresh)."""
+    cur.execute("PRAGMA database_list")
+    path = next((r[2] for r in cur.fetchall() if r[1] == "main"), "")
+    with _indexes_lock:
+        idx = _indexes.get(path)
+        if idx is None:
+            idx = _indexes[path] = LookupIndex()
+    return idx
+
+
+def find_products(cur, prefix, limit=LIMIT):
+    """refresh ثم المنتجات المطابقة لـ prefix."""
+    idx = index_for(cur)
+    idx.refresh(cur)
+    return idx.products(prefix, limit)
+
+
+def find_customers(cur, prefix, limit=LIMIT):
+    """refresh ثم العملاء المطابقون لـ prefix (هاتف أو اسم)."""
+    idx = index_for(cur)
+    idx.refresh(cur)
+    return idx.customers(prefix, limit)
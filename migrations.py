@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+migrations.py
+ترحيل (Migration) مرقّم لقاعدة البيانات store.sqlite3 يستدعيه التطبيقان عند التشغيل
+- bayt_alyasmeen_dashboard.py (جدول sales + products)
+- streamlit_dashboard_bayt_alyasmeen_fixed.py (جدول orders + products)
+من النسخة 6 التطبيقان على نموذج واحد: customers / orders / order_lines، و sales أصبح VIEW بنفس الأعمدة،
+ومن النسخة 7 المخزون عمود واحد (qty، و quantity نسخة منه) مع حد إعادة الطلب و inventory_log،
+ومن النسخة 8 جداول بيانات أرشيف الأشهر المغلقة (sales_archive.py)،
+ومن النسخة 9 سجل التغييرات change_log للتحديث الحي للواجهات (change_feed.py)،
+ومن النسخة 10 Triggers حذف أسطر الطلبات تتخطى أرشفة شهر عبر archive_guard بدل حذفها وإعادة إنشائها.
+رقم النسخة محفوظ في PRAGMA user_version، وكل خطوة تُنفذ مرة واحدة داخل معاملة (transaction).
+"""
+
+from change_feed import ensure_change_log
+from inventory import ensure_inventory_log
+from sales_archive import ensure_sales_archive
+from sales_rollup import ensure_sales_rollup, rebuild_sales_rollup
+from sales_search import ensure_sales_fts, index_sales_rows
+
+
+# ---------- أدوات مساعدة ----------
+def table_columns(cur, table):
+    cur.execute(f"PRAGMA table_info({table})")
+    return {r[1] for r in cur.fetchall()}
+
+
+def _add_missing_columns(cur, table, columns):
+    existing = table_columns(cur, table)
+    for name, decl in columns:
+        if name not in existing:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+# ---------- الخطوات ----------
+def _m001_base_schema(cur):
+    # products is shared: the desktop app uses qty/cost_price/sell_price/description,
+    # the Streamlit app uses price/quantity. Whichever app created the table first,
+    # the other app's columns are added here.
+    cur.execute("""CREATE TABLE IF NOT EXISTS products (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT,
+                    description TEXT,
+                    qty INTEGER DEFAULT 0,
+                    cost_price REAL DEFAULT 0,
+                    sell_price REAL DEFAULT 0,
+                    image_path TEXT,
+                    price REAL DEFAULT 0,
+                    quantity INTEGER DEFAULT 0)""")
+    _add_missing_columns(cur, "products", [
+        ("description", "TEXT"),
+        ("qty", "INTEGER DEFAULT 0"),
+        ("cost_price", "REAL DEFAULT 0"),
+        ("sell_price", "REAL DEFAULT 0"),
+        ("image_path", "TEXT"),
+        ("price", "REAL DEFAULT 0"),
+        ("quantity", "INTEGER DEFAULT 0"),
+    ])
+    cur.execute("""CREATE TABLE IF NOT EXISTS sales (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sold_at TEXT,
+                    product_id INTEGER,
+                    product_name TEXT,
+                    quantity INTEGER,
+                    unit_sell REAL,
+                    unit_cost REAL,
+                    total REAL,
+                    cost_total REAL,
+                    net_profit REAL,
+                    customer_name TEXT,
+                    customer_phone TEXT,
+                    customer_address TEXT)""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS orders (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    customer TEXT,
+                    product TEXT,
+                    qty INTEGER,
+                    total REAL,
+                    date TEXT)""")
+
+
+def _m002_indexes(cur):
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sales_sold_at ON sales(sold_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sales_product_id ON sales(product_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_name ON products(name)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_date ON orders(date)")
+
+
+def _m003_sales_rollup(cur):
+    ensure_sales_rollup(cur.connection, commit=False)
+
+
+def _m004_sales_fts(cur):
+    ensure_sales_fts(cur.connection, commit=False)
+
+
+def _m005_orders_external_id(cur):
+    # imported orders keep the marketplace / POS order number so re-imports are skipped
+    _add_missing_columns(cur, "orders", [("external_id", "TEXT")])
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_external_id ON orders(external_id)")
+
+
+SALES_VIEW = """CREATE VIEW sales AS
+    SELECT l.id AS id, o.sold_at AS sold_at, l.product_id AS product_id,
+           IFNULL(l.product_name, p.name) AS product_name, l.quantity AS quantity, l.unit_sell AS unit_sell,
+           l.unit_cost AS unit_cost, l.total AS total, l.quantity * l.unit_cost AS cost_total,
+           l.total - l.quantity * l.unit_cost AS net_profit,
+           c.name AS customer_name, c.phone AS customer_phone, c.address AS customer_address,
+           l.order_id AS order_id, o.customer_id AS customer_id
+    FROM order_lines l
+    JOIN orders o ON o.id = l.order_id
+    LEFT JOIN customers c ON c.id = o.customer_id
+    LEFT JOIN products p ON p.id = l.product_id"""
+
+
+def _m006_normalized_orders(cur):
+    # One row per customer and per order; the products of an order are its order_lines.
+    # sales rows keep their id as the line id (invoices / edit windows still use it) and rows with
+    # the same sold_at + customer become one order. Streamlit orders keep their order id.
+    cur.execute("""CREATE TABLE customers (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL DEFAULT '',
+                    phone TEXT NOT NULL DEFAULT '',
+                    address TEXT NOT NULL DEFAULT '')""")
+    cur.execute("CREATE UNIQUE INDEX idx_customers_identity ON customers(name, phone, address)")
+    cur.execute("""CREATE TABLE orders_new (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    external_id TEXT,
+                    customer_id INTEGER REFERENCES customers(id),
+                    sold_at TEXT)""")
+    cur.execute("""CREATE TABLE order_lines (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    order_id INTEGER NOT NULL REFERENCES orders(id),
+                    product_id INTEGER,
+                    product_name TEXT,
+                    quantity INTEGER,
+                    unit_sell REAL,
+                    unit_cost REAL,
+                    total REAL)""")
+    cur.execute("""INSERT OR IGNORE INTO customers (name, phone, address)
+                   SELECT IFNULL(customer_name, ''), IFNULL(customer_phone, ''), IFNULL(customer_address, '') FROM sales
+                   UNION ALL SELECT IFNULL(customer, ''), '', '' FROM orders""")
+
+    # Streamlit orders: same id, one line each (no cost was recorded: the product's current cost_price)
+    cur.execute("""INSERT INTO orders_new (id, external_id, customer_id, sold_at)
+                   SELECT o.id, o.external_id, c.id, o.date FROM orders o
+                   JOIN customers c ON c.name = IFNULL(o.customer, '') AND c.phone = '' AND c.address = ''""")
+    cur.execute("SELECT IFNULL(MAX(id), 0) FROM orders_new")
+    first = cur.fetchone()[0]
+    cur.execute("SELECT IFNULL(MAX(id), 0) FROM sales")
+    last_sale = cur.fetchone()[0]
+
+    # desktop sales: one order per (sold_at, customer)
+    cur.execute("""CREATE TEMP TABLE _basket (id INTEGER PRIMARY KEY, sold_at TEXT, customer_id INTEGER,
+                                              UNIQUE (sold_at, customer_id))""")
+    customer_join = """JOIN customers c ON c.name = IFNULL(s.customer_name, '') AND c.phone = IFNULL(s.customer_phone, '')
+                                           AND c.address = IFNULL(s.customer_address, '')"""
+    cur.execute(f"""INSERT INTO temp._basket (sold_at, customer_id)
+                    SELECT IFNULL(s.sold_at, ''), c.id FROM sales s {customer_join}
+                    GROUP BY 1, 2 ORDER BY MIN(s.id)""")
+    cur.execute("INSERT INTO orders_new (id, customer_id, sold_at) SELECT ? + id, customer_id, sold_at FROM temp._basket",
+                (first,))
+    cur.execute(f"""INSERT INTO order_lines (id, order_id, product_id, product_name, quantity, unit_sell, unit_cost, total)
+                    SELECT s.id, ? + b.id, s.product_id, CASE WHEN p.name IS s.product_name THEN NULL ELSE s.product_name END,
+                           s.quantity, s.unit_sell, IFNULL(s.unit_cost, 0), s.total
+                    FROM sales s {customer_join}
+                    JOIN temp._basket b ON b.sold_at = IFNULL(s.sold_at, '') AND b.customer_id = c.id
+                    LEFT JOIN products p ON p.id = s.product_id
+                    ORDER BY s.id""", (first,))
+    cur.execute("""INSERT INTO order_lines (order_id, product_id, product_name, quantity, unit_sell, unit_cost, total)
+                   SELECT o.id, p.id, CASE WHEN p.id IS NULL THEN o.product END, o.qty,
+                          CASE WHEN o.qty > 0 THEN o.total * 1.0 / o.qty ELSE o.total END, IFNULL(p.cost_price, 0), o.total
+                   FROM orders o LEFT JOIN products p ON p.id = (SELECT MIN(id) FROM products WHERE name = o.product)
+                   ORDER BY o.id""")
+    cur.execute("DROP TABLE temp._basket")
+    cur.execute("DROP TABLE sales")
+    cur.execute("DROP TABLE orders")
+    cur.execute("ALTER TABLE orders_new RENAME TO orders")
+
+    cur.execute("CREATE UNIQUE INDEX idx_orders_external_id ON orders(external_id)")
+    cur.execute("CREATE INDEX idx_orders_sold_at ON orders(sold_at)")
+    cur.execute("CREATE INDEX idx_orders_customer_id ON orders(customer_id)")
+    cur.execute("CREATE INDEX idx_order_lines_order_id ON order_lines(order_id)")
+    cur.execute("CREATE INDEX idx_order_lines_product_id ON order_lines(product_id)")
+    cur.execute("""CREATE TRIGGER orders_delete_lines BEFORE DELETE ON orders BEGIN
+                    DELETE FROM order_lines WHERE order_id = OLD.id;
+                    END""")
+    cur.execute(SALES_VIEW)
+    # rollup / search triggers move to order_lines; the Streamlit orders are now counted and indexed too
+    # (the sales rows are already in sales_fts under the same ids)
+    ensure_sales_rollup(cur.connection, commit=False)
+    rebuild_sales_rollup(cur.connection, commit=False)
+    ensure_sales_fts(cur.connection, commit=False)
+    index_sales_rows(cur.connection, after_id=last_sale)
+
+
+def _m007_inventory(cur):
+    # stock was decremented in qty by the desktop app and in quantity by Streamlit / imports.
+    # qty becomes the stock column (quantity is kept equal to it); a product only one app
+    # maintained takes that app's value
+    _add_missing_columns(cur, "products", [("reorder_level", "INTEGER")])
+    cur.execute("""UPDATE products SET qty = quantity
+                   WHERE IFNULL(qty, 0) = 0 AND IFNULL(quantity, 0) != 0""")
+    cur.execute("UPDATE products SET qty = IFNULL(qty, 0), quantity = IFNULL(qty, 0) WHERE quantity IS NOT qty")
+    ensure_inventory_log(cur.connection, commit=False)
+
+
+def _m008_sales_archive(cur):
+    ensure_sales_archive(cur.connection, commit=False)
+
+
+def _m009_change_log(cur):
+    ensure_change_log(cur.connection, commit=False)
+
+
+def _m010_archive_guard(cur):
+    # archive_month used to drop and re-create these two triggers for every month; they are
+    # re-created once with the archive_guard condition
+    cur.execute("DROP TRIGGER IF EXISTS order_lines_rollup_ad")
+    cur.execute("DROP TRIGGER IF EXISTS order_lines_changes_ad")
+    ensure_sales_rollup(cur.connection, commit=False)
+    ensure_change_log(cur.connection, commit=False)
+
+
+MIGRATIONS = [
+    (1, "base schema", _m001_base_schema),
+    (2, "indexes on sold_at / product_id / products.name / orders.date", _m002_indexes),
+    (3, "sales_daily rollup", _m003_sales_rollup),
+    (4, "sales_fts full-text index", _m004_sales_fts),
+    (5, "orders.external_id (idempotent imports)", _m005_orders_external_id),
+    (6, "customers / orders / order_lines, sales as a view", _m006_normalized_orders),
+    (7, "single stock column, reorder_level, inventory_log", _m007_inventory),
+    (8, "sales_archive metadata for archived months", _m008_sales_archive),
+    (9, "change_log for live UI updates", _m009_change_log),
+    (10, "archive_guard condition on the order_lines delete triggers", _m010_archive_guard),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+# ---------- التشغيل ----------
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=None):
+    """يطبق الخطوات الناقصة بالترتيب حتى target (افتراضياً آخر نسخة) ويعيد رقم النسخة الحالي."""
+    target = SCHEMA_VERSION if target is None else target
+    current = schema_version(conn)
+    for version, _title, step in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+        cur = conn.cursor()
+        try:
+            # IMMEDIATE: a second process starting at the same time waits here,
+            # then sees the new user_version and skips the step
+            cur.execute("BEGIN IMMEDIATE")
+            if schema_version(conn) >= version:
+                conn.rollback()
+                current = version
+                continue
+            step(cur)
+            cur.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        current = version
+    return current
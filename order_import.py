@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+order_import.py
+استيراد طلبات بالجملة (تصدير منصات البيع / نقاط البيع) إلى جداول customers / orders / order_lines
+- ملفات CSV / XLSX / JSONL، وكل صف يُتحقق منه قبل الإدراج
+- الصفوف المتتالية بنفس external_id أصناف في نفس الطلب
+- executemany داخل معاملة واحدة لكل دفعة، وخصم المخزون مجمّعاً لكل منتج مرة واحدة في الدفعة
+- الاستيراد idempotent: رقم الطلب الخارجي (external_id) فريد، فإعادة تشغيل نفس الملف لا تكرر الطلبات
+
+التشغيل:
+    python order_import.py orders.csv [--db store.sqlite3] [--batch 5000]
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime
+
+from db import connect, run_in_transaction
+from migrations import migrate
+
+BATCH_SIZE = 5000
+DATE_FORMAT = "%Y-%m-%d %H:%M"  # نفس صيغة add_order في تطبيق Streamlit
+# أسماء أعمدة بديلة شائعة في ملفات التصدير -> اسم الحقل
+ALIASES = {
+    "order_id": "external_id", "order_number": "external_id", "رقم الطلب": "external_id",
+    "customer_name": "customer", "العميل": "customer",
+    "product_name": "product", "المنتج": "product",
+    "quantity": "qty", "الكمية": "qty",
+    "unit_price": "price", "السعر": "price",
+    "الإجمالي": "total",
+    "created_at": "date", "التاريخ": "date",
+}
+# orders moved to sales_archive.py files keep their external_id in sales_archive_orders
+_SQL_EXISTING = """SELECT external_id, id FROM (SELECT external_id, id FROM orders
+                                               UNION ALL SELECT external_id, order_id FROM sales_archive_orders)
+                   WHERE external_id IN ({})"""
+_SQL_CUSTOMER = "INSERT OR IGNORE INTO customers (name, phone, address) VALUES (?, '', '')"
+_SQL_CUSTOMER_IDS = "SELECT name, id FROM customers WHERE phone = '' AND address = '' AND name IN ({})"
+_SQL_PRODUCTS = "SELECT name, MIN(id), cost_price FROM products WHERE name IN ({}) GROUP BY name"
+_SQL_NEXT_ORDER = """SELECT MAX(IFNULL((SELECT seq FROM sqlite_sequence WHERE name = 'orders'), 0),
+                            IFNULL((SELECT MAX(id) FROM orders), 0)) + 1"""
+_SQL_ORDER = "INSERT INTO orders (id, external_id, customer_id, sold_at) VALUES (?, ?, ?, ?)"
+_SQL_LINE = """INSERT INTO order_lines (order_id, product_id, product_name, quantity, unit_sell, unit_cost, total)
+               VALUES (?, ?, ?, ?, ?, ?, ?)"""
+_SQL_STOCK = "UPDATE products SET qty = IFNULL(qty, 0) - ?1, quantity = IFNULL(quantity, 0) - ?1 WHERE id = ?2"  # services.adjust_stock
+
+
+# ---------- قراءة الملفات ----------
+def _text(source):
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, encoding="utf-8-sig", newline="")
+    return io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+
+
+def _read_csv(source):
+    with _text(source) as f:
+        yield from csv.DictReader(f)
+
+
+def _read_jsonl(source):
+    with _text(source) as f:
+        for line in f:
+            line = line.strip()
+            yield json.loads(line) if line else {}
+
+
+def _read_xlsx(source):
+    from openpyxl import load_workbook
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        headers = [str(h or "").strip() for h in next(rows, [])]
+        for row in rows:
+            yield dict(zip(headers, row))
+    finally:
+        wb.close()
+
+
+READERS = {".csv": _read_csv, ".jsonl": _read_jsonl, ".xlsx": _read_xlsx}
+
+
+def read_rows(source, name=None):
+    """صفوف الملف كـ dict. source مسار أو ملف ثنائي مفتوح (رفع Streamlit)، والنوع من امتداد name."""
+    ext = os.path.splitext(name or str(source))[1].lower()
+    if ext not in READERS:
+        raise ValueError(f"unsupported file type: {ext or name}")
+    return READERS[ext](source)
+
+
+# ---------- التحقق ----------
+def _parse_date(value):
+    if value in (None, ""):
+        return datetime.now().strftime(DATE_FORMAT)
+    if isinstance(value, datetime):
+        return value.strftime(DATE_FORMAT)
+    return datetime.fromisoformat(str(value).strip().replace("/", "-")).strftime(DATE_FORMAT)
+
+
+def validate_row(raw):
+    """يحول صف الملف إلى (external_id, customer, product, qty, total, date) أو يرفع ValueError."""
+    row = {}
+    for k, v in raw.items():
+        if k is not None:
+            key = str(k).strip().lower()
+            row[ALIASES.get(key, key)] = v
+    ext_id = str(row.get("external_id") or "").strip()
+    product = str(row.get("product") or "").strip()
+    if not ext_id:
+        raise ValueError("external_id مفقود")
+    if not product:
+        raise ValueError("product مفقود")
+    try:
+        qty = float(row.get("qty") or 0)
+    except ValueError:
+        qty = -1
+    if qty <= 0 or qty != int(qty):
+        raise ValueError(f"كمية غير صحيحة: {row.get('qty')}")
+    qty = int(qty)
+    if row.get("total") not in (None, ""):
+        total = float(row["total"])
+    elif row.get("price") not in (None, ""):
+        total = float(row["price"]) * qty
+    else:
+        raise ValueError("total أو price مفقود")
+    if total < 0:
+        raise ValueError(f"إجمالي سالب: {total}")
+    try:
+        when = _parse_date(row.get("date"))
+    except ValueError:
+        raise ValueError(f"تاريخ غير صحيح: {row.get('date')}")
+    return ext_id, str(row.get("customer") or "").strip(), product, qty, total, when
+
+
+# ---------- الإدراج ----------
+def _lookup(cur, sql, keys):
+    """{key: باقي الأعمدة} لاستعلام IN على دفعات من 500."""
+    keys, found = list(keys), {}
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        cur.execute(sql.format(",".join("?" * len(chunk))), chunk)
+        found.update((r[0], r[1:]) for r in cur.fetchall())
+    return found
+
+
+def _insert_batch(cur, batch):
+    """
+    batch: {external_id: [صفوف validate_row]}. يدرج الطلبات الجديدة فقط (رأس + سطر لكل صف)
+    ويخصم المخزون مجمّعاً لكل منتج. يعيد عدد الصفوف المدرجة.
+    """
+    existing = _lookup(cur, _SQL_EXISTING, batch)
+    new = [(ext_id, rows) for ext_id, rows in batch.items() if ext_id not in existing]
+    if not new:
+        return 0
+    names = {rows[0][1] for _ext_id, rows in new}
+    cur.executemany(_SQL_CUSTOMER, [(n,) for n in names])
+    customers = _lookup(cur, _SQL_CUSTOMER_IDS, names)
+    products = _lookup(cur, _SQL_PRODUCTS, {r[2] for _ext_id, rows in new for r in rows})
+    cur.execute(_SQL_NEXT_ORDER)
+    next_id = cur.fetchone()[0]
+    orders, lines, stock = [], [], Counter()
+    for order_id, (ext_id, rows) in enumerate(new, start=next_id):
+        orders.append((order_id, ext_id, customers[rows[0][1]][0], rows[0][5]))
+        for _ext_id, _customer, product, qty, total, _when in rows:
+            product_id, unit_cost = products.get(product, (None, 0))
+            lines.append((order_id, product_id, None if product_id else product, qty, total / qty,
+                          float(unit_cost or 0), total))
+            if product_id:
+                stock[product_id] += qty
+    cur.executemany(_SQL_ORDER, orders)
+    cur.executemany(_SQL_LINE, lines)
+    cur.executemany(_SQL_STOCK, [(q, pid) for pid, q in stock.items()])
+    return len(lines)
+
+
+def import_orders(conn, rows, batch_size=BATCH_SIZE, progress=None):
+    """
+    rows: صفوف dict (من read_rows). كل دفعة في معاملة واحدة (db.run_in_transaction).
+    الأعداد (inserted / duplicates) بالصفوف، والصف = صنف في طلب.
+    يعيد dict: read, inserted, duplicates, invalid, errors [(رقم الصف في البيانات، السبب)], seconds, rows_per_sec.
+    """
+    t0 = time.perf_counter()
+    report = {"read": 0, "inserted": 0, "duplicates": 0, "invalid": 0, "errors": []}
+    batch, seen, last = {}, set(), None
+
+    def flush():
+        inserted = run_in_transaction(conn, lambda cur: _insert_batch(cur, batch))
+        report["inserted"] += inserted
+        report["duplicates"] += sum(len(rows) for rows in batch.values()) - inserted
+        batch.clear()
+        if progress:
+            progress(report["read"], None)
+
+    for line, raw in enumerate(rows, start=1):
+        report["read"] += 1
+        try:
+            row = validate_row(raw)
+        except (ValueError, TypeError) as e:
+            report["invalid"] += 1
+            if len(report["errors"]) < 100:
+                report["errors"].append((line, str(e)))
+            continue
+        if row[0] == last and row[0] in batch:  # another line of the same order
+            batch[row[0]].append(row)
+            continue
+        last = row[0]
+        if row[0] in seen:  # repeated later in the same file, whichever batch the first one is in
+            report["duplicates"] += 1
+            continue
+        if len(batch) >= batch_size:  # flush only between orders
+            flush()
+        seen.add(row[0])
+        batch[row[0]] = [row]
+    if batch:
+        flush()
+    report["seconds"] = time.perf_counter() - t0
+    report["rows_per_sec"] = report["read"] / report["seconds"] if report["seconds"] else 0.0
+    return report
+
+
+def import_file(db_path, path, batch_size=BATCH_SIZE, progress=None):
+    conn = connect(db_path)
+    try:
+        migrate(conn)
+        return import_orders(conn, read_rows(path), batch_size, progress)
+    finally:
+        conn.close()
+
+
+# ---------- سطر الأوامر ----------
+def main():
+    ap = argparse.ArgumentParser(description="استيراد طلبات من CSV / XLSX / JSONL")
+    ap.add_argument("file")
+    ap.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "store.sqlite3"))
+    ap.add_argument("--batch", type=int, default=BATCH_SIZE)
+    args = ap.parse_args()
+
+    r = import_file(args.db, args.file, args.batch,
+                    progress=lambda done, total: print(f"\r{done} rows", end="", flush=True))
+    print()
+    print(f"read {r['read']}  inserted {r['inserted']}  duplicates {r['duplicates']}  invalid {r['invalid']}")
+    print(f"{r['seconds']:.2f}s  {r['rows_per_sec']:.0f} rows/s")
+    for line, msg in r["errors"][:20]:
+        print(f"  row {line}: {msg}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+paged_tree.py
+جدول (Treeview) بنافذة عرض متحركة لصفحتي الطلبات والتقارير
+- يجلب فقط الصفوف الظاهرة + هامش مسبق (prefetch) أثناء التمرير
+- ترقيم بالمفتاح (keyset: id < آخر id) عند التمرير المتتالي، و OFFSET عند القفز بشريط التمرير
+- يعيد استخدام نفس عناصر الـ Treeview بدل حذفها وإنشائها من جديد
+- الذاكرة ثابتة مهما كان عدد الصفوف
+- الجلب يتم في الخلفية عبر DbWorker (db_worker.py)، والجدول يُحدَّث عند وصول النتيجة
+- name: يُسجل زمن التحميل (من reload حتى عرض أول نافذة) في profiling
+- المصدر استعلام SQL، أو كائن فيه count(cur) و fetch(cur, plan) مثل sales_archive.SalesQuery (الحي + الأرشيف)
+- apply_changes: تغييرات change_feed تُطبق على الصفوف المحملة في مكانها (بدون إعادة تحميل الصفحة)
+- إن أعاد الجلب صفوفاً أقل من العدد الكلي المتوقع يُصحَّح العدد إلى ما وُجد فعلاً (لا جلب متكرر بلا نهاية)،
+  وخطأ الجلب يظهر للمستخدم ويسمح بالمحاولة مجدداً عند التمرير
+"""
+
+import time
+from tkinter import VERTICAL, messagebox
+
+import profiling
+
+
+class PagedTreeview:
+    """
+    tree: ttk.Treeview (عدد الصفوف الظاهرة = خاصية height)
+    scrollbar: ttk.Scrollbar عمودي يتحكم فيه هذا الكائن بدلاً من tree.yview
+    db: DbWorker
+    select_sql: "SELECT id, ... FROM table WHERE 1=1" — العمود الأول هو المفتاح (id)؛
+                أو كائن count(cur) / fetch(cur, plan) / position(cur, key) / rows_for(cur, ids) يعيد نفس الصفوف
+                (params و count_fn يُتجاهلان)
+    count_fn: دالة (cur) تعيد العدد الكلي وتعمل في الخلفية (رخيصة: من جداول التجميع أو فهرس)
+    format_row: تحوّل الصف (بدون المفتاح) إلى قيم الأعمدة المعروضة
+    on_loaded: تُستدعى بعد وصول العدد الكلي (مثلاً لتحديث عنوان "عدد الطلبات")
+    name: اسم الصفحة في قياسات profiling (اختياري)
+    on_error: تُستدعى بالخطأ إن فشل العد أو الجلب (افتراضياً رسالة خطأ)
+    """
+
+    def __init__(self, tree, scrollbar, db, select_sql, params=(), count_fn=None, format_row=None,
+                 prefetch=100, on_loaded=None, name=None, on_error=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.db = db
+        self.prefetch = prefetch
+        self.format_row = format_row or (lambda row: row)
+        self.on_loaded = on_loaded
+        self.name = name
+        self.on_error = on_error or (lambda e: messagebox.showerror("خطأ", f"تعذر تحميل الصفوف: {e}"))
+        self._t_reload = None
+        self.visible = int(tree.cget("height"))
+        self.top = 0
+        self.total = 0
+        self.loading = False
+        self.selected_key = None
+        self._slots = []
+        self._slot_keys = {}
+        self._buf_start = 0
+        self._buf = []
+        self._buf_version = 0  # changes whenever _buf / _buf_start are replaced
+        self._gen = 0
+        self._inflight = False
+        self.set_query(select_sql, params, count_fn, reload=False)
+
+        scrollbar.configure(orient=VERTICAL, command=self._on_scrollbar)
+        tree.configure(yscrollcommand=lambda *a: None)
+        tree.bind("<MouseWheel>", self._on_wheel)
+        tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        tree.bind("<Button-5>", lambda e: self.scroll(3))
+        tree.bind("<Prior>", lambda e: self.scroll(-self.visible))
+        tree.bind("<Next>", lambda e: self.scroll(self.visible))
+        tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+
+    # ---------- واجهة الاستخدام ----------
+    def set_query(self, select_sql, params=(), count_fn=None, reload=True):
+        """تغيير الاستعلام (مثلاً عند تغيير فلاتر البحث) والعودة لأول الجدول."""
+        self.select_sql = select_sql
+        self.params = list(params)
+        if isinstance(select_sql, str):
+            self.count_fn = count_fn or self._count_rows
+        else:
+            self.count_fn = select_sql.count
+        self.top = 0
+        if reload:
+            self.reload()
+
+    def reload(self):
+        """إعادة حساب العدد الكلي وجلب النافذة الحالية (بعد تعديل / حذف)."""
+        self._gen += 1
+        gen = self._gen
+        self._t_reload = time.perf_counter()
+        self.loading = True
+        self._inflight = False
+        count_fn = self.count_fn
+        self.db.submit(lambda cur: count_fn(cur), callback=lambda total: self._on_count(gen, total),
+                       errback=lambda e: self._on_error(gen, e))
+
+    def scroll(self, rows):
+        self.scroll_to(self.top + rows)
+        return "break"
+
+    def scroll_to(self, top):
+        top = max(0, min(int(top), self.total - self.visible))
+        if top != self.top:
+            self.top = top
+            self._render()
+
+    def apply_changes(self, changes):
+        """
+        تغييرات change_feed: الصفوف المحملة المعدلة تُستبدل والمحذوفة تُزال، والجديدة تظهر أعلى الجدول إن كان
+        المستخدم في أوله؛ وإلا تبقى نفس الصفوف أمامه (الموضع والعدد الكلي يُحسبان من جديد في الخلفية).
+        """
+        if self.loading or not self.tree.winfo_exists():
+            return
+        if changes["reset"] or not self._buf:
+            self.reload()
+            return
+        keys = [r[0] for r in self._buf]
+        loaded = set(keys)
+        refetch = changes["inserted"] | (changes["updated"] & loaded)
+        if changes["tables"]:
+            refetch |= loaded  # customer / product renamed or an order re-dated
+        if not (refetch or changes["deleted"]):
+            return
+        gen, version, sql, params, count_fn = self._gen, self._buf_version, self.select_sql, list(self.params), self.count_fn
+        updated, deleted = changes["updated"], changes["deleted"]
+
+        def work(cur):
+            total = count_fn(cur)
+            found = {r[0]: r for r in self._fetch_ids(cur, sql, params, refetch)}
+            # updated rows that no longer match the filter leave the table
+            survivors = [k for k in keys if k not in deleted and (k not in updated or k in found)]
+            pos = self._position(cur, sql, params, survivors[0]) if survivors else None
+            return total, found, survivors, pos
+
+        self.db.submit(work, callback=lambda result: self._on_changes(gen, version, result),
+                       errback=lambda e: self._on_error(gen, e))
+
+    def key_for(self, iid):
+        """المفتاح (id) للصف المعروض في العنصر iid."""
+        return self._slot_keys.get(iid)
+
+    def selected(self):
+        sel = self.tree.selection()
+        return self.key_for(sel[0]) if sel else None
+
+    # ---------- الجلب (في الخلفية) ----------
+    def _count_rows(self, cur):
+        cur.execute(f"SELECT COUNT(*) FROM ({self.select_sql})", self.params)
+        return cur.fetchone()[0]
+
+    def _on_count(self, gen, total):
+        if gen != self._gen or not self.tree.winfo_exists():
+            return
+        self.total = total
+        self._buf_start, self._buf = 0, []
+        self._buf_version += 1
+        self.top = max(0, min(self.top, self.total - self.visible))
+        self.loading = False
+        self._render()
+        if self.on_loaded:
+            self.on_loaded(total)
+
+    def _on_error(self, gen, e):
+        if gen != self._gen or not self.tree.winfo_exists():
+            return
+        # the next scroll or reload asks again instead of waiting for a result that never comes
+        self.loading = False
+        self._inflight = False
+        self.on_error(e)
+
+    def _plan(self):
+        """يحدد الجلب المطلوب لتغطية [top, top+visible): None إن كانت النافذة محملة بالفعل."""
+        top, n, pre = self.top, self.visible, self.prefetch
+        cap = n + 2 * pre
+        buf_end = self._buf_start + len(self._buf)
+        want_end = min(top + n, self.total)
+        if self._buf and self._buf_start <= top and want_end <= buf_end:
+            return None
+        if self._buf and buf_end <= top + n <= buf_end + cap:
+            # scrolling down: continue from the last loaded key
+            return ("after", self._buf[-1][0], top + n + pre - buf_end, cap)
+        if self._buf and self._buf_start - cap <= top < self._buf_start:
+            # scrolling up: continue from the first loaded key
+            start = max(0, top - pre)
+            return ("before", self._buf[0][0], self._buf_start - start, cap, start)
+        # jump (scrollbar drag / first load)
+        start = max(0, top - pre)
+        return ("offset", start, cap)
+
+    def _fetch_ids(self, cur, sql, params, ids):
+        if not isinstance(sql, str):
+            return sql.rows_for(cur, ids)
+        ids, rows = list(ids), []
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            cur.execute(sql + f" AND id IN ({','.join('?' * len(chunk))})", params + chunk)
+            rows += cur.fetchall()
+        return rows
+
+    def _position(self, cur, sql, params, key):
+        """عدد الصفوف قبل key في ترتيب الجدول (id تنازلياً)."""
+        if not isinstance(sql, str):
+            return sql.position(cur, key)
+        cur.execute(f"SELECT COUNT(*) FROM ({sql} AND id > ?)", params + [key])
+        return cur.fetchone()[0]
+
+    def _on_changes(self, gen, version, result):
+        if gen != self._gen or not self.tree.winfo_exists():
+            return
+        if version != self._buf_version:
+            self.reload()  # the window moved while the changes were read
+            return
+        total, found, survivors, pos = result
+        if not survivors:
+            self.reload()
+            return
+        old = {r[0]: r for r in self._buf}
+        head, last = survivors[0], survivors[-1]
+        follow = self.top == 0
+        # the first surviving row at or below the top of the view keeps its place on screen
+        alive = set(survivors)
+        anchor = next((r[0] for r in self._buf[max(0, self.top - self._buf_start):] if r[0] in alive), head)
+        rows = [found.get(k, old[k]) for k in survivors]
+        # new rows inside the loaded id range (rare: ids are AUTOINCREMENT) are merged in order
+        inside = [r for k, r in found.items() if k not in old and last < k < head]
+        if inside:
+            rows = sorted(rows + inside, key=lambda r: -r[0])
+        start = pos
+        # new rows above the loaded ones are kept only if they close the gap to the top
+        above = sorted((r for k, r in found.items() if k not in old and k > head), key=lambda r: -r[0])
+        if above and len(above) == pos:
+            rows, start = above + rows, 0
+        self._buf, self._buf_start = rows, start
+        self._buf_version += 1
+        self.total = total
+        if follow:
+            self.top = 0
+        else:
+            index = next((i for i, r in enumerate(rows) if r[0] == anchor), 0)
+            self.top = start + index
+        self.top = max(0, min(self.top, self.total - self.visible))
+        # keep the buffer at its usual size around the view
+        drop = max(0, self.top - self.prefetch - self._buf_start)
+        cap = self.visible + 2 * self.prefetch
+        self._buf_start += drop
+        self._buf = self._buf[drop:drop + cap]
+        self._render()
+        if self.on_loaded:
+            self.on_loaded(total)
+
+    def _fetch(self, cur, sql, params, plan):
+        if not isinstance(sql, str):
+            return sql.fetch(cur, plan)
+        kind = plan[0]
+        if kind == "after":
+            cur.execute(sql + " AND id < ? ORDER BY id DESC LIMIT ?", params + [plan[1], plan[2]])
+            return cur.fetchall()
+        if kind == "before":
+            cur.execute(sql + " AND id > ? ORDER BY id ASC LIMIT ?", params + [plan[1], plan[2]])
+            return cur.fetchall()[::-1]
+        cur.execute(sql + " ORDER BY id DESC LIMIT ? OFFSET ?", params + [plan[2], plan[1]])
+        return cur.fetchall()
+
+    def _request_window(self):
+        plan = self._plan()
+        if plan is None or self._inflight:
+            return plan is None
+        self._inflight = True
+        gen, sql, params = self._gen, self.select_sql, list(self.params)
+        self.db.submit(lambda cur: self._fetch(cur, sql, params, plan),
+                       callback=lambda rows: self._on_rows(gen, plan, rows),
+                       errback=lambda e: self._on_error(gen, e))
+        return False
+
+    def _on_rows(self, gen, plan, rows):
+        if gen != self._gen or not self.tree.winfo_exists():
+            return
+        self._inflight = False
+        kind = plan[0]
+        total = self.total
+        if kind == "after":
+            merged = self._buf + rows
+            drop = max(0, len(merged) - plan[3])
+            self._buf_start += drop
+            self._buf = merged[drop:]
+            if len(rows) < plan[2]:
+                # fewer rows than the count promised (deleted / archived meanwhile): the table ends here
+                total = self._buf_start + len(self._buf)
+        elif kind == "before":
+            self._buf = (rows + self._buf)[:plan[3]]
+            self._buf_start = plan[4]
+            if len(rows) < plan[2]:
+                # nothing more above: these rows start the table and every position moves up
+                shift = plan[4] + plan[2] - len(rows)
+                self._buf_start = 0
+                self.top = max(0, self.top - shift)
+                total -= shift
+        else:
+            self._buf_start, self._buf = plan[1], rows
+            if len(rows) < plan[2]:
+                total = plan[1] + len(rows)
+        self._buf_version += 1
+        if total < self.total:
+            self.total = total
+            self.top = max(0, min(self.top, self.total - self.visible))
+            if self.on_loaded:
+                self.on_loaded(total)
+        # the user may have scrolled further while this page was loading
+        self._render()
+        if self._t_reload is not None:
+            if self.name:
+                profiling.record("page", f"{self.name} (first window)", (time.perf_counter() - self._t_reload) * 1000)
+            self._t_reload = None
+
+    # ---------- العرض ----------
+    def _render(self):
+        self._update_scrollbar()
+        if self.total and not self._request_window():
+            return  # rows arrive later; keep the current items until then
+        while len(self._slots) < self.visible:
+            self._slots.append(self.tree.insert("", "end"))
+        self._slot_keys.clear()
+        select_iid = None
+        for i, iid in enumerate(self._slots):
+            idx = self.top + i - self._buf_start
+            if self.top + i < self.total and 0 <= idx < len(self._buf):
+                row = self._buf[idx]
+                self.tree.item(iid, values=self.format_row(row[1:]))
+                self.tree.move(iid, "", i)
+                self._slot_keys[iid] = row[0]
+                if row[0] == self.selected_key:
+                    select_iid = iid
+            else:
+                self.tree.detach(iid)
+        if select_iid:
+            self.tree.selection_set(select_iid)
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+    def _update_scrollbar(self):
+        if self.total <= self.visible:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.top / self.total, (self.top + self.visible) / self.total)
+
+    # ---------- الأحداث ----------
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(value) * self.total)
+        elif action == "scroll":
+            step = self.visible if unit == "pages" else 1
+            self.scroll(int(value) * step)
+
+    def _on_wheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_select(self, event=None):
+        sel = self.tree.selection()
+        if sel and sel[0] in self._slot_keys:
+            self.selected_key = self._slot_keys[sel[0]]
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+profiling.py
+قياس الأداء المدمج في التطبيقين (يُعطل بـ BAYT_PROFILE=0)
+- كل جملة SQL عبر db.connect (cur.execute / conn.execute / executemany، ومنها pandas.read_sql_query):
+  الزمن (التنفيذ + الجلب) وعدد الصفوف المجلوبة، و EXPLAIN QUERY PLAN للاستعلامات البطيئة (SLOW_MS فأكثر)
+- timed(kind, name): لبناء الصفحات والتصدير والفواتير
+- summary(): عدد / p50 / p95 / p99 / الأقصى لكل عملية (آخر SAMPLES قياس لكل منها)
+- سجل JSON اختياري (BAYT_PROFILE_LOG=مسار الملف)، سطر لكل حدث ويدور عند LOG_MAX_BYTES: الاستعلامات البطيئة فوراً
+  + ملخص كل LOG_INTERVAL ثانية وعند الخروج؛ بدونه تبقى القياسات في الذاكرة لصفحة التشخيص فقط
+"""
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from logging.handlers import RotatingFileHandler
+
+ENABLED = os.environ.get("BAYT_PROFILE", "1") != "0"
+SLOW_MS = float(os.environ.get("BAYT_PROFILE_SLOW_MS", 100))
+SAMPLES = 1000            # آخر قياسات كل عملية (لحساب النسب المئوية)
+MAX_KEYS = 500            # جمل SQL مختلفة كثيرة (مثلاً IN بطول متغير) تُجمع تحت "other"
+SLOW_KEEP = 100           # آخر الاستعلامات البطيئة المعروضة في صفحة التشخيص
+SQL_KEY_LEN = 300
+LOG_PATH = os.environ.get("BAYT_PROFILE_LOG", "")   # "" = بدون ملف سجل
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 5
+LOG_INTERVAL = 300
+
+
+# ---------- التجميع ----------
+class Profiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._rows = {}
+        self._slow = deque(maxlen=SLOW_KEEP)
+        self._logger = None
+        self._last_flush = time.monotonic()
+
+    def record(self, kind, name, ms, rows=None):
+        key = (kind, name)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                if len(self._samples) >= MAX_KEYS:
+                    key = (kind, "other")
+                samples = self._samples.setdefault(key, deque(maxlen=SAMPLES))
+            samples.append(ms)
+            if rows is not None:
+                counts = self._rows.setdefault(key, [0, 0])
+                counts[0] += 1
+                counts[1] += rows
+            due = time.monotonic() - self._last_flush >= LOG_INTERVAL
+        if due:
+            self.flush_log()
+
+    def record_slow(self, sql, ms, rows, plan):
+        entry = {"event": "slow_query", "at": time.strftime("%Y-%m-%d %H:%M:%S"), "ms": round(ms, 2),
+                 "rows": rows, "sql": sql, "plan": plan}
+        with self._lock:
+            self._slow.append(entry)
+        self._log(entry)
+
+    def summary(self):
+        """[{kind, name, count, p50_ms, p95_ms, p99_ms, max_ms, total_ms, avg_rows}] مرتبة حسب الزمن الكلي."""
+        with self._lock:
+            items = [(key, sorted(s), self._rows.get(key)) for key, s in self._samples.items()]
+        out = []
+        for (kind, name), s, counts in items:
+            n = len(s)
+            rows = round(counts[1] / counts[0], 1) if counts else None
+            pick = lambda p: round(s[min(n - 1, int(p * n))], 2)  # noqa: E731
+            out.append({"kind": kind, "name": name, "count": n, "p50_ms": pick(0.50), "p95_ms": pick(0.95),
+                        "p99_ms": pick(0.99), "max_ms": round(s[-1], 2), "total_ms": round(sum(s), 1), "avg_rows": rows})
+        out.sort(key=lambda r: r["total_ms"], reverse=True)
+        return out
+
+    def slow_queries(self):
+        with self._lock:
+            return list(self._slow)[::-1]
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._rows.clear()
+            self._slow.clear()
+
+    # ---------- السجل ----------
+    def _log(self, entry):
+        if not LOG_PATH:
+            return
+        try:
+            if self._logger is None:
+                os.makedirs(os.path.dirname(os.path.abspath(LOG_PATH)), exist_ok=True)
+                handler = RotatingFileHandler(LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS,
+                                              encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger = logging.getLogger("bayt.profile")
+                logger.propagate = False
+                logger.setLevel(logging.INFO)
+                logger.addHandler(handler)
+                self._logger = logger
+            self._logger.info(json.dumps(entry, ensure_ascii=False))
+        except OSError as e:
+            print("profile log error:", e)
+
+    def flush_log(self):
+        """يكتب ملخص النسب المئوية الحالي سطراً واحداً في السجل."""
+        self._last_flush = time.monotonic()
+        rows = self.summary()
+        if rows:
+            self._log({"event": "summary", "at": time.strftime("%Y-%m-%d %H:%M:%S"), "pid": os.getpid(),
+                       "operations": rows})
+
+
+PROFILER = Profiler()
+summary = PROFILER.summary
+slow_queries = PROFILER.slow_queries
+reset = PROFILER.reset
+flush_log = PROFILER.flush_log
+if ENABLED and LOG_PATH:
+    atexit.register(flush_log)
+
+
+def record(kind, name, ms, rows=None):
+    """يسجل قياساً واحداً (بالمللي ثانية) للعملية (kind, name)؛ لا شيء مع BAYT_PROFILE=0."""
+    if ENABLED:
+        PROFILER.record(kind, name, ms, rows)
+
+
+@contextmanager
+def timed(kind, name):
+    """with timed("page", "show_orders"): ...  — يسجل الزمن حتى لو رفع الجسم استثناء."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, name, (time.perf_counter() - t0) * 1000)
+
+
+def timed_fn(kind, name=None):
+    """مُزخرف لنفس الغرض: @timed_fn("export")."""
+    def wrap(fn):
+        label = name or fn.__name__
+
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            with timed(kind, label):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+# ---------- SQL ----------
+@lru_cache(maxsize=2048)
+def sql_key(sql):
+    return " ".join(sql.split())[:SQL_KEY_LEN]
+
+
+def explain(conn, sql, params=()):
+    """EXPLAIN QUERY PLAN كسطر واحد (لاستعلامات SELECT / WITH فقط)، أو None."""
+    if not sql.lstrip()[:6].upper().startswith(("SELECT", "WITH")):
+        return None
+    try:
+        cur = sqlite3.Cursor(conn)
+        sqlite3.Cursor.execute(cur, "EXPLAIN QUERY PLAN " + sql, params)
+        return " | ".join(r[3] for r in cur.fetchall())
+    except sqlite3.Error:
+        return None
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """
+    يقيس كل جملة من execute حتى آخر صف يُجلب (أو الجملة التالية / إغلاق المؤشر).
+    الصفوف تُعد في fetchone / fetchmany / fetchall (التكرار المباشر على المؤشر لا يُعد).
+    """
+    _pending = None
+
+    def execute(self, sql, params=()):
+        self._finish()
+        t0 = time.perf_counter()
+        super().execute(sql, params)
+        self._start(sql, params, t0)
+        return self
+
+    def executemany(self, sql, seq):
+        self._finish()
+        t0 = time.perf_counter()
+        super().executemany(sql, seq)
+        record("sql", sql_key(sql), (time.perf_counter() - t0) * 1000, max(self.rowcount, 0))
+        return self
+
+    def _start(self, sql, params, t0):
+        ms = (time.perf_counter() - t0) * 1000
+        if self.description is None:  # INSERT / UPDATE / DDL: finished after execute
+            self._pending = [sql, params, ms, max(self.rowcount, 0)]
+            self._finish()
+        else:
+            self._pending = [sql, params, ms, 0]
+
+    def _fetched(self, t0, n, done):
+        p = self._pending
+        if p is not None:
+            p[2] += (time.perf_counter() - t0) * 1000
+            p[3] += n
+            if done:
+                self._finish()
+
+    def _finish(self):
+        p, self._pending = self._pending, None
+        if p is None:
+            return
+        sql, params, ms, rows = p
+        record("sql", sql_key(sql), ms, rows)
+        if ms >= SLOW_MS:
+            PROFILER.record_slow(sql_key(sql), ms, rows, explain(self.connection, sql, params))
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(t0, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        want = self.arraysize if size is None else size
+        rows = super().fetchmany(want)
+        self._fetched(t0, len(rows), len(rows) < want)
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(t0, len(rows), True)
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """db.connect يستخدمه (factory) عند تفعيل القياس: كل المؤشرات ProfiledCursor."""
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+report_cache.py
+ملفات التقارير الجاهزة (Excel / PDF) على القرص، تُعاد كما هي ما لم تتغير بياناتها
+- المفتاح: نوع التقرير + الفلاتر (q، من / إلى تاريخ) + data_stamp للفترة:
+  عدد أسطر الفترة وأكبر رقم ومجموعها، آخر تغيير (change_log) على طلب أو سطر فيها أو على أي عميل / منتج،
+  والأشهر المؤرشفة منها — فبيع اليوم لا يُبطل تقرير الشهر الماضي
+- register(kind, ext, build): كل تطبيق يسجل تقاريره (build يكتب الملف في المسار المعطى)
+- ReportCache.get: الملف الموجود (ويُحدَّث وقت استخدامه) أو يبنيه مرة واحدة حتى لو طلبته عدة جلسات معاً؛
+  النسخ الأقدم لنفس التقرير تُحذف، ثم الأقل استخداماً حتى MAX_MB / MAX_FILES (LRU)
+- start_prebuild_thread: أمس، الشهر حتى اليوم والشهر الماضي لكل تقرير prebuild=True، مرة كل يوم في
+  ساعات PREBUILD_HOURS فقط حتى يبقى المعالج لنقاط البيع وقت الذروة
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from db import connect
+from sales_search import day_bounds
+
+CACHE_DIR = os.environ.get("BAYT_REPORT_CACHE_DIR", "report_cache")   # نسبي = بجانب ملف قاعدة البيانات
+MAX_MB = float(os.environ.get("BAYT_REPORT_CACHE_MB", 500))
+MAX_FILES = int(os.environ.get("BAYT_REPORT_CACHE_FILES", 200))
+PREBUILD_HOURS = os.environ.get("BAYT_REPORT_HOURS", "1-6")           # من-إلى (ساعة البداية ضمنها والنهاية لا)
+FORMAT = 1
+
+# kind -> (ext, build(output_path, progress=None, cancel=None, q="", f_from="", f_to="", ...), prebuild)
+REPORTS = {}
+
+
+def register(kind, ext, build, prebuild=True):
+    REPORTS[kind] = (ext, build, prebuild)
+
+
+# ---------- إصدار البيانات ----------
+def _range(col, lo, hi):
+    sql, params = "", []
+    if lo:
+        sql += f" AND {col} >= ?"
+        params.append(lo)
+    if hi:
+        sql += f" AND {col} < ?"
+        params.append(hi)
+    return sql, params
+
+
+def data_stamp(cur, lo=None, hi=None):
+    """نص يتغير إذا تغير أي شيء يظهر في تقرير الفترة sold_at في [lo, hi) (None = بدون حد)."""
+    where, params = _range("o.sold_at", lo, hi)
+    cur.execute(f"""SELECT COUNT(*), IFNULL(MAX(l.id), 0), IFNULL(SUM(l.total), 0)
+                    FROM orders o JOIN order_lines l ON l.order_id = o.id WHERE 1=1{where}""", params)
+    live = cur.fetchone()
+    # newest change that touches the period; deletes and moved orders show in the counts above,
+    # customer / product edits are not tied to a date and count for every period
+    cur.execute(f"""SELECT seq FROM change_log c
+                    WHERE c.tbl IN ('customers', 'products')
+                       OR (c.tbl = 'orders' AND EXISTS (SELECT 1 FROM orders o WHERE o.id = c.row_id{where}))
+                       OR (c.tbl = 'order_lines' AND EXISTS (SELECT 1 FROM order_lines l JOIN orders o
+                                                             ON o.id = l.order_id WHERE l.id = c.row_id{where}))
+                    ORDER BY seq DESC LIMIT 1""", params * 2)
+    row = cur.fetchone()
+    a_where, a_params = "", []
+    if lo:
+        a_where += " AND max_sold_at >= ?"
+        a_params.append(lo)
+    if hi:
+        a_where += " AND min_sold_at < ?"
+        a_params.append(hi)
+    cur.execute(f"SELECT COUNT(*), IFNULL(SUM(rows), 0), IFNULL(MAX(id), 0) FROM sales_archive WHERE 1=1{a_where}",
+                a_params)
+    return "|".join(map(str, (*live, row[0] if row else 0, *cur.fetchone())))
+
+
+# ---------- الملفات ----------
+class ReportCache:
+    """
+    cache.get(kind, {"q", "f_from", "f_to", ...}, progress, cancel) -> (المسار، هل كان جاهزاً)
+    آمن من عدة threads؛ الملفات مشتركة بين العمليات (التطبيقان) عبر المجلد نفسه.
+    """
+
+    def __init__(self, db_path, cache_dir=None, max_mb=MAX_MB, max_files=MAX_FILES):
+        self.db_path = db_path
+        self.dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(db_path)), CACHE_DIR)
+        self.max_bytes = int(max_mb * 2**20)
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self._building = {}   # اسم الملف -> Lock أثناء بنائه
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def _params(params):
+        """q / f_from / f_to دائماً، وأي قيم أخرى يحتاجها التقرير (مثل الشعار في الفواتير)، كنصوص."""
+        params = {"q": "", "f_from": "", "f_to": "", **(params or {})}
+        return {k: str(v or "").strip() for k, v in params.items()}
+
+    def _name(self, kind, params, stamp):
+        ext = REPORTS[kind][0]
+        p = hashlib.sha1(json.dumps([kind, params], sort_keys=True, ensure_ascii=False).encode()).hexdigest()[:16]
+        s = hashlib.sha1(f"{FORMAT}|{stamp}".encode()).hexdigest()[:16]
+        return f"{kind}-{p}-{s}{ext}", f"{kind}-{p}-"
+
+    def stamp(self, params):
+        lo, hi = day_bounds(params["f_from"], params["f_to"])
+        conn = connect(self.db_path, readonly=True)
+        try:
+            return data_stamp(conn.cursor(), lo, hi)
+        finally:
+            conn.close()
+
+    def get(self, kind, params=None, progress=None, cancel=None):
+        """الملف الجاهز لهذا التقرير، أو يبنيه الآن. يرفع ValueError لتاريخ خاطئ و KeyError لنوع غير مسجل."""
+        params = self._params(params)
+        ext, build, _prebuild = REPORTS[kind]
+        name, prefix = self._name(kind, params, self.stamp(params))
+        path = os.path.join(self.dir, name)
+        if self._hit(path):
+            return path, True
+        with self._lock:
+            lock = self._building.setdefault(name, threading.Lock())
+        with lock:
+            if self._hit(path):   # built by another session while this one waited
+                return path, True
+            os.makedirs(self.dir, exist_ok=True)
+            tmp = os.path.join(self.dir, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp{ext}")
+            try:
+                build(tmp, progress=progress, cancel=cancel, **params)
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                with self._lock:
+                    self._building.pop(name, None)
+            with self._lock:
+                self.misses += 1
+        self.evict(keep=name, stale_prefix=prefix)
+        return path, False
+
+    def _hit(self, path):
+        try:
+            os.utime(path)   # last use, for LRU eviction
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def entries(self):
+        """الملفات الجاهزة، الأحدث استخداماً أولاً: {name, path, bytes, used}."""
+        if not os.path.isdir(self.dir):
+            return []
+        out = []
+        for f in os.listdir(self.dir):
+            p = os.path.join(self.dir, f)
+            if f.startswith(".") or not os.path.isfile(p):
+                continue
+            st = os.stat(p)
+            out.append({"name": f, "path": p, "bytes": st.st_size, "used": st.st_mtime})
+        out.sort(key=lambda e: e["used"], reverse=True)
+        return out
+
+    def evict(self, keep=None, stale_prefix=None):
+        """يحذف النسخ الأقدم من نفس التقرير (stale_prefix) ثم الأقل استخداماً فوق الحدود. يعيد عدد المحذوف."""
+        removed, total, kept = 0, 0, 0
+        for e in self.entries():
+            stale = stale_prefix and e["name"].startswith(stale_prefix) and e["name"] != keep
+            if stale or (e["name"] != keep and (total + e["bytes"] > self.max_bytes or kept >= self.max_files)):
+                try:
+                    os.remove(e["path"])
+                    removed += 1
+                except OSError:
+                    pass   # in use (Windows) or removed by the other app
+                continue
+            total += e["bytes"]
+            kept += 1
+        return removed
+
+    def stats(self):
+        entries = self.entries()
+        with self._lock:
+            return {"files": len(entries), "bytes": sum(e["bytes"] for e in entries), "hits": self.hits,
+                    "misses": self.misses, "dir": self.dir}
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def cache_for(db_path):
+    """الـ cache المشترك في هذه العملية لملف قاعدة البيانات."""
+    path = os.path.abspath(db_path)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = ReportCache(path)
+    return cache
+
+
+# ---------- البناء المسبق ----------
+def common_periods(today=None):
+    """(الاسم، من، إلى) للفترات التي تُطلب كثيراً: أمس، الشهر حتى اليوم، الشهر الماضي."""
+    today = today or date.today()
+    yesterday = today - timedelta(days=1)
+    first = today.replace(day=1)
+    last_month_end = first - timedelta(days=1)
+    return [("yesterday", yesterday.isoformat(), yesterday.isoformat()),
+            ("month_to_date", first.isoformat(), today.isoformat()),
+            ("last_month", last_month_end.replace(day=1).isoformat(), last_month_end.isoformat())]
+
+
+def prebuild(db_path, kinds=None, today=None):
+    """يبني تقارير common_periods لكل نوع prebuild=True (أو kinds). يعيد [(kind, period, جاهز مسبقاً، ms)]."""
+    cache = cache_for(db_path)
+    done = []
+    for kind in kinds or [k for k, (_e, _b, pre) in REPORTS.items() if pre]:
+        for period, f_from, f_to in common_periods(today):
+            t0 = time.perf_counter()
+            _path, hit = cache.get(kind, {"f_from": f_from, "f_to": f_to})
+            done.append((kind, period, hit, round((time.perf_counter() - t0) * 1000, 1)))
+    return done
+
+
+def _in_hours(hour, hours=PREBUILD_HOURS):
+    start, end = (int(h) for h in hours.split("-"))
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+_threads = {}
+_threads_lock = threading.Lock()
+
+
+def start_prebuild_thread(db_path, hours=PREBUILD_HOURS, check_seconds=600):
+    """thread واحد لكل ملف في هذه العملية: prebuild مرة كل يوم داخل ساعات hours ("" = بدون)."""
+    path = os.path.abspath(db_path)
+    if not hours:
+        return None
+    with _threads_lock:
+        thread = _threads.get(path)
+        if thread is not None and thread.is_alive():
+            return thread
+
+        def run():
+            built_on = None
+            while True:
+                now = datetime.now()
+                if built_on != now.date() and _in_hours(now.hour, hours):
+                    try:
+                        done = prebuild(path)
+                        built = [f"{k}/{p}" for k, p, hit, _ms in done if not hit]
+                        if built:
+                            print("reports prebuilt:", ", ".join(built))
+                        if done:   # nothing registered yet (the app is still starting): try at the next check
+                            built_on = now.date()
+                    except Exception as e:
+                        print("report prebuild error:", e)
+                time.sleep(check_seconds)
+        thread = _threads[path] = threading.Thread(target=run, name="report-prebuild", daemon=True)
+        thread.start()
+    return thread
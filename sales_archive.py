@@ -0,0 +1,630 @@
+# -*- coding: utf-8 -*-
+"""
+sales_archive.py
+أرشفة الأشهر المغلقة من المبيعات في ملفات عمودية مضغوطة لا تتغير بعد كتابتها (NumPy .npz)
+- archive_month: أسطر الشهر من VIEW sales تُكتب في ملف واحد (مصفوفة لكل عمود، والنصوص بترميز قاموسي)
+  ثم تُحذف من order_lines / orders في نفس المعاملة؛ sales_daily لا يتغير فتبقى أرقام لوحة التحكم كما هي
+- sales_archive: ملف لكل شهر (وملف إضافي إن أُضيفت لاحقاً مبيعات بتاريخ شهر مؤرشف) مع أول / آخر تاريخ ورقم،
+  عدد الأسطر والطلبات، الإيراد وصافي الربح و sha256؛ sales_archive_daily (تجميع يومي لكل منتج لإعادة بناء
+  sales_daily) و sales_archive_orders (external_id حتى لا يتكرر استيراد طلب مؤرشف)
+- archive_next / archive_due: الأشهر الأقدم من HOT_MONTHS تُؤرشف فيبقى الجدول الحي محدود الحجم
+  (يدوياً من صفحة التشخيص أو هذا الملف، وعند بدء تطبيق سطح المكتب فقط إن BAYT_AUTO_ARCHIVE=1)؛
+  كل شهر يكتب سطر reset في change_log فتعيد الجداول المفتوحة تحميل عددها وصفوفها
+- SalesQuery: نفس الاستعلام على الجدول الحي + ملفات الأرشيف التي يحتاجها فلتر التاريخ فقط، الأحدث (id) أولاً:
+  count / fetch لـ PagedTreeview، iter_rows للتصدير و Streamlit، archived_rows للفواتير و archived_columns للتحليلات
+NumPy يُحمّل عند أول قراءة أو كتابة لملف أرشيف فقط، وكل ملف يُقرأ عموداً عموداً عند الحاجة.
+
+التشغيل:
+    python sales_archive.py [--db store.sqlite3] [--keep-months 3] [--month YYYY-MM] [--verify]
+"""
+
+import argparse
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+from sales_rollup import rollup_totals
+from sales_search import FTS_COLUMNS, day_bounds, normalize_arabic, optimize_sales_fts, sales_filter
+
+HOT_MONTHS = int(os.environ.get("BAYT_HOT_MONTHS", 3))  # الشهر الحالي + السابقان في SQLite؛ 0 = بدون أرشفة
+AUTO_ARCHIVE = os.environ.get("BAYT_AUTO_ARCHIVE", "0") == "1"  # أرشفة تلقائية عند بدء تطبيق سطح المكتب
+ARCHIVE_DIR = "sales_archive"   # بجانب ملف قاعدة البيانات
+CACHE_PARTITIONS = 48           # ملفات تبقى أعمدتها المقروءة في الذاكرة (لكل عملية): 4 سنوات لبحث بدون فلتر تاريخ
+FORMAT = 1
+
+_INT_COLUMNS = ("id", "order_id", "customer_id", "product_id", "quantity")
+_REAL_COLUMNS = ("unit_sell", "unit_cost", "total")
+_TEXT_COLUMNS = ("product_name", "customer_name", "customer_phone", "customer_address", "external_id")
+_STORED = _INT_COLUMNS + _REAL_COLUMNS + ("sold_at",) + _TEXT_COLUMNS
+_INT_NULL = -(2 ** 63)  # NULL في أعمدة الأرقام الصحيحة (NaN في الأعمدة العشرية، ورمز -1 في النصوص)
+
+_SQL_MONTH_ROWS = f"""SELECT {', '.join('o.external_id' if c == 'external_id' else 's.' + c for c in _STORED)}
+                      FROM sales s JOIN orders o ON o.id = s.order_id
+                      WHERE s.sold_at >= ? AND s.sold_at < ? ORDER BY s.id"""
+_PARTITION_FIELDS = ("id", "month", "file", "rows", "orders", "min_id", "max_id", "min_sold_at", "max_sold_at",
+                     "revenue", "net_profit", "bytes", "sha256", "created_at")
+
+
+# ---------- الجداول ----------
+def ensure_sales_archive(conn, commit=True):
+    """ينشئ جداول بيانات الأرشيف (تستدعيه migrations.py)."""
+    cur = conn.cursor()
+    cur.execute("""CREATE TABLE IF NOT EXISTS sales_archive (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    month TEXT NOT NULL,
+                    file TEXT NOT NULL DEFAULT '',
+                    rows INTEGER NOT NULL DEFAULT 0,
+                    orders INTEGER NOT NULL DEFAULT 0,
+                    min_id INTEGER,
+                    max_id INTEGER,
+                    min_sold_at TEXT,
+                    max_sold_at TEXT,
+                    revenue REAL NOT NULL DEFAULT 0,
+                    net_profit REAL NOT NULL DEFAULT 0,
+                    bytes INTEGER NOT NULL DEFAULT 0,
+                    sha256 TEXT NOT NULL DEFAULT '',
+                    created_at TEXT)""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS sales_archive_daily (
+                    partition_id INTEGER NOT NULL,
+                    day TEXT NOT NULL,
+                    product_id INTEGER NOT NULL,
+                    ops INTEGER NOT NULL DEFAULT 0,
+                    revenue REAL NOT NULL DEFAULT 0,
+                    net_profit REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (partition_id, day, product_id)) WITHOUT ROWID""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS sales_archive_orders (
+                    external_id TEXT PRIMARY KEY,
+                    order_id INTEGER NOT NULL,
+                    partition_id INTEGER NOT NULL) WITHOUT ROWID""")
+    if commit:
+        conn.commit()
+
+
+def archive_dir(cur):
+    """مجلد ملفات الأرشيف بجانب ملف قاعدة البيانات المفتوح في cur."""
+    cur.execute("PRAGMA database_list")
+    path = next((r[2] for r in cur.fetchall() if r[1] == "main"), "")
+    base = os.path.dirname(os.path.abspath(path)) if path else os.getcwd()
+    return os.path.join(base, ARCHIVE_DIR)
+
+
+def month_bounds(month):
+    """'YYYY-MM' -> (أول يوم فيه، أول يوم في الشهر التالي) كحدود نصية لـ sold_at. يرفع ValueError."""
+    first = date.fromisoformat(month + "-01")
+    following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+    return first.isoformat(), following.isoformat()
+
+
+def hot_cutoff(keep_months=HOT_MONTHS, today=None):
+    """أول يوم في أقدم شهر يبقى في الجدول الحي (keep_months شهراً بما فيها الشهر الحالي)."""
+    today = today or date.today()
+    m = today.year * 12 + today.month - 1 - (max(keep_months, 1) - 1)
+    return date(m // 12, m % 12 + 1, 1).isoformat()
+
+
+# ---------- الكتابة ----------
+def _encode(np, cols):
+    arrays = {"format": np.array(FORMAT)}
+    for c in _INT_COLUMNS:
+        arrays[c] = np.array([_INT_NULL if v is None else int(v) for v in cols[c]], dtype=np.int64)
+    for c in _REAL_COLUMNS:
+        arrays[c] = np.array([np.nan if v is None else float(v) for v in cols[c]], dtype=np.float64)
+    arrays["sold_at"] = np.array([str(v or "").encode("utf-8") for v in cols["sold_at"]], dtype=bytes)
+    for c in _TEXT_COLUMNS:
+        index = {}
+        codes = [-1 if v is None else index.setdefault(str(v), len(index)) for v in cols[c]]
+        arrays[c] = np.array(codes, dtype=np.int32)
+        arrays[c + "_values"] = np.array(list(index), dtype=str) if index else np.array([], dtype="U1")
+        if c in FTS_COLUMNS:
+            # normalized once here, so searches never run normalize_arabic over the dictionaries
+            arrays[c + "_norm"] = (np.array([normalize_arabic(v) for v in index], dtype=str) if index
+                                   else np.array([], dtype="U1"))
+    return arrays
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def archive_month(cur, month):
+    """
+    ينقل أسطر الشهر (YYYY-MM) من الجدول الحي إلى ملف أرشيف جديد، داخل معاملة المستدعي
+    (db.run_in_transaction / DbWorker write=True). يعيد بيانات الملف (dict) أو None إن لم يكن في الشهر مبيعات.
+    """
+    import numpy as np
+    lo, hi = month_bounds(month)
+    cur.execute(_SQL_MONTH_ROWS, (lo, hi))
+    rows = cur.fetchall()
+    if not rows:
+        return None
+    cols = dict(zip(_STORED, zip(*rows)))
+    arrays = _encode(np, cols)
+    cur.execute("INSERT INTO sales_archive (month, created_at) VALUES (?, ?)",
+                (month, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    pid = cur.lastrowid
+    folder = archive_dir(cur)
+    os.makedirs(folder, exist_ok=True)
+    name = f"sales_{month}_{pid:05d}.npz"
+    path = os.path.join(folder, name)
+    try:
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(path + ".tmp", path)
+        # same expressions as the sales_daily triggers, so rebuild_sales_rollup gives the same totals
+        cur.execute("""INSERT INTO sales_archive_daily (partition_id, day, product_id, ops, revenue, net_profit)
+                       SELECT ?, IFNULL(date(o.sold_at), ''), IFNULL(l.product_id, 0), COUNT(*), SUM(IFNULL(l.total, 0)),
+                              SUM(IFNULL(l.total, 0) - IFNULL(l.quantity * l.unit_cost, 0))
+                       FROM order_lines l JOIN orders o ON o.id = l.order_id
+                       WHERE o.sold_at >= ? AND o.sold_at < ? GROUP BY 2, 3""", (pid, lo, hi))
+        cur.execute("""INSERT OR IGNORE INTO sales_archive_orders (external_id, order_id, partition_id)
+                       SELECT external_id, id, ? FROM orders
+                       WHERE sold_at >= ? AND sold_at < ? AND external_id IS NOT NULL""", (pid, lo, hi))
+        cur.execute("SELECT IFNULL(SUM(revenue), 0), IFNULL(SUM(net_profit), 0) FROM sales_archive_daily "
+                    "WHERE partition_id = ?", (pid,))
+        revenue, net_profit = cur.fetchone()
+        cur.execute("""UPDATE sales_archive SET file = ?, rows = ?, orders = ?, min_id = ?, max_id = ?, min_sold_at = ?,
+                           max_sold_at = ?, revenue = ?, net_profit = ?, bytes = ?, sha256 = ? WHERE id = ?""",
+                    (name, len(rows), len(np.unique(arrays["order_id"])), int(arrays["id"].min()),
+                     int(arrays["id"].max()), min(cols["sold_at"]), max(cols["sold_at"]), revenue, net_profit,
+                     os.path.getsize(path), _sha256(path), pid))
+        # the day totals stay in sales_daily and the lines stay visible (from the file): the rollup and
+        # change_log delete triggers skip rows while the guard row exists. It is removed before commit,
+        # so other connections never see it
+        cur.execute("INSERT INTO archive_guard (id) VALUES (1)")
+        cur.execute("""DELETE FROM order_lines
+                       WHERE order_id IN (SELECT id FROM orders WHERE sold_at >= ? AND sold_at < ?)""", (lo, hi))
+        cur.execute("DELETE FROM orders WHERE sold_at >= ? AND sold_at < ?", (lo, hi))
+        cur.execute("DELETE FROM archive_guard")
+        # rows moved between the live table and the files: open pagers must count and fetch again
+        cur.execute("INSERT INTO change_log (tbl, row_id, op) VALUES ('sales_archive', ?, 'r')", (pid,))
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return partition(cur, pid)
+
+
+def archive_next(cur, keep_months=HOT_MONTHS, today=None):
+    """يؤرشف أقدم شهر فيه مبيعات قبل hot_cutoff (شهر واحد لكل معاملة). يعيد بيانات الملف أو None."""
+    if keep_months <= 0:
+        return None
+    # rows without a valid date ('' / NULL / free text) are never archived
+    cur.execute("SELECT substr(MIN(sold_at), 1, 7) FROM orders WHERE sold_at >= '0001-01' AND sold_at < ?",
+                (hot_cutoff(keep_months, today),))
+    month = cur.fetchone()[0]
+    if not month:
+        return None
+    try:
+        month_bounds(month)
+    except ValueError:
+        return None
+    return archive_month(cur, month)
+
+
+def archive_due(conn, keep_months=HOT_MONTHS, progress=None):
+    """
+    يؤرشف كل الأشهر الأقدم من keep_months، كل شهر في معاملة منفصلة (db.run_in_transaction)،
+    ثم يدمج فهرس البحث (optimize_sales_fts). يعيد قائمة الملفات.
+    """
+    from db import run_in_transaction
+    done = []
+    while True:
+        meta = run_in_transaction(conn, lambda cur: archive_next(cur, keep_months))
+        if meta is None:
+            if done:
+                run_in_transaction(conn, optimize_sales_fts)
+            return done
+        done.append(meta)
+        if progress:
+            progress(meta)
+
+
+# ---------- بيانات الملفات ----------
+def partition(cur, partition_id):
+    cur.execute(f"SELECT {', '.join(_PARTITION_FIELDS)} FROM sales_archive WHERE id = ?", (partition_id,))
+    row = cur.fetchone()
+    return dict(zip(_PARTITION_FIELDS, row)) if row else None
+
+
+def partitions(cur, lo=None, hi=None):
+    """ملفات الأرشيف التي قد تحتوي أسطراً في [lo, hi) (حسب أول / آخر تاريخ في كل ملف)، الأحدث أولاً، مع path."""
+    cur.execute(f"""SELECT {', '.join(_PARTITION_FIELDS)} FROM sales_archive
+                    WHERE rows > 0 AND (?1 IS NULL OR max_sold_at >= ?1) AND (?2 IS NULL OR min_sold_at < ?2)
+                    ORDER BY max_id DESC""", (lo, hi))
+    rows = cur.fetchall()
+    folder = archive_dir(cur) if rows else ""
+    return [dict(zip(_PARTITION_FIELDS, r), path=os.path.join(folder, r[2])) for r in rows]
+
+
+def archive_totals(cur):
+    """إجماليات كل الأرشيف من بيانات الملفات فقط (بدون قراءة أي ملف)."""
+    cur.execute("""SELECT COUNT(*), IFNULL(SUM(rows), 0), IFNULL(SUM(orders), 0), IFNULL(SUM(revenue), 0),
+                          IFNULL(SUM(net_profit), 0), IFNULL(SUM(bytes), 0), MIN(min_sold_at), MAX(max_sold_at)
+                   FROM sales_archive""")
+    return dict(zip(("partitions", "rows", "orders", "revenue", "net_profit", "bytes", "first", "last"), cur.fetchone()))
+
+
+def verify_archive(cur):
+    """يتحقق من وجود كل ملف و sha256 وعدد أسطره. يعيد قائمة المشاكل (فارغة = سليم)."""
+    import numpy as np
+    problems = []
+    for p in partitions(cur):
+        if not os.path.exists(p["path"]):
+            problems.append(f"{p['file']}: missing")
+        elif _sha256(p["path"]) != p["sha256"]:
+            problems.append(f"{p['file']}: sha256 mismatch")
+        else:
+            with np.load(p["path"], allow_pickle=False) as z:
+                if len(z["id"]) != p["rows"]:
+                    problems.append(f"{p['file']}: {len(z['id'])} rows, expected {p['rows']}")
+    return problems
+
+
+# ---------- القراءة ----------
+class _Partition:
+    """أعمدة ملف أرشيف واحد تُقرأ (وتُفك) عند أول استخدام فقط."""
+
+    def __init__(self, path):
+        self.path = path
+        self._arrays = {}
+        self._normalized = {}
+        self._files = None
+
+    def __getitem__(self, name):
+        arr = self._arrays.get(name)
+        if arr is None:
+            import numpy as np
+            with np.load(self.path, allow_pickle=False) as z:
+                arr = self._arrays[name] = z[name]
+        return arr
+
+    def has(self, name):
+        if name not in self._arrays and self._files is None:
+            import numpy as np
+            with np.load(self.path, allow_pickle=False) as z:
+                self._files = frozenset(z.files)
+        return name in self._arrays or name in self._files
+
+    def normalized(self, column):
+        """قيم القاموس للعمود النصي بعد normalize_arabic (للبحث)؛ محفوظة في الملف لأعمدة FTS_COLUMNS."""
+        values = self._normalized.get(column)
+        if values is None:
+            if self.has(column + "_norm"):
+                values = self[column + "_norm"].tolist()
+            else:
+                values = [normalize_arabic(v) for v in self[column + "_values"].tolist()]
+            self._normalized[column] = values
+        return values
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _load(path):
+    with _cache_lock:
+        part = _cache.get(path)
+        if part is None:
+            part = _cache[path] = _Partition(path)
+            while len(_cache) > CACHE_PARTITIONS:
+                _cache.popitem(last=False)
+        else:
+            _cache.move_to_end(path)
+        return part
+
+
+def _mask(np, part, meta, lo, hi, words, fields, ids=None):
+    """الأسطر المطابقة في الملف (مصفوفة bool)؛ عمود التاريخ يُقرأ فقط إن لم يكن الملف كله داخل [lo, hi)."""
+    n = meta["rows"]
+    mask = np.ones(n, dtype=bool)
+    if lo and meta["min_sold_at"] < lo:
+        mask &= part["sold_at"] >= lo.encode("utf-8")
+    if hi and meta["max_sold_at"] >= hi:
+        mask &= part["sold_at"] < hi.encode("utf-8")
+    if ids is not None:
+        mask &= np.isin(part["id"], ids)
+    for w in words:
+        hit = np.zeros(n, dtype=bool)
+        for c in fields:
+            found = [w in v for v in part.normalized(c)] + [False]  # code -1 (NULL) -> False
+            hit |= np.array(found, dtype=bool)[part[c]]
+        mask &= hit
+    return mask
+
+
+def _column(np, part, name, idx):
+    """قيم العمود name (من أعمدة VIEW sales) للأسطر idx كقائمة Python، و None مكان NULL."""
+    if name in _TEXT_COLUMNS:
+        values = part[name + "_values"].tolist() + [None]
+        return [values[c] for c in part[name][idx].tolist()]
+    if name == "sold_at":
+        return [v.decode("utf-8") for v in part["sold_at"][idx].tolist()]
+    if name in ("cost_total", "net_profit"):
+        qty = part["quantity"][idx]
+        cost_total = np.where(qty == _INT_NULL, np.nan, qty.astype(np.float64)) * part["unit_cost"][idx]
+        arr = cost_total if name == "cost_total" else part["total"][idx] - cost_total
+    else:
+        arr = part[name][idx]
+    values = arr.tolist()
+    if name in _INT_COLUMNS:
+        return [None if v == _INT_NULL else v for v in values] if (arr == _INT_NULL).any() else values
+    return [None if v != v else v for v in values] if np.isnan(arr).any() else values
+
+
+def _rows(np, part, idx, columns):
+    return list(zip(*(_column(np, part, c, idx) for c in columns)))
+
+
+def archived_rows(cur, columns, lo=None, hi=None, ids=None):
+    """صفوف الأرشيف فقط (بالأعمدة columns) في [lo, hi) و/أو بأرقام ids، مرتبة بالرقم تصاعدياً."""
+    if ids is not None:
+        ids = sorted({int(i) for i in ids})
+        if not ids:
+            return []
+    parts = [p for p in partitions(cur, lo, hi)
+             if ids is None or any(p["min_id"] <= i <= p["max_id"] for i in ids)]
+    if not parts:
+        return []
+    import numpy as np
+    out = []
+    for p in reversed(parts):
+        part = _load(p["path"])
+        idx = np.nonzero(_mask(np, part, p, lo, hi, (), (), ids))[0]
+        if len(idx):
+            out += _rows(np, part, idx, columns)
+    return out
+
+
+def archived_columns(cur, columns, lo=None, hi=None, q=""):
+    """
+    لكل ملف أرشيف فيه أسطر في [lo, hi) تطابق q: dict {العمود: مصفوفة NumPy} للتجميع العمودي (analytics.py)؛
+    النصوص str و NULL = ""، والأرقام float و NULL = NaN. q بنفس قاعدة بحث صفحة التقارير (كل كلمة موحّدة في FTS_COLUMNS).
+    """
+    parts = partitions(cur, lo, hi)
+    if not parts:
+        return
+    import numpy as np
+    words = normalize_arabic(q).split()
+    for p in reversed(parts):
+        part = _load(p["path"])
+        idx = np.nonzero(_mask(np, part, p, lo, hi, words, FTS_COLUMNS))[0]
+        if not len(idx):
+            continue
+        cols = {}
+        for name in columns:
+            if name in _TEXT_COLUMNS:
+                cols[name] = np.append(part[name + "_values"], "")[part[name][idx]]
+            elif name == "sold_at":
+                cols[name] = np.char.decode(part["sold_at"][idx], "utf-8")
+            else:
+                cols[name] = np.array(_column(np, part, name, idx), dtype=np.float64)
+        yield cols
+
+
+# ---------- الاستعلام الموحد (الحي + الأرشيف) ----------
+class SalesQuery:
+    """
+    استعلام على المبيعات الحية (VIEW sales) والمؤرشفة معاً، مرتب بالرقم (id) تنازلياً.
+    columns: أعمدة VIEW sales المطلوبة (id يُضاف أولاً في كل صف كمفتاح)
+    where / params: الشرط على الجدول الحي (مثلاً من sales_filter)
+    lo / hi / q / fields: نفس الفلتر على الأرشيف: sold_at في [lo, hi) وكل كلمة من q في أحد الحقول fields
+    count(cur) ثم fetch(cur, plan) بخطط PagedTreeview، أو iter_rows(cur) لكل الصفوف على دفعات؛
+    position / rows_for لتحديث الجدول في مكانه من change_feed.
+    الأسطر الحية الأحدث من كل الأرشيف (الغالبية) تُقرأ بـ SQL مباشرة، وأرقام الباقي تُدمج مع أرقام الأرشيف في الذاكرة.
+    """
+
+    def __init__(self, columns, where="1=1", params=(), lo=None, hi=None, q="", fields=FTS_COLUMNS):
+        self.columns = tuple(columns)
+        self.where = where
+        self.params = list(params)
+        self.lo, self.hi = lo, hi
+        self.words = normalize_arabic(q).split()
+        self.fields = tuple(fields)
+        # unfiltered: every order_lines row is in the view, so counts skip the joins
+        table = "order_lines" if where == "1=1" else "sales"
+        self._sql = f"SELECT id, {', '.join(self.columns)} FROM sales WHERE {where}"
+        self._sql_ids = f"SELECT id FROM {table} WHERE {where}"
+        self._sql_count = f"SELECT COUNT(*) FROM {table} WHERE {where}"
+        self._archived = None  # (ids of the partitions, paths, ids desc, partition index, row index)
+        self._state = None     # (cut, live rows above cut, merged arrays or None, paths)
+
+    # ---------- الأرشيف ----------
+    def _archived_index(self, cur):
+        parts = partitions(cur, self.lo, self.hi)
+        if not parts:
+            return None
+        key = tuple(p["id"] for p in parts)
+        if self._archived is not None and self._archived[0] == key:
+            return self._archived  # partition files never change
+        import numpy as np
+        ids, pidx, ridx = [], [], []
+        for i, p in enumerate(parts):
+            part = _load(p["path"])
+            idx = np.nonzero(_mask(np, part, p, self.lo, self.hi, self.words, self.fields))[0]
+            ids.append(part["id"][idx])
+            pidx.append(np.full(len(idx), i, dtype=np.int32))
+            ridx.append(idx.astype(np.int32))
+        ids = np.concatenate(ids)
+        order = np.argsort(-ids, kind="stable")
+        self._archived = (key, [p["path"] for p in parts], ids[order], np.concatenate(pidx)[order],
+                          np.concatenate(ridx)[order])
+        return self._archived
+
+    # ---------- واجهة PagedTreeview ----------
+    def count(self, cur):
+        """
+        العدد الكلي (يُعاد حسابه للجدول الحي في كل مرة؛ الأرشيف محسوب مرة واحدة).
+        بدون فلتر العدد من sales_daily (يشمل الأيام المؤرشفة) فلا يُعد الجدول الحي.
+        """
+        unfiltered = self.where == "1=1" and not (self.lo or self.hi or self.words)
+        arch = self._archived_index(cur)
+        if arch is None or not len(arch[2]):
+            if unfiltered:
+                total = rollup_totals(cur)[0]
+            else:
+                cur.execute(self._sql_count, self.params)
+                total = cur.fetchone()[0]
+            self._state = (_INT_NULL, total, None, [])
+            return total
+        import numpy as np
+        _key, paths, ids, pidx, ridx = arch
+        cut = int(ids[0])
+        # live rows with ids inside the archive's range (e.g. Streamlit orders renumbered by migration 6)
+        cur.execute(self._sql_ids + " AND id <= ?", self.params + [cut])
+        live = np.array([r[0] for r in cur.fetchall()], dtype=np.int64)
+        if len(live):
+            all_ids = np.concatenate([live, ids])
+            order = np.argsort(-all_ids, kind="stable")
+            src = np.concatenate([np.full(len(live), -1, dtype=np.int32), pidx])[order]
+            rows = np.concatenate([np.zeros(len(live), dtype=np.int32), ridx])[order]
+            merged = (all_ids[order], src, rows)
+        else:
+            merged = (ids, pidx, ridx)
+        if unfiltered:
+            n_hi = rollup_totals(cur)[0] - len(merged[0])
+        else:
+            cur.execute(self._sql_count + " AND id > ?", self.params + [cut])
+            n_hi = cur.fetchone()[0]
+        self._state = (cut, n_hi, merged, paths)
+        return n_hi + len(merged[0])
+
+    def position(self, cur, key):
+        """عدد الصفوف الأحدث من الرقم key في النتيجة (موضعه)، بحسب آخر count."""
+        if self._state is None:
+            self.count(cur)
+        cut, n_hi, merged, _paths = self._state
+        if key > cut:
+            cur.execute(self._sql_count + " AND id > ?", self.params + [key])
+            return cur.fetchone()[0]
+        return n_hi + (int(_searchsorted_desc(merged[0], key, "before")) if merged else 0)
+
+    def rows_for(self, cur, ids):
+        """الصفوف الحية المطابقة للفلتر من بين الأرقام ids (الأسطر المؤرشفة لا تتغير)."""
+        ids, found = list(ids), []
+        for k in range(0, len(ids), 500):
+            chunk = ids[k:k + 500]
+            cur.execute(self._sql + f" AND id IN ({','.join('?' * len(chunk))})", self.params + chunk)
+            found += cur.fetchall()
+        return found
+
+    def _live(self, cur, tail, params):
+        cur.execute(self._sql + tail, self.params + params)
+        return cur.fetchall()
+
+    def _merged_rows(self, cur, merged, paths, i, j):
+        ids, src, rix = merged[0][i:j], merged[1][i:j], merged[2][i:j]
+        if not len(ids):
+            return []
+        import numpy as np
+        found = {}
+        live = ids[src < 0].tolist()
+        for k in range(0, len(live), 500):
+            chunk = live[k:k + 500]
+            cur.execute(f"SELECT id, {', '.join(self.columns)} FROM sales WHERE id IN ({','.join('?' * len(chunk))})",
+                        chunk)
+            found.update((r[0], r) for r in cur.fetchall())
+        for p in np.unique(src[src >= 0]).tolist():
+            sel = src == p
+            found.update((r[0], r) for r in _rows(np, _load(paths[p]), rix[sel], ("id",) + self.columns))
+        return [found[k] for k in ids.tolist() if k in found]
+
+    def fetch(self, cur, plan):
+        """
+        نافذة من الصفوف الأحدث أولاً حسب خطة PagedTreeview:
+        ("after", id, n) الأقدم من id، ("before", id, n, ...) الأحدث من id، ("offset", start, n).
+        """
+        if self._state is None:
+            self.count(cur)
+        cut, n_hi, merged, paths = self._state
+        kind = plan[0]
+        if kind == "offset":
+            start, n = plan[1], plan[2]
+            rows = self._live(cur, " AND id > ? ORDER BY id DESC LIMIT ? OFFSET ?", [cut, n, start]) if start < n_hi else []
+            i = max(0, start - n_hi)
+            return rows + (self._merged_rows(cur, merged, paths, i, i + n - len(rows)) if merged else [])
+        key, n = plan[1], plan[2]
+        if kind == "after":
+            rows, i = [], 0
+            if key > cut:
+                rows = self._live(cur, " AND id < ? AND id > ? ORDER BY id DESC LIMIT ?", [key, cut, n])
+            elif merged:
+                i = int(_searchsorted_desc(merged[0], key, "after"))
+            return rows + (self._merged_rows(cur, merged, paths, i, i + n - len(rows)) if merged else [])
+        # before: the n rows just newer than key, newest first
+        j = int(_searchsorted_desc(merged[0], key, "before")) if merged else 0
+        rows = self._merged_rows(cur, merged, paths, max(0, j - n), j) if merged else []
+        if len(rows) < n:
+            rows = self._live(cur, " AND id > ? ORDER BY id ASC LIMIT ?", [max(key, cut), n - len(rows)])[::-1] + rows
+        return rows
+
+    def iter_rows(self, cur, chunk_size=5000, key=True):
+        """كل الصفوف الأحدث أولاً على دفعات (قوائم)؛ key=False يحذف عمود id من كل صف."""
+        if self._state is None:
+            self.count(cur)
+        cut, _n_hi, merged, paths = self._state
+        trim = (lambda rows: rows) if key else (lambda rows: [r[1:] for r in rows])
+        live = cur.connection.cursor()
+        live.execute(self._sql + " AND id > ? ORDER BY id DESC", self.params + [cut])
+        while True:
+            rows = live.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield trim(rows)
+        for i in range(0, len(merged[0]) if merged else 0, chunk_size):
+            yield trim(self._merged_rows(cur, merged, paths, i, i + chunk_size))
+
+
+def _searchsorted_desc(ids, key, side):
+    """في مصفوفة أرقام تنازلية: "after" = أول موضع رقمه < key، "before" = عدد الأرقام > key."""
+    import numpy as np
+    return np.searchsorted(-ids, -key, side="right" if side == "after" else "left")
+
+
+def sales_query(cur, columns, q="", f_from="", f_to=""):
+    """SalesQuery بفلاتر صفحة التقارير: sales_filter للجدول الحي ونفس البحث والتاريخ للأرشيف. يرفع ValueError."""
+    where, params = sales_filter(cur, q, f_from, f_to)
+    lo, hi = day_bounds(f_from, f_to)
+    return SalesQuery(columns, where, params, lo, hi, q)
+
+
+# ---------- سطر الأوامر ----------
+def main():
+    from db import connect
+    from migrations import migrate
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default="store.sqlite3")
+    ap.add_argument("--keep-months", type=int, default=HOT_MONTHS, help="أشهر تبقى في SQLite (مع الشهر الحالي)")
+    ap.add_argument("--month", help="أرشفة شهر محدد YYYY-MM فقط")
+    ap.add_argument("--verify", action="store_true", help="التحقق من الملفات (sha256 وعدد الأسطر) فقط")
+    args = ap.parse_args()
+    conn = connect(args.db)
+    try:
+        migrate(conn)
+        if args.verify:
+            problems = verify_archive(conn.cursor())
+            print("\n".join(problems) or "archive OK")
+            return
+        report = lambda m: print(f"{m['month']}: {m['rows']} lines / {m['orders']} orders -> {m['file']} "  # noqa: E731
+                                 f"({m['bytes'] / 1024:.0f} KB)")
+        if args.month:
+            from db import run_in_transaction
+            meta = run_in_transaction(conn, lambda cur: archive_month(cur, args.month))
+            if meta:
+                report(meta)
+            else:
+                print(f"{args.month}: no sales")
+        else:
+            archive_due(conn, args.keep_months, progress=report)
+        print(archive_totals(conn.cursor()))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+sales_rollup.py
+جداول تجميع يومية لجدول المبيعات (sales) لبطاقات لوحة التحكم
+- sales_daily: عدد العمليات / الإيراد / صافي الربح لكل يوم
+- sales_daily_product: نفس الأرقام لكل يوم ولكل منتج
+- يتم تحديثها تلقائياً عبر Triggers عند الإضافة / التعديل / الحذف
+  (يشمل ذلك save_edit و delete_order وأي برنامج آخر يكتب في المبيعات)
+- قبل الترحيل 6 الـ Triggers على جدول sales، وبعده (sales أصبح VIEW) على order_lines و orders
+- الأيام المؤرشفة (sales_archive.py) تبقى في الجداول، و rebuild_sales_rollup يعيدها من sales_archive_daily
+- archive_guard: صف فيه طوال حذف شهر مؤرشف (داخل معاملة الأرشفة فقط) فتتخطاه Triggers الحذف هنا وفي change_feed.py
+"""
+
+# ---------- تعريف الجداول ----------
+_ROLLUP_TABLES = {
+    "sales_daily": """CREATE TABLE IF NOT EXISTS sales_daily (
+                        day TEXT PRIMARY KEY,
+                        ops INTEGER NOT NULL DEFAULT 0,
+                        revenue REAL NOT NULL DEFAULT 0,
+                        net_profit REAL NOT NULL DEFAULT 0) WITHOUT ROWID""",
+    "sales_daily_product": """CREATE TABLE IF NOT EXISTS sales_daily_product (
+                        day TEXT NOT NULL,
+                        product_id INTEGER NOT NULL,
+                        ops INTEGER NOT NULL DEFAULT 0,
+                        revenue REAL NOT NULL DEFAULT 0,
+                        net_profit REAL NOT NULL DEFAULT 0,
+                        PRIMARY KEY (day, product_id)) WITHOUT ROWID""",
+}
+
+# delete triggers on order_lines skip rows while sales_archive.archive_month holds the guard row
+ARCHIVE_GUARD_WHEN = "WHEN NOT EXISTS (SELECT 1 FROM archive_guard)"
+
+# التاريخ غير الصالح يُجمع تحت '' حتى لا يفشل إدخال البيع نفسه
+_DAY = "IFNULL(date({r}.sold_at), '')"
+_PID = "IFNULL({r}.product_id, 0)"
+
+
+def _add_sql(r):
+    """جمل إضافة صف المبيعات (NEW) إلى جداول التجميع."""
+    day, pid = _DAY.format(r=r), _PID.format(r=r)
+    vals = f"1, IFNULL({r}.total, 0), IFNULL({r}.net_profit, 0)"
+    upsert = " ON CONFLICT({key}) DO UPDATE SET ops = ops + 1, revenue = revenue + excluded.revenue, net_profit = net_profit + excluded.net_profit;"
+    return (
+        f"INSERT INTO sales_daily (day, ops, revenue, net_profit) VALUES ({day}, {vals})"
+        + upsert.format(key="day") + "\n"
+        + f"INSERT INTO sales_daily_product (day, product_id, ops, revenue, net_profit) VALUES ({day}, {pid}, {vals})"
+        + upsert.format(key="day, product_id")
+    )
+
+
+def _remove_sql(r):
+    """جمل طرح صف المبيعات (OLD) من جداول التجميع وحذف الأيام الفارغة."""
+    day, pid = _DAY.format(r=r), _PID.format(r=r)
+    sub = f"SET ops = ops - 1, revenue = revenue - IFNULL({r}.total, 0), net_profit = net_profit - IFNULL({r}.net_profit, 0)"
+    return (
+        f"UPDATE sales_daily {sub} WHERE day = {day};\n"
+        f"DELETE FROM sales_daily WHERE day = {day} AND ops <= 0;\n"
+        f"UPDATE sales_daily_product {sub} WHERE day = {day} AND product_id = {pid};\n"
+        f"DELETE FROM sales_daily_product WHERE day = {day} AND product_id = {pid} AND ops <= 0;"
+    )
+
+
+_TRIGGERS = {
+    "sales_rollup_ai": "AFTER INSERT ON sales BEGIN\n{add}\nEND",
+    "sales_rollup_ad": "AFTER DELETE ON sales BEGIN\n{remove}\nEND",
+    "sales_rollup_au": "AFTER UPDATE OF sold_at, product_id, total, net_profit ON sales BEGIN\n{remove}\n{add}\nEND",
+}
+
+
+# ---------- النموذج الموحد (orders / order_lines) ----------
+def _line_src(r):
+    """صف واحد (day, product_id, ops, revenue, net_profit) لسطر الطلب r؛ اليوم من رأس الطلب."""
+    return (f"SELECT {_DAY.format(r='o')} AS day, {_PID.format(r=r)} AS product_id, 1 AS ops, "
+            f"IFNULL({r}.total, 0) AS revenue, IFNULL({r}.total, 0) - IFNULL({r}.quantity * {r}.unit_cost, 0) AS net_profit "
+            f"FROM (SELECT 1) LEFT JOIN orders o ON o.id = {r}.order_id")
+
+
+def _order_src(r):
+    """أسطر الطلب r مجمعة لكل منتج (عند تغيير تاريخ الطلب)."""
+    return (f"SELECT {_DAY.format(r=r)} AS day, {_PID.format(r='l')} AS product_id, COUNT(*) AS ops, "
+            f"SUM(IFNULL(l.total, 0)) AS revenue, SUM(IFNULL(l.total, 0) - IFNULL(l.quantity * l.unit_cost, 0)) AS net_profit "
+            f"FROM order_lines l WHERE l.order_id = {r}.id GROUP BY 2")
+
+
+def _add_src_sql(src):
+    upsert = (" ON CONFLICT({key}) DO UPDATE SET ops = ops + excluded.ops, revenue = revenue + excluded.revenue,"
+              " net_profit = net_profit + excluded.net_profit;")
+    return (
+        f"INSERT INTO sales_daily (day, ops, revenue, net_profit) "
+        f"SELECT day, SUM(ops), SUM(revenue), SUM(net_profit) FROM ({src}) WHERE 1 GROUP BY day"
+        + upsert.format(key="day") + "\n"
+        + f"INSERT INTO sales_daily_product (day, product_id, ops, revenue, net_profit) "
+        f"SELECT day, product_id, ops, revenue, net_profit FROM ({src}) WHERE 1"
+        + upsert.format(key="day, product_id")
+    )
+
+
+def _remove_src_sql(src):
+    def sub(t):
+        return (f"SET ops = {t}.ops - s.ops, revenue = {t}.revenue - s.revenue, "
+                f"net_profit = {t}.net_profit - s.net_profit")
+    by_day = f"SELECT day, SUM(ops) AS ops, SUM(revenue) AS revenue, SUM(net_profit) AS net_profit FROM ({src}) GROUP BY day"
+    return (
+        f"UPDATE sales_daily {sub('sales_daily')} FROM ({by_day}) AS s WHERE sales_daily.day = s.day;\n"
+        f"DELETE FROM sales_daily WHERE ops <= 0 AND day IN (SELECT day FROM ({src}));\n"
+        f"UPDATE sales_daily_product {sub('sales_daily_product')} FROM ({src}) AS s "
+        f"WHERE sales_daily_product.day = s.day AND sales_daily_product.product_id = s.product_id;\n"
+        f"DELETE FROM sales_daily_product WHERE ops <= 0 AND (day, product_id) IN (SELECT day, product_id FROM ({src}));"
+    )
+
+
+_LINE_TRIGGERS = {
+    "order_lines_rollup_ai": ("AFTER INSERT ON order_lines", [], ["NEW"]),
+    "order_lines_rollup_ad": ("AFTER DELETE ON order_lines " + ARCHIVE_GUARD_WHEN, ["OLD"], []),
+    "order_lines_rollup_au": ("AFTER UPDATE OF order_id, product_id, quantity, unit_cost, total ON order_lines", ["OLD"], ["NEW"]),
+}
+
+
+def is_view(cur, name):
+    """True إذا كان name عرضاً (VIEW) وليس جدولاً."""
+    cur.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,))
+    row = cur.fetchone()
+    return bool(row and row[0] == "view")
+
+
+def _create_triggers(cur):
+    if not is_view(cur, "sales"):
+        for name, body in _TRIGGERS.items():
+            cur.execute(f"CREATE TRIGGER IF NOT EXISTS {name} " + body.format(add=_add_sql("NEW"), remove=_remove_sql("OLD")))
+        return
+    for name, (event, removed, added) in _LINE_TRIGGERS.items():
+        stmts = [_remove_src_sql(_line_src(r)) for r in removed] + [_add_src_sql(_line_src(r)) for r in added]
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN\n" + "\n".join(stmts) + "\nEND")
+    cur.execute("CREATE TRIGGER IF NOT EXISTS orders_rollup_au AFTER UPDATE OF sold_at ON orders "
+                "WHEN date(OLD.sold_at) IS NOT date(NEW.sold_at) BEGIN\n"
+                + _remove_src_sql(_order_src("OLD")) + "\n" + _add_src_sql(_order_src("NEW")) + "\nEND")
+
+
+# ---------- الإنشاء والتعبئة ----------
+def ensure_archive_guard(cur):
+    """جدول archive_guard الذي تقرأه Triggers الحذف (فارغ خارج معاملة أرشفة شهر)."""
+    cur.execute("CREATE TABLE IF NOT EXISTS archive_guard (id INTEGER PRIMARY KEY CHECK (id = 1))")
+
+
+def ensure_sales_rollup(conn, commit=True):
+    """ينشئ جداول التجميع والـ Triggers إن لم تكن موجودة، ويعبئها من sales عند أول إنشاء."""
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name IN ('sales_daily','sales_daily_product')")
+    existing = {r[0] for r in cur.fetchall()}
+    for ddl in _ROLLUP_TABLES.values():
+        cur.execute(ddl)
+    ensure_archive_guard(cur)
+    _create_triggers(cur)
+    if len(existing) < len(_ROLLUP_TABLES):
+        rebuild_sales_rollup(conn, commit=False)
+    if commit:
+        conn.commit()
+
+
+def rebuild_sales_rollup(conn, commit=True):
+    """يعيد حساب جداول التجميع بالكامل من sales (للإصلاح أو بعد استيراد خارجي)."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM sales_daily")
+    cur.execute("DELETE FROM sales_daily_product")
+    cur.execute(f"""INSERT INTO sales_daily (day, ops, revenue, net_profit)
+                    SELECT {_DAY.format(r='sales')}, COUNT(*), IFNULL(SUM(total),0), IFNULL(SUM(net_profit),0)
+                    FROM sales GROUP BY 1""")
+    cur.execute(f"""INSERT INTO sales_daily_product (day, product_id, ops, revenue, net_profit)
+                    SELECT {_DAY.format(r='sales')}, {_PID.format(r='sales')}, COUNT(*), IFNULL(SUM(total),0), IFNULL(SUM(net_profit),0)
+                    FROM sales GROUP BY 1, 2""")
+    # months moved to sales_archive.py files are no longer in sales; their day totals are kept per file
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'sales_archive_daily'")
+    if cur.fetchone():
+        upsert = (" ON CONFLICT({key}) DO UPDATE SET ops = ops + excluded.ops, revenue = revenue + excluded.revenue,"
+                  " net_profit = net_profit + excluded.net_profit")
+        cur.execute("""INSERT INTO sales_daily (day, ops, revenue, net_profit)
+                       SELECT day, SUM(ops), SUM(revenue), SUM(net_profit) FROM sales_archive_daily WHERE 1 GROUP BY day"""
+                    + upsert.format(key="day"))
+        cur.execute("""INSERT INTO sales_daily_product (day, product_id, ops, revenue, net_profit)
+                       SELECT day, product_id, SUM(ops), SUM(revenue), SUM(net_profit) FROM sales_archive_daily
+                       WHERE 1 GROUP BY day, product_id""" + upsert.format(key="day, product_id"))
+    if commit:
+        conn.commit()
+
+
+# ---------- القراءة ----------
+def rollup_totals(cur, day_from=None, day_to=None):
+    """يعيد (عدد العمليات، الإيراد، صافي الربح) بين تاريخين (YYYY-MM-DD) شاملين، أو الكلي إن لم يُحددا."""
+    sql = "SELECT IFNULL(SUM(ops),0), IFNULL(SUM(revenue),0), IFNULL(SUM(net_profit),0) FROM sales_daily WHERE 1=1"
+    params = []
+    if day_from:
+        sql += " AND day >= ?"
+        params.append(day_from)
+    if day_to:
+        sql += " AND day <= ?"
+        params.append(day_to)
+    cur.execute(sql, params)
+    return cur.fetchone()
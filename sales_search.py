@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+sales_search.py
+فهرس بحث نصي (SQLite FTS5) لجدول المبيعات لصفحة التقارير
+- الأعمدة: اسم المنتج، اسم العميل، الهاتف، العنوان
+- توحيد الكتابة العربية: أ/إ/آ/ٱ ← ا ، ى/ئ ← ي ، ؤ ← و ، ة ← ه ، حذف التشكيل والتطويل ، الأرقام العربية ← 0-9
+- التوحيد مكتوب بـ SQL (replace) داخل الـ Triggers حتى يعمل مع أي برنامج يكتب في المبيعات
+  (جدول sales قبل الترحيل 6، وبعده order_lines / orders / customers / products خلف VIEW sales)
+- المُقسِّم trigram يسمح بالبحث عن جزء من الكلمة (مثل LIKE '%q%') لكن عبر الفهرس
+"""
+
+from datetime import date, timedelta
+
+from sales_rollup import is_view
+
+_ARABIC_MAP = [("أ", "ا"), ("إ", "ا"), ("آ", "ا"), ("ٱ", "ا"),
+               ("ى", "ي"), ("ئ", "ي"), ("ؤ", "و"), ("ة", "ه")]
+_ARABIC_MAP += [(chr(c), "") for c in range(0x064B, 0x0653)]  # التشكيل
+_ARABIC_MAP += [("ٰ", ""), ("ـ", "")]  # ألف خنجرية + تطويل
+_ARABIC_MAP += [(chr(0x0660 + i), str(i)) for i in range(10)]  # ٠-٩
+_ARABIC_MAP += [(chr(0x06F0 + i), str(i)) for i in range(10)]  # ۰-۹
+
+_TRANSLATE = str.maketrans({a: b for a, b in _ARABIC_MAP})
+
+FTS_COLUMNS = ("product_name", "customer_name", "customer_phone", "customer_address")
+
+
+def normalize_arabic(text):
+    """نفس التوحيد المستخدم في الفهرس، لتطبيقه على نص البحث."""
+    return (text or "").translate(_TRANSLATE).lower()
+
+
+def normalize_arabic_many(texts):
+    """normalize_arabic لقائمة نصوص: replace على نص واحد مجمّع أسرع بكثير من translate لكل نص (lookup.py)."""
+    texts = [t or "" for t in texts]
+    joined = "\x00".join(texts)
+    if not texts or joined.count("\x00") != len(texts) - 1:
+        return [normalize_arabic(t) for t in texts]
+    for a, b in _ARABIC_MAP:
+        joined = joined.replace(a, b)
+    return joined.lower().split("\x00")
+
+
+def _normalized_select(source):
+    """
+    SELECT يعيد (id + أعمدة FTS بعد التوحيد) من source.
+    الـ replace مقسّمة على استعلامات فرعية متداخلة لأن محلل SQLite لا يقبل أكثر من ~25 replace متداخلة.
+    """
+    sql = source
+    for i in range(0, len(_ARABIC_MAP), 16):
+        exprs = []
+        for c in FTS_COLUMNS:
+            e = c
+            for a, b in _ARABIC_MAP[i:i + 16]:
+                e = f"replace({e}, '{a}', '{b}')"
+            exprs.append(f"{e} AS {c}")
+        sql = f"SELECT id, {', '.join(exprs)} FROM ({sql})"
+    return sql
+
+
+def _source_sql(r):
+    cols = ", ".join(f"lower(IFNULL({r}.{c}, '')) AS {c}" for c in FTS_COLUMNS)
+    return f"SELECT {r}.id AS id, {cols}"
+
+
+def _view_source_sql(where):
+    """نفس أعمدة _source_sql لكن من VIEW sales (النموذج الموحد)."""
+    cols = ", ".join(f"lower(IFNULL({c}, '')) AS {c}" for c in FTS_COLUMNS)
+    return f"SELECT id, {cols} FROM sales WHERE {where}"
+
+
+def _reindex_sql(lines, where):
+    """جمل حذف وإعادة إدخال أسطر الطلبات (lines: SELECT id ...) في الفهرس."""
+    return (f"DELETE FROM sales_fts WHERE rowid IN ({lines});\n"
+            f"INSERT INTO sales_fts (rowid, {', '.join(FTS_COLUMNS)}) {_normalized_select(_view_source_sql(where))};")
+
+
+# (اسم الـ Trigger، الحدث، أسطر الطلبات المتأثرة، شرطها على VIEW sales)
+_VIEW_TRIGGERS = [
+    ("order_lines_fts_au", "AFTER UPDATE OF order_id, product_id, product_name ON order_lines",
+     "SELECT OLD.id", "id = NEW.id"),
+    ("orders_fts_au", "AFTER UPDATE OF customer_id ON orders",
+     "SELECT id FROM order_lines WHERE order_id = NEW.id", "order_id = NEW.id"),
+    ("customers_fts_au", "AFTER UPDATE OF name, phone, address ON customers",
+     "SELECT id FROM sales WHERE customer_id = NEW.id", "customer_id = NEW.id"),
+    ("products_fts_au", "AFTER UPDATE OF name ON products WHEN OLD.name IS NOT NEW.name",
+     "SELECT id FROM order_lines WHERE product_id = NEW.id AND product_name IS NULL",
+     "product_id = NEW.id"),
+]
+
+
+def _create_view_triggers(cur):
+    cols = ", ".join(FTS_COLUMNS)
+    cur.execute(f"""CREATE TRIGGER IF NOT EXISTS order_lines_fts_ai AFTER INSERT ON order_lines BEGIN
+                    INSERT INTO sales_fts (rowid, {cols}) {_normalized_select(_view_source_sql('id = NEW.id'))};
+                    END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS order_lines_fts_ad AFTER DELETE ON order_lines BEGIN
+                    DELETE FROM sales_fts WHERE rowid = OLD.id;
+                    END""")
+    for name, event, lines, where in _VIEW_TRIGGERS:
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN\n{_reindex_sql(lines, where)}\nEND")
+
+
+def _has_trigram(conn):
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._trigram_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp._trigram_probe")
+        return True
+    except Exception:
+        return False
+
+
+# ---------- الإنشاء ----------
+def ensure_sales_fts(conn, commit=True):
+    """ينشئ sales_fts والـ Triggers ويعبئه من sales عند أول إنشاء."""
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name='sales_fts'")
+    exists = cur.fetchone() is not None
+    tokenize = "trigram" if _has_trigram(conn) else "unicode61 remove_diacritics 2"
+    cols = ", ".join(FTS_COLUMNS)
+    cur.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS sales_fts USING fts5({cols}, tokenize='{tokenize}')")
+    if is_view(cur, "sales"):
+        _create_view_triggers(cur)
+    else:
+        cur.execute(f"""CREATE TRIGGER IF NOT EXISTS sales_fts_ai AFTER INSERT ON sales BEGIN
+                        INSERT INTO sales_fts (rowid, {cols}) {_normalized_select(_source_sql('NEW'))};
+                        END""")
+        cur.execute("""CREATE TRIGGER IF NOT EXISTS sales_fts_ad AFTER DELETE ON sales BEGIN
+                        DELETE FROM sales_fts WHERE rowid = OLD.id;
+                        END""")
+        cur.execute(f"""CREATE TRIGGER IF NOT EXISTS sales_fts_au AFTER UPDATE OF {cols} ON sales BEGIN
+                        DELETE FROM sales_fts WHERE rowid = OLD.id;
+                        INSERT INTO sales_fts (rowid, {cols}) {_normalized_select(_source_sql('NEW'))};
+                        END""")
+    if not exists:
+        rebuild_sales_fts(conn, commit=False)
+    if commit:
+        conn.commit()
+
+
+def rebuild_sales_fts(conn, commit=True, chunk_size=20000):
+    """يعيد بناء الفهرس من sales. التوحيد هنا في بايثون (أسرع بكثير من replace المتداخلة لملايين الصفوف)."""
+    conn.execute("DELETE FROM sales_fts")
+    index_sales_rows(conn, chunk_size=chunk_size)
+    if commit:
+        conn.commit()
+
+
+def optimize_sales_fts(cur):
+    """
+    يدمج مقاطع الفهرس في مقطع واحد. الحذف في FTS5 يضيف علامات حذف فقط، فبعد حذف شهور كاملة
+    (sales_archive) يبقى حجم الفهرس كما هو حتى هذا الدمج.
+    """
+    cur.execute("INSERT INTO sales_fts (sales_fts) VALUES ('optimize')")
+
+
+def index_sales_rows(conn, after_id=None, chunk_size=20000):
+    """يضيف صفوف sales (كلها، أو ذات id > after_id) إلى الفهرس بدون commit."""
+    cols = ", ".join(FTS_COLUMNS)
+    src = conn.cursor()
+    if after_id is None:
+        src.execute(f"SELECT id, {cols} FROM sales")
+    else:
+        src.execute(f"SELECT id, {cols} FROM sales WHERE id > ?", (after_id,))
+    insert = f"INSERT INTO sales_fts (rowid, {cols}) VALUES (?{', ?' * len(FTS_COLUMNS)})"
+    while True:
+        rows = src.fetchmany(chunk_size)
+        if not rows:
+            break
+        conn.executemany(insert, [(r[0],) + tuple(normalize_arabic(v if isinstance(v, str) else ("" if v is None else str(v))) for v in r[1:]) for r in rows])
+
+
+# ---------- البحث ----------
+_trigram_cache = {}
+
+
+def _fts_is_trigram(cur):
+    key = id(cur.connection)
+    if key not in _trigram_cache:
+        cur.execute("SELECT sql FROM sqlite_master WHERE name='sales_fts'")
+        row = cur.fetchone()
+        _trigram_cache[key] = bool(row and "trigram" in row[0])
+    return _trigram_cache[key]
+
+
+def search_clause(cur, q):
+    """
+    يعيد (شرط SQL على sales.id، المعاملات) لنص البحث q.
+    الكلمات من 3 أحرف فأكثر تُبحث عبر MATCH، والأقصر عبر LIKE على النص الموحّد في sales_fts.
+    """
+    words = normalize_arabic(q).split()
+    if not words:
+        return "1=1", []
+    trigram = _fts_is_trigram(cur)
+    sub = "SELECT rowid FROM sales_fts WHERE 1=1"
+    params = []
+    if trigram:
+        terms = [w for w in words if len(w) >= 3]
+        short = [w for w in words if len(w) < 3]
+    else:
+        terms, short = words, []
+    if terms:
+        sub += " AND sales_fts MATCH ?"
+        suffix = "" if trigram else "*"
+        params.append(" ".join('"' + t.replace('"', '""') + '"' + suffix for t in terms))
+    for w in short:
+        sub += " AND (" + " OR ".join(f"{c} LIKE ?" for c in FTS_COLUMNS) + ")"
+        params += [f"%{w}%"] * len(FTS_COLUMNS)
+    return f"id IN ({sub})", params
+
+
+# ---------- فلاتر صفحة التقارير ----------
+def day_bounds(f_from, f_to):
+    """يحوّل فلتر (من / إلى تاريخ) إلى حدود نصية لـ sold_at حتى يُستخدم الفهرس idx_sales_sold_at
+    (sold_at >= من AND sold_at < اليوم التالي لـ إلى) بدلاً من date(sold_at)."""
+    lo = date.fromisoformat(f_from).isoformat() if f_from else None
+    hi = (date.fromisoformat(f_to) + timedelta(days=1)).isoformat() if f_to else None
+    return lo, hi
+
+
+def sales_filter(cur, q="", f_from="", f_to="", date_col="sold_at"):
+    """
+    شرط WHERE لفلاتر التقارير (بحث + من / إلى تاريخ) يُستخدم في الجدول وفي التصدير.
+    يرفع ValueError إذا كان التاريخ بصيغة خاطئة.
+    """
+    lo, hi = day_bounds(f_from, f_to)
+    sql, params = "1=1", []
+    if q and q.strip():
+        clause, q_params = search_clause(cur, q)
+        sql += " AND " + clause
+        params += q_params
+    if lo:
+        sql += f" AND {date_col} >= ?"
+        params.append(lo)
+    if hi:
+        sql += f" AND {date_col} < ?"
+        params.append(hi)
+    return sql, params
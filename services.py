@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+services.py
+طبقة العمليات (منطق المتجر) المشتركة بين تطبيق سطح المكتب و Streamlit وخادم الـ API
+- حساب إجمالي البيع / التكلفة / صافي الربح في مكان واحد
+- تعديل المخزون عند البيع والتعديل والحذف (adjust_stock) وحد إعادة الطلب، ولقطة المخزون في inventory.py
+- الطلب (orders) له عميل واحد (customers) وعدة أصناف (order_lines)؛ VIEW sales يعرض سطراً لكل صنف
+- الأشهر المؤرشفة (sales_archive.py) تُقرأ مع الجدول الحي ولا تُعدل
+- changes_since: ما تغير منذ رقم تسلسل (change_feed.py) حتى تحدّث نقاط البيع شاشاتها بدون إعادة تحميل
+- search_products / search_customers: إكمال تلقائي بالبادئة من فهرس في الذاكرة (lookup.py)
+كل دالة تستقبل مؤشراً (cursor) ولا تعمل commit؛ المستدعي يحدد المعاملة:
+DbWorker.submit(..., write=True) في Tkinter، db.run_in_transaction في Streamlit، و Store في الـ API.
+"""
+
+from datetime import datetime
+
+from change_feed import last_seq, read_changes
+from db import ConnectionPool, connect, run_in_transaction
+from inventory import inventory_view
+from lookup import find_customers, find_products
+from migrations import migrate
+from sales_archive import archived_rows, sales_query
+from sales_rollup import rollup_totals
+
+SALE_FIELDS = ("id", "sold_at", "product_id", "product_name", "quantity", "unit_sell", "unit_cost", "total",
+               "cost_total", "net_profit", "customer_name", "customer_phone", "customer_address", "order_id")
+PRODUCT_FIELDS = ("id", "name", "description", "qty", "quantity", "cost_price", "sell_price", "price", "image_path",
+                  "reorder_level")
+ORDER_FIELDS = ("id", "external_id", "sold_at", "customer_id", "customer_name", "customer_phone", "customer_address")
+
+_SQL_SALE = f"SELECT {', '.join(SALE_FIELDS)} FROM sales WHERE id = ?"
+_SQL_ORDER = """SELECT o.id, o.external_id, o.sold_at, o.customer_id, c.name, c.phone, c.address
+                FROM orders o LEFT JOIN customers c ON c.id = o.customer_id WHERE o.id = ?"""
+
+
+class NotFound(LookupError):
+    pass
+
+
+def _positive_int(value, what):
+    try:
+        n = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{what}: رقم غير صحيح")
+    if n <= 0:
+        raise ValueError(f"{what}: يجب أن يكون أكبر من صفر")
+    return n
+
+
+def _amount(value, what):
+    try:
+        x = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{what}: رقم غير صحيح")
+    if x < 0:
+        raise ValueError(f"{what}: لا يمكن أن يكون سالباً")
+    return x
+
+
+def sale_amounts(quantity, unit_sell, unit_cost):
+    """(إجمالي البيع، إجمالي التكلفة، صافي الربح) لعملية بيع."""
+    total = unit_sell * quantity
+    cost_total = unit_cost * quantity
+    return total, cost_total, total - cost_total
+
+
+# ---------- المنتجات ----------
+def add_product(cur, name, price=0.0, qty=0, cost_price=0.0, description="", image_path=None, reorder_level=None):
+    """
+    يضيف منتجاً ويعيد رقمه. الأعمدة المكررة بين التطبيقين تُملأ معاً
+    (qty / quantity و sell_price / price) حتى يرى كل تطبيق نفس الكمية والسعر.
+    reorder_level: حد التنبيه بنقص المخزون (فارغ = inventory.DEFAULT_REORDER_LEVEL).
+    """
+    name = (name or "").strip()
+    if not name:
+        raise ValueError("اسم المنتج مطلوب")
+    price = _amount(price, "سعر البيع")
+    cost_price = _amount(cost_price, "سعر الشراء")
+    qty = int(qty or 0)
+    level = _reorder_level(reorder_level)
+    cur.execute("""INSERT INTO products (name, description, qty, quantity, cost_price, sell_price, price, image_path,
+                                         reorder_level)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (name, description or "", qty, qty, cost_price, price, price, image_path or "", level))
+    return cur.lastrowid
+
+
+def _reorder_level(value):
+    if value is None or value == "":
+        return None
+    try:
+        n = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("حد إعادة الطلب: رقم غير صحيح")
+    if n < 0:
+        raise ValueError("حد إعادة الطلب: لا يمكن أن يكون سالباً")
+    return n
+
+
+def set_reorder_level(cur, product_id, reorder_level):
+    """يغير حد إعادة الطلب لمنتج (None = الافتراضي)."""
+    cur.execute("UPDATE products SET reorder_level = ? WHERE id = ?", (_reorder_level(reorder_level), product_id))
+    if cur.rowcount == 0:
+        raise NotFound(f"product {product_id}")
+
+
+def adjust_stock(cur, product_id, delta):
+    """يضيف delta إلى مخزون المنتج (سالب عند البيع) في العمودين qty و quantity معاً."""
+    cur.execute("UPDATE products SET qty = IFNULL(qty, 0) + ?1, quantity = IFNULL(quantity, 0) + ?1 WHERE id = ?2",
+                (delta, product_id))
+
+
+def inventory_status(cur, limit=20):
+    """المخزون (الكمية والقيمة بسعر الشراء والبيع) والمنتجات التي وصلت إلى حد إعادة الطلب."""
+    return inventory_view(cur, limit)
+
+
+def list_products(cur):
+    cur.execute(f"SELECT {', '.join(PRODUCT_FIELDS)} FROM products ORDER BY name")
+    return [dict(zip(PRODUCT_FIELDS, r)) for r in cur.fetchall()]
+
+
+def search_products(cur, prefix, limit=10):
+    """المنتجات التي يبدأ اسمها بـ prefix أو رقمها = prefix: {id, name, sell_price, qty}."""
+    return find_products(cur, prefix, max(1, min(int(limit), 100)))
+
+
+# ---------- العملاء والطلبات (orders / order_lines) ----------
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def customer_id(cur, name="", phone="", address=""):
+    """رقم العميل بهذه البيانات، ويُضاف إلى customers إن لم يكن موجوداً."""
+    key = (name or "", phone or "", address or "")
+    select = "SELECT id FROM customers WHERE name = ? AND phone = ? AND address = ?"
+    row = cur.execute(select, key).fetchone()
+    if row is None:
+        # OR IGNORE: another writer may have added the same customer since the SELECT
+        cur.execute("INSERT OR IGNORE INTO customers (name, phone, address) VALUES (?, ?, ?)", key)
+        row = cur.execute(select, key).fetchone()
+    return row[0]
+
+
+def search_customers(cur, prefix, limit=10):
+    """العملاء الذين يبدأ هاتفهم أو اسمهم بـ prefix: {id, name, phone, address}."""
+    return find_customers(cur, prefix, max(1, min(int(limit), 100)))
+
+
+def _insert_line(cur, order_id, product_id, product_name, quantity, unit_sell, unit_cost, total):
+    # product_name is stored only for lines without a product row (free-text / imported products)
+    cur.execute("""INSERT INTO order_lines (order_id, product_id, product_name, quantity, unit_sell, unit_cost, total)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (order_id, product_id, None if product_id else product_name, quantity, unit_sell, unit_cost, total))
+    return cur.lastrowid
+
+
+def create_order(cur, items, customer_name="", customer_phone="", customer_address="", sold_at=None, external_id=None):
+    """
+    يسجل طلباً من عدة أصناف ويخصم الكميات من المخزون.
+    items: قائمة dict فيها product_id و quantity و unit_sell (اختياري، افتراضياً سعر المنتج الحالي).
+    يعيد (رقم الطلب، أرقام الأسطر). رقم السطر هو "رقم العملية" في صفحة الطلبات والفواتير.
+    """
+    if not items:
+        raise ValueError("الطلب بدون أصناف")
+    lines = []
+    for item in items:
+        quantity = _positive_int(item.get("quantity"), "الكمية")
+        cur.execute("SELECT name, cost_price, sell_price FROM products WHERE id = ?", (item.get("product_id"),))
+        row = cur.fetchone()
+        if row is None:
+            raise NotFound(f"product {item.get('product_id')}")
+        unit_cost, sell_price = float(row[1] or 0), float(row[2] or 0)
+        unit_sell = sell_price if item.get("unit_sell") is None else _amount(item["unit_sell"], "سعر البيع")
+        lines.append((item["product_id"], row[0], quantity, unit_sell, unit_cost))
+    cur.execute("INSERT INTO orders (external_id, customer_id, sold_at) VALUES (?, ?, ?)",
+                (external_id, customer_id(cur, customer_name, customer_phone, customer_address), sold_at or _now()))
+    order_id = cur.lastrowid
+    line_ids = []
+    for product_id, name, quantity, unit_sell, unit_cost in lines:
+        line_ids.append(_insert_line(cur, order_id, product_id, name, quantity, unit_sell, unit_cost, unit_sell * quantity))
+        adjust_stock(cur, product_id, -quantity)
+    return order_id, line_ids
+
+
+def get_order(cur, order_id):
+    """رأس الطلب (dict بحقول ORDER_FIELDS) + items: أسطره بحقول SALE_FIELDS."""
+    cur.execute(_SQL_ORDER, (order_id,))
+    row = cur.fetchone()
+    if row is None:
+        raise NotFound(f"order {order_id}")
+    order = dict(zip(ORDER_FIELDS, row))
+    cur.execute(f"SELECT {', '.join(SALE_FIELDS)} FROM sales WHERE order_id = ? ORDER BY id", (order_id,))
+    order["items"] = [dict(zip(SALE_FIELDS, r)) for r in cur.fetchall()]
+    return order
+
+
+# ---------- المبيعات (تطبيق سطح المكتب / نقاط البيع) ----------
+# "عملية البيع" = سطر واحد من order_lines، تُقرأ من VIEW sales بنفس أعمدة جدول sales القديم
+def get_sale(cur, sale_id):
+    cur.execute(_SQL_SALE, (sale_id,))
+    row = cur.fetchone()
+    if row is None:
+        archived = archived_rows(cur, SALE_FIELDS, ids=[sale_id])
+        if not archived:
+            raise NotFound(f"sale {sale_id}")
+        row = archived[0]
+    return dict(zip(SALE_FIELDS, row))
+
+
+def _missing_sale(cur, sale_id):
+    """الخطأ المناسب لعملية غير موجودة في الجدول الحي: ValueError إن كانت مؤرشفة (الأرشيف لا يُعدل)."""
+    if archived_rows(cur, ("id",), ids=[sale_id]):
+        return ValueError("العملية في شهر مؤرشف ولا يمكن تعديلها أو حذفها")
+    return NotFound(f"sale {sale_id}")
+
+
+def add_sale(cur, product_id, quantity, customer_name="", customer_phone="", customer_address="",
+             unit_sell=None, sold_at=None):
+    """يسجل عملية بيع (طلب من صنف واحد) بسعر المنتج الحالي (أو unit_sell) ويخصم الكمية من المخزون. يعيد رقم العملية."""
+    _order_id, line_ids = create_order(cur, [{"product_id": product_id, "quantity": quantity, "unit_sell": unit_sell}],
+                                       customer_name, customer_phone, customer_address, sold_at)
+    return line_ids[0]
+
+
+def update_sale(cur, sale_id, customer_name, customer_phone, customer_address, quantity, unit_sell):
+    """
+    تعديل عملية بيع: يعيد حساب المبالغ بتكلفة الوحدة المسجلة ويصحح المخزون بفرق الكمية.
+    بيانات العميل تخص الطلب كله (كل أصنافه).
+    """
+    quantity = _positive_int(quantity, "الكمية")
+    unit_sell = _amount(unit_sell, "سعر البيع")
+    cur.execute("SELECT product_id, quantity, order_id FROM order_lines WHERE id = ?", (sale_id,))
+    row = cur.fetchone()
+    if row is None:
+        raise _missing_sale(cur, sale_id)
+    product_id, old_qty, order_id = row[0], int(row[1] or 0), row[2]
+    adjust_stock(cur, product_id, old_qty - quantity)
+    cur.execute("UPDATE order_lines SET quantity = ?, unit_sell = ?, total = ? WHERE id = ?",
+                (quantity, unit_sell, unit_sell * quantity, sale_id))
+    cid = customer_id(cur, customer_name, customer_phone, customer_address)
+    cur.execute("UPDATE orders SET customer_id = ? WHERE id = ? AND customer_id IS NOT ?", (cid, order_id, cid))
+
+
+def delete_sale(cur, sale_id):
+    """حذف عملية بيع وإرجاع كميتها إلى المخزون (والطلب نفسه إذا لم يبق فيه أصناف)."""
+    cur.execute("SELECT product_id, quantity, order_id FROM order_lines WHERE id = ?", (sale_id,))
+    row = cur.fetchone()
+    if row is None:
+        raise _missing_sale(cur, sale_id)
+    adjust_stock(cur, row[0], row[1])
+    cur.execute("DELETE FROM order_lines WHERE id = ?", (sale_id,))
+    cur.execute("DELETE FROM orders WHERE id = ? AND NOT EXISTS (SELECT 1 FROM order_lines WHERE order_id = ?)",
+                (row[2], row[2]))
+
+
+def list_sales(cur, q="", f_from="", f_to="", limit=50, before_id=None):
+    """صفحة من المبيعات الحية والمؤرشفة (الأحدث أولاً) بفلاتر التقارير؛ before_id للصفحة التالية (keyset)."""
+    query = sales_query(cur, SALE_FIELDS[1:], q, f_from, f_to)
+    limit = max(1, min(int(limit), 1000))
+    plan = ("after", int(before_id), limit) if before_id else ("offset", 0, limit)
+    return [dict(zip(SALE_FIELDS, r)) for r in query.fetch(cur, plan)]
+
+
+def sales_stats(cur, day_from=None, day_to=None):
+    ops, revenue, profit = rollup_totals(cur, day_from, day_to)
+    return {"ops": ops, "revenue": revenue, "net_profit": profit}
+
+
+def changes_since(cur, since=0):
+    """
+    {seq, reset, sales (الأسطر الجديدة / المعدلة بحقول SALE_FIELDS), deleted, tables, today}
+    since = آخر seq عند العميل؛ 0 أو reset = True: على العميل إعادة تحميل ما يعرضه ثم المتابعة من seq.
+    """
+    changes = read_changes(cur, since) if since > 0 else {"seq": last_seq(cur), "inserted": set(), "updated": set(),
+                                                          "deleted": set(), "tables": set(), "reset": True}
+    ids = sorted(changes["inserted"] | changes["updated"])
+    rows = []
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        cur.execute(f"SELECT {', '.join(SALE_FIELDS)} FROM sales WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        rows += [dict(zip(SALE_FIELDS, r)) for r in cur.fetchall()]
+    today = datetime.now().strftime("%Y-%m-%d")
+    return {"seq": changes["seq"], "reset": changes["reset"], "sales": rows, "deleted": sorted(changes["deleted"]),
+            "tables": sorted(changes["tables"]), "today": sales_stats(cur, today, today)}
+
+
+# ---------- الطلبات (Streamlit) ----------
+def add_order(cur, customer, product, qty, total=None, date=None):
+    """
+    يسجل طلباً من صنف واحد باسم المنتج ويخصم الكمية من المخزون. total افتراضياً = سعر المنتج × الكمية.
+    منتج غير موجود مقبول فقط مع total (يُحفظ اسمه في السطر). يعيد (رقم الطلب، الإجمالي).
+    """
+    qty = _positive_int(qty, "الكمية")
+    cur.execute("SELECT id, price, cost_price FROM products WHERE name = ? ORDER BY id LIMIT 1", (product,))
+    row = cur.fetchone()
+    if row is None and total is None:
+        raise NotFound(f"product {product}")
+    product_id, price, unit_cost = (row[0], float(row[1] or 0), float(row[2] or 0)) if row else (None, 0.0, 0.0)
+    total = _amount(price * qty if total is None else total, "الإجمالي")
+    cur.execute("INSERT INTO orders (customer_id, sold_at) VALUES (?, ?)",
+                (customer_id(cur, customer), date or datetime.now().strftime("%Y-%m-%d %H:%M")))
+    order_id = cur.lastrowid
+    _insert_line(cur, order_id, product_id, product, qty, total / qty, unit_cost, total)
+    if product_id:
+        adjust_stock(cur, product_id, -qty)
+    return order_id, total
+
+
+def order_stats(cur):
+    cur.execute("""SELECT (SELECT COUNT(*) FROM orders) + (SELECT IFNULL(SUM(orders), 0) FROM sales_archive),
+                          (SELECT IFNULL(SUM(revenue), 0) FROM sales_daily), (SELECT COUNT(*) FROM products)""")
+    orders, sales, products = cur.fetchone()
+    return {"total_orders": orders, "total_sales": sales, "total_products": products}
+
+
+# ---------- Store: نفس العمليات عبر مجمع اتصالات (خادم الـ API) ----------
+class Store:
+    """
+    store = Store(DB_PATH); store.read(list_products); store.write(add_sale, pid, 2)
+    اتصال كتابة واحد (الكتابات في SQLite متسلسلة أصلاً) + عدة اتصالات قراءة فقط.
+    """
+
+    def __init__(self, db_path, readers=4):
+        conn = connect(db_path)
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
+        self.writers = ConnectionPool(db_path, 1)
+        self.readers = ConnectionPool(db_path, readers, readonly=True)
+
+    def read(self, fn, *args, **kwargs):
+        with self.readers.connection() as conn:
+            return fn(conn.cursor(), *args, **kwargs)
+
+    def write(self, fn, *args, **kwargs):
+        with self.writers.connection() as conn:
+            return run_in_transaction(conn, lambda cur: fn(cur, *args, **kwargs))
+
+    def close(self):
+        self.writers.close()
+        self.readers.close()
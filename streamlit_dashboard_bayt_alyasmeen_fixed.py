@@ -8,70 +8,175 @@ Streamlit Dashboard – بيت الياسمين للعطور (نسخة نهائ
 - تصدير بيانات Excel
 - شعار مرفوع من المستخدم
 - دعم RTL ومحاذاة يمين
+- صفحة التشخيص: أزمنة الاستعلامات والصفحات (profiling.py)
+- الطلبات تشمل الأشهر المؤرشفة (sales_archive.py)
+- أرقام لوحة التحكم تتحدث وحدها، والكتابات من التطبيقات الأخرى تظهر فوراً (change_feed.py)
+- إكمال تلقائي للمنتج والعميل في صفحة الطلبات من فهرس في الذاكرة (lookup.py)
+- نسخ احتياطي دوري أثناء العمل ولقطات مضغوطة في صفحة التشخيص (backup.py)
+- ملف Excel للطلبات يُعاد من report_cache.py ما لم تتغير بيانات الفترة، وأمس / الشهر يُبنى ليلاً
 """
 
 import streamlit as st
 import pandas as pd
-import sqlite3
 import os
-from datetime import datetime
+import threading
+import time
+from datetime import timedelta
 from io import BytesIO
 from PIL import Image
+from migrations import migrate
+from db import connect, run_in_transaction
+from change_feed import ChangeFeed, touches_sales
+from excel_export import stream_rows_to_xlsx
+from sales_archive import sales_query
+from image_store import store_image_bytes, thumbnail_path
+import analytics
+import backup
+import order_import
+import profiling
+import report_cache
+import services
 
 try:
     from reportlab.lib.pagesizes import A4
     from reportlab.pdfgen import canvas
+    from arabic_text import register_fonts, shape
     REPORTLAB_AVAILABLE = True
 except ImportError:
     REPORTLAB_AVAILABLE = False
 
 
+# ---------- طبقة البيانات (اتصال مشترك + نتائج مخزنة مؤقتاً) ----------
+# اتصالان لكل عملية Streamlit مشتركان بين كل الجلسات: واحد للكتابة وواحد للقراءة فقط (db.py، وضع WAL)،
+# فالقراءة لا تنتظر الكتابات ولا تطبيق سطح المكتب. الاستعلامات مخزنة في cache_data.
+# أي كتابة من هذا التطبيق تمسح الـ cache المتأثر فوراً، وكتابات تطبيق سطح المكتب وخادم الـ API تمسحه
+# عند أول rerun (sync_caches عبر change_feed)؛ CACHE_TTL احتياط فقط.
+CACHE_TTL = 30
+PAGE_ROWS = 100   # صفوف جدول صفحة التقارير المعروضة مرة واحدة
+LIVE_SECONDS = 5  # تحديث أرقام لوحة التحكم (st.fragment) — بدون أي استعلام إن لم يتغير شيء
+DB_PATH = 'store.sqlite3'
+# صنف لكل صف (VIEW sales فوق orders / order_lines / customers + الأشهر المؤرشفة) بأسماء أعمدة صفحة الطلبات
+ORDER_COLUMNS = ("order_id", "customer_name", "product_name", "quantity", "total", "sold_at")
+ORDER_HEADERS = ["id", "customer", "product", "qty", "total", "date"]
+
+
+@st.cache_resource
+def get_db():
+    # الجداول والفهارس في migrations.py (مشتركة مع تطبيق سطح المكتب)
+    conn = connect(DB_PATH, check_same_thread=False)
+    migrate(conn)
+    backup.start_backup_thread(DB_PATH)
+    report_cache.start_prebuild_thread(DB_PATH)
+    return conn, threading.Lock()
+
+
+@st.cache_resource
+def get_read_db():
+    get_db()  # the file and schema must exist before a read-only open
+    return connect(DB_PATH, readonly=True, check_same_thread=False), threading.Lock()
+
+
 def init_db():
-    conn = sqlite3.connect('store.sqlite3')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS products (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT,
-                    price REAL,
-                    quantity INTEGER,
-                    image_path TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS orders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    customer TEXT,
-                    product TEXT,
-                    qty INTEGER,
-                    total REAL,
-                    date TEXT)''')
-    conn.commit()
-    conn.close()
-
-
-def add_product(name, price, qty, image_path):
-    conn = sqlite3.connect('store.sqlite3')
-    c = conn.cursor()
-    c.execute("INSERT INTO products (name, price, quantity, image_path) VALUES (?, ?, ?, ?)", (name, price, qty, image_path))
-    conn.commit()
-    conn.close()
+    get_db()
+
+
+def run_query(sql, params=()):
+    conn, lock = get_read_db()
+    with lock:
+        return pd.read_sql_query(sql, conn, params=list(params))
+
+
+@st.cache_resource
+def get_feed():
+    return ChangeFeed()
+
+
+def sync_caches():
+    """يمسح الـ cache الذي غيرته كتابات أخرى منذ آخر فحص (PRAGMA data_version فقط إن لم يتغير شيء)."""
+    conn, lock = get_read_db()
+    with lock:
+        changes = get_feed().poll(conn.cursor())
+    if changes is None:
+        return
+    if touches_sales(changes):
+        get_orders_page.clear()
+        get_analytics.clear()
+        get_stats.clear()
+    if changes["stock"] or "products" in changes["tables"]:
+        get_products.clear()
+        get_stats.clear()
 
 
+def run_write(fn, *args, **kwargs):
+    """يشغل دالة من services.py في معاملة واحدة على اتصال الكتابة ويعيد نتيجتها."""
+    conn, lock = get_db()
+    with lock:
+        # BEGIN IMMEDIATE + retry with backoff while the desktop app holds the write lock
+        return run_in_transaction(conn, lambda cur: fn(cur, *args, **kwargs))
+
+
+def add_product(name, price, qty, image_path, reorder_level=None):
+    run_write(services.add_product, name, price=price, qty=qty, image_path=image_path, reorder_level=reorder_level)
+    get_products.clear()
+    get_stats.clear()
+
+
+@st.cache_data(ttl=CACHE_TTL)
 def get_products():
-    conn = sqlite3.connect('store.sqlite3')
-    df = pd.read_sql_query("SELECT * FROM products", conn)
-    conn.close()
-    return df
+    return run_query("SELECT * FROM products")
+
+
+def add_order(customer, product_id, qty):
+    """طلب من صنف واحد برقم المنتج المختار؛ customer: عميل سابق (dict من البحث) أو الاسم المكتوب."""
+    if isinstance(customer, dict):
+        who = (customer["name"], customer["phone"] or "", customer["address"] or "")
+    else:
+        who = (customer,)
+    run_write(services.create_order, [{"product_id": product_id, "quantity": qty}], *who)
+    get_products.clear()
+    get_orders_page.clear()
+    get_analytics.clear()
+    get_stats.clear()
+
+
+def import_orders_file(upload):
+    """استيراد بالجملة عبر order_import (معاملة واحدة لكل دفعة على اتصال الكتابة المشترك)."""
+    conn, lock = get_db()
+    with lock:
+        report = order_import.import_orders(conn, order_import.read_rows(BytesIO(upload.getvalue()), upload.name))
+    get_products.clear()
+    get_orders_page.clear()
+    get_analytics.clear()
+    get_stats.clear()
+    return report
+
+
+@st.cache_data(ttl=CACHE_TTL)
+def get_stats():
+    """أرقام لوحة التحكم بتجميع داخل SQLite بدلاً من تحميل كل الطلبات في pandas."""
+    conn, lock = get_read_db()
+    with lock:
+        return services.order_stats(conn.cursor())
 
 
-def add_order(customer, product, qty, total):
-    conn = sqlite3.connect('store.sqlite3')
-    c = conn.cursor()
-    date = datetime.now().strftime('%Y-%m-%d %H:%M')
-    c.execute("INSERT INTO orders (customer, product, qty, total, date) VALUES (?, ?, ?, ?, ?)", (customer, product, qty, total, date))
-    c.execute("UPDATE products SET quantity = quantity - ? WHERE name = ?", (qty, product))
-    conn.commit()
-    conn.close()
+def get_inventory(limit=20):
+    """لقطة المخزون (inventory.py): تُحدَّث بالمنتجات المتغيرة فقط، فلا تحتاج cache_data."""
+    conn, lock = get_read_db()
+    with lock:
+        return services.inventory_status(conn.cursor(), limit)
 
 
-def generate_invoice(order_id, customer, product, qty, total):
+def search(fn, prefix, limit=10):
+    """إكمال تلقائي (services.search_products / search_customers): فهرس lookup.py في الذاكرة، بدون cache_data."""
+    if not prefix.strip():
+        return []
+    conn, lock = get_read_db()
+    with lock:
+        return fn(conn.cursor(), prefix, limit)
+
+
+@profiling.timed_fn("invoice")
+def generate_invoice(order_id, customer, product, qty, total, image_path=None):
     if not os.path.exists('invoices'):
         os.makedirs('invoices')
 
@@ -79,12 +184,16 @@ def generate_invoice(order_id, customer, product, qty, total):
 
     if REPORTLAB_AVAILABLE:
         c = canvas.Canvas(pdf_path, pagesize=A4)
-        c.setFont("Helvetica", 14)
-        c.drawString(100, 800, f"فاتورة طلب رقم: {order_id}")
-        c.drawString(100, 770, f"العميل: {customer}")
-        c.drawString(100, 740, f"المنتج: {product}")
-        c.drawString(100, 710, f"الكمية: {qty}")
-        c.drawString(100, 680, f"الإجمالي: {total} جنيه")
+        regular, _bold = register_fonts()
+        c.setFont(regular, 14)
+        c.drawString(100, 800, shape(f"فاتورة طلب رقم: {order_id}"))
+        c.drawString(100, 770, shape(f"العميل: {customer}"))
+        c.drawString(100, 740, shape(f"المنتج: {product}"))
+        c.drawString(100, 710, shape(f"الكمية: {qty}"))
+        c.drawString(100, 680, shape(f"الإجمالي: {total} جنيه"))
+        thumb = thumbnail_path(image_path, "invoice")
+        if thumb:
+            c.drawImage(thumb, 380, 640, width=180, height=180, preserveAspectRatio=True)
         c.save()
     else:
         with open(pdf_path, 'w', encoding='utf-8') as f:
@@ -93,11 +202,76 @@ def generate_invoice(order_id, customer, product, qty, total):
     return pdf_path
 
 
-def get_orders():
-    conn = sqlite3.connect('store.sqlite3')
-    df = pd.read_sql_query("SELECT * FROM orders", conn)
-    conn.close()
-    return df
+@st.cache_data(ttl=CACHE_TTL)
+def get_analytics(q="", d_from=None, d_to=None):
+    """
+    تحليلات الطلبات بنفس فلاتر الصفحة (analytics.analyze: تجميع عمودي على دفعات).
+    اتصال قراءة خاص بها: المسح الكامل لا يحجز قفل get_read_db عن قراءات الجلسات الأخرى.
+    """
+    lo = d_from.isoformat() if d_from else None
+    hi = (d_to + timedelta(days=1)).isoformat() if d_to else None
+    conn = connect(DB_PATH, readonly=True)
+    try:
+        with profiling.timed("report", "analytics.analyze"):
+            result = analytics.analyze(conn, "orders", lo, hi, q=q)
+    finally:
+        conn.close()
+    return {
+        "top": analytics.top_products(result, 20, by="total"),
+        "repeat": analytics.repeat_customer_stats(result),
+        "daily": analytics.revenue_series(result, "day", 7),
+        "monthly": analytics.revenue_series(result, "month", 3),
+        "hours": analytics.hour_of_day_profile(result),
+    }
+
+
+def orders_query(cur, q="", d_from=None, d_to=None):
+    """فلاتر صفحة التقارير كما في تطبيق سطح المكتب (sales_query): نفس البحث الموحّد والتاريخ على الجدول الحي والأرشيف."""
+    return sales_query(cur, ORDER_COLUMNS, q, d_from.isoformat() if d_from else "",
+                       d_to.isoformat() if d_to else "")
+
+
+@st.cache_data(ttl=CACHE_TTL)
+def get_orders_page(q="", d_from=None, d_to=None, page=0):
+    """(صفحة من PAGE_ROWS صف كـ DataFrame، العدد الكلي) للطلبات المفلترة؛ لا يُقرأ إلا ما يُعرض."""
+    conn, lock = get_read_db()
+    with lock, profiling.timed("query", "orders page"):
+        c = conn.cursor()
+        query = orders_query(c, q, d_from, d_to)
+        total = query.count(c)
+        rows = [r[1:] for r in query.fetch(c, ("offset", page * PAGE_ROWS, PAGE_ROWS))]
+    return pd.DataFrame(rows, columns=ORDER_HEADERS), total
+
+
+def build_orders_excel(output, progress=None, cancel=None, q="", f_from="", f_to=""):
+    """تصدير متدفق للطلبات المفلترة إلى output (الصفوف تُجلب على دفعات)؛ التواريخ نصوص YYYY-MM-DD."""
+    conn = connect(DB_PATH, readonly=True)
+    try:
+        c = conn.cursor()
+        query = sales_query(c, ORDER_COLUMNS, q, f_from, f_to)
+        total = query.count(c)
+        stream_rows_to_xlsx(query.iter_rows(c, key=False), ORDER_HEADERS, output, sheet_title="orders",
+                            progress=progress, cancel=cancel, total=total)
+    finally:
+        conn.close()
+    return output
+
+
+report_cache.register("orders_xlsx", ".xlsx", build_orders_excel)
+
+
+@profiling.timed_fn("export")
+def export_orders_excel(q="", d_from=None, d_to=None, progress=None):
+    """مسار ملف Excel للطلبات المفلترة على القرص (report_cache: يُبنى متدفقاً، ويُعاد ما لم تتغير بيانات الفترة)."""
+    path, _hit = report_cache.cache_for(DB_PATH).get(
+        "orders_xlsx", {"q": q, "f_from": d_from.isoformat() if d_from else "",
+                        "f_to": d_to.isoformat() if d_to else ""}, progress=progress)
+    return path
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
 
 
 st.set_page_config(page_title="بيت الياسمين - Dashboard", layout="wide")
@@ -108,29 +282,47 @@ if 'logo' not in st.session_state:
 
 logo_file = st.file_uploader("ارفع شعار المتجر", type=["png", "jpg", "jpeg"])
 if logo_file:
-    os.makedirs("images_perfumes", exist_ok=True)
-    logo_path = os.path.join("images_perfumes", logo_file.name)
-    with open(logo_path, "wb") as f:
-        f.write(logo_file.read())
-    st.session_state.logo = logo_path
+    st.session_state.logo = store_image_bytes(logo_file.getvalue(), logo_file.name, "images_perfumes")
 
 if st.session_state.logo:
-    st.image(st.session_state.logo, width=150)
+    st.image(thumbnail_path(st.session_state.logo, "ui") or st.session_state.logo, width=150)
 
-menu = st.sidebar.radio("اختر الصفحة:", ["لوحة التحكم", "المنتجات", "الطلبات", "التقارير"])
+pages = ["لوحة التحكم", "المنتجات", "الطلبات", "التقارير"] + (["التشخيص"] if profiling.ENABLED else [])
+menu = st.sidebar.radio("اختر الصفحة:", pages)
 init_db()
+sync_caches()
+page_start = time.perf_counter()
+# reruns only its own body every LIVE_SECONDS (older Streamlit: a plain call)
+live_fragment = st.fragment(run_every=LIVE_SECONDS) if hasattr(st, "fragment") else (lambda fn: fn)
 
 if menu == "لوحة التحكم":
-    st.subheader("الإحصائيات")
-    orders = get_orders()
-    total_sales = orders['total'].sum() if not orders.empty else 0
-    total_orders = len(orders)
-    total_products = len(get_products())
+    @live_fragment
+    def live_dashboard():
+        sync_caches()
+        st.subheader("الإحصائيات")
+        stats = get_stats()
+        total_sales = stats['total_sales']
+        total_orders = int(stats['total_orders'])
+        total_products = int(stats['total_products'])
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("إجمالي الطلبات", total_orders)
+        col2.metric("عدد المنتجات", total_products)
+        col3.metric("إجمالي المبيعات", f"{total_sales} جنيه")
 
-    col1, col2, col3 = st.columns(3)
-    col1.metric("إجمالي الطلبات", total_orders)
-    col2.metric("عدد المنتجات", total_products)
-    col3.metric("إجمالي المبيعات", f"{total_sales} جنيه")
+        st.subheader("المخزون")
+        inv = get_inventory()
+        i1, i2, i3, i4 = st.columns(4)
+        i1.metric("المخزون (قطعة)", inv["units"])
+        i2.metric("القيمة بسعر الشراء", f"{inv['value_cost']:.2f} جنيه")
+        i3.metric("القيمة بسعر البيع", f"{inv['value_sell']:.2f} جنيه")
+        i4.metric("تحت حد الطلب", inv["low_stock"], f"نافد: {inv['out_of_stock']}", delta_color="off")
+        if inv["low_stock_items"]:
+            st.markdown("**تنبيهات نقص المخزون**")
+            st.dataframe(pd.DataFrame(inv["low_stock_items"]).rename(
+                columns={"name": "المنتج", "qty": "الكمية", "reorder_level": "حد إعادة الطلب"})[["المنتج", "الكمية", "حد إعادة الطلب"]])
+
+    live_dashboard()
 
 elif menu == "المنتجات":
     st.subheader("إدارة المنتجات")
@@ -138,18 +330,20 @@ elif menu == "المنتجات":
         name = st.text_input("اسم المنتج")
         price = st.number_input("السعر", min_value=0.0, step=1.0)
         qty = st.number_input("الكمية", min_value=0, step=1)
+        reorder_level = st.number_input("حد إعادة الطلب (اختياري)", min_value=0, step=1, value=None)
         image = st.file_uploader("صورة المنتج", type=["jpg", "jpeg", "png"])
         submitted = st.form_submit_button("إضافة المنتج")
 
         if submitted:
             image_path = None
             if image:
-                os.makedirs("images_perfumes", exist_ok=True)
-                image_path = os.path.join("images_perfumes", image.name)
-                with open(image_path, "wb") as f:
-                    f.write(image.read())
-            add_product(name, price, qty, image_path)
-            st.success("تمت إضافة المنتج بنجاح")
+                image_path = store_image_bytes(image.getvalue(), image.name, "images_perfumes")
+            try:
+                add_product(name, price, qty, image_path, None if reorder_level is None else int(reorder_level))
+            except ValueError as e:   # validation in services.add_product (empty name, negative numbers)
+                st.error(str(e))
+            else:
+                st.success("تمت إضافة المنتج بنجاح")
 
     df = get_products()
     if not df.empty:
@@ -157,26 +351,124 @@ elif menu == "المنتجات":
 
 elif menu == "الطلبات":
     st.subheader("إضافة طلب جديد")
-    products_df = get_products()
-    if products_df.empty:
+    if get_stats()["total_products"] == 0:
         st.warning("لا توجد منتجات مضافة بعد")
     else:
-        customer = st.text_input("اسم العميل")
-        product = st.selectbox("اختر المنتج", products_df['name'])
-        qty = st.number_input("الكمية المطلوبة", min_value=1, step=1)
-        if st.button("تأكيد الطلب"):
-            price = float(products_df.loc[products_df['name'] == product, 'price'].values[0])
-            total = price * qty
-            add_order(customer, product, qty, total)
-            st.success(f"تم إضافة الطلب بنجاح - الإجمالي: {total} جنيه")
+        customer = st.text_input("اسم العميل (أو هاتفه للبحث)").strip()
+        known = search(services.search_customers, customer)
+        if known:
+            pick = st.selectbox("عميل سابق", [None] + known,
+                                format_func=lambda c: "— عميل جديد —" if c is None else f"{c['name']}  {c['phone']}")
+            if pick is not None:
+                customer = pick   # same customers row (name + phone + address), not a new one by name only
+        matches = search(services.search_products, st.text_input("ابحث عن المنتج (أول حروف الاسم أو رقمه)"), 20)
+        if not matches:
+            st.caption("اكتب أول حروف اسم المنتج لعرض المنتجات المطابقة")
+        else:
+            product = st.selectbox("اختر المنتج", matches,
+                                   format_func=lambda p: f"{p['name']} — {p['sell_price']:.2f} جنيه (المخزون {p['qty']})")
+            qty = st.number_input("الكمية المطلوبة", min_value=1, step=1)
+            if st.button("تأكيد الطلب"):
+                total = product["sell_price"] * qty
+                add_order(customer, product["id"], qty)
+                st.success(f"تم إضافة الطلب بنجاح - الإجمالي: {total} جنيه")
+
+    with st.expander("استيراد طلبات من ملف (CSV / Excel / JSONL)"):
+        st.caption("الأعمدة: external_id, customer, product, qty, total (أو price), date — الطلبات المستوردة سابقاً تُتجاهل")
+        upload = st.file_uploader("ملف الطلبات", type=["csv", "xlsx", "jsonl"])
+        if upload and st.button("استيراد"):
+            report = import_orders_file(upload)
+            st.success(f"تمت إضافة {report['inserted']} طلب — مكرر: {report['duplicates']} — غير صالح: {report['invalid']} "
+                       f"({report['rows_per_sec']:.0f} صف/ثانية)")
+            if report["errors"]:
+                st.dataframe(pd.DataFrame(report["errors"], columns=["الصف", "السبب"]))
 
 elif menu == "التقارير":
     st.subheader("تقارير الطلبات")
-    df = get_orders()
-    if df.empty:
+    f1, f2, f3 = st.columns(3)
+    q = f1.text_input("بحث (عميل / منتج)").strip()
+    d_from = f2.date_input("من تاريخ", value=None)
+    d_to = f3.date_input("إلى تاريخ", value=None)
+    _df, total = get_orders_page(q, d_from, d_to)
+    if not total:
         st.info("لا توجد بيانات بعد")
     else:
+        pages = (total + PAGE_ROWS - 1) // PAGE_ROWS
+        page = st.number_input(f"الصفحة (من {pages}) — عدد النتائج: {total}", min_value=1, max_value=pages, value=1)
+        df, _total = get_orders_page(q, d_from, d_to, page - 1)
         st.dataframe(df)
-        excel_buffer = BytesIO()
-        df.to_excel(excel_buffer, index=False)
-        st.download_button(label="تحميل Excel", data=excel_buffer.getvalue(), file_name="orders.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        filters = (q, d_from, d_to)
+        if st.session_state.get("export_filters") != filters:
+            st.session_state.export_filters = filters
+            st.session_state.export_path = None
+        if st.button("تجهيز ملف Excel"):
+            bar = st.progress(0.0)
+            st.session_state.export_path = export_orders_excel(
+                q, d_from, d_to, progress=lambda done, total: bar.progress(min(done / max(total or 1, 1), 1.0)))
+        path = st.session_state.get("export_path")
+        if path and os.path.exists(path):
+            # only the path is kept in the session; the file is read from disk when the button is clicked
+            st.download_button(label="تحميل Excel", data=lambda: read_file(path), file_name="orders.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+        # computed only when asked for: the body of a collapsed expander would still run on every rerun
+        if st.checkbox("تحليلات (منتجات / عملاء / إيراد)"):
+            a = get_analytics(q, d_from, d_to)
+            rep = a["repeat"]
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("عدد العملاء", rep["customers"])
+            m2.metric("عملاء متكررون", rep["repeat_customers"], f"{rep['repeat_rate']:.1%}")
+            m3.metric("حصة المتكررين من الإيراد", f"{rep['repeat_revenue_share']:.1%}")
+            m4.metric("متوسط الطلبات للعميل", f"{rep['avg_orders_per_customer']:.2f}")
+            st.markdown("**أعلى المنتجات إيراداً**")
+            st.bar_chart(a["top"]["total"])
+            st.markdown("**الإيراد اليومي (متوسط متحرك 7 أيام)**")
+            st.line_chart(a["daily"][["total", "moving_avg"]])
+            st.markdown("**الإيراد الشهري**")
+            st.line_chart(a["monthly"][["total", "moving_avg"]])
+            st.markdown("**الإيراد حسب ساعة اليوم**")
+            st.bar_chart(a["hours"])
+
+elif menu == "التشخيص":
+    st.subheader("التشخيص")
+    st.caption(f"السجل: {profiling.LOG_PATH or 'غير مفعل (BAYT_PROFILE_LOG)'} — الاستعلامات البطيئة: {profiling.SLOW_MS:.0f} ms فأكثر "
+               "(القياسات مشتركة بين كل الجلسات في هذه العملية)")
+    c1, c2 = st.columns(2)
+    if c1.button("مسح القياسات"):
+        profiling.reset()
+    if c2.button("حفظ الملخص في السجل", disabled=not profiling.LOG_PATH):
+        profiling.flush_log()
+    ops = profiling.summary()
+    if ops:
+        st.dataframe(pd.DataFrame(ops))
+    else:
+        st.info("لا توجد قياسات بعد")
+    slow = profiling.slow_queries()
+    if slow:
+        st.markdown("**آخر الاستعلامات البطيئة (مع EXPLAIN QUERY PLAN)**")
+        st.dataframe(pd.DataFrame(slow)[["at", "ms", "rows", "sql", "plan"]])
+
+    st.markdown(f"**النسخ الاحتياطية** — {backup.backup_dir(DB_PATH)} (آخر {backup.KEEP}، تلقائياً كل "
+                f"{backup.EVERY_HOURS:g} ساعة؛ الاستعادة من تطبيق سطح المكتب أو python backup.py restore)")
+    if st.button("نسخة احتياطية الآن"):
+        with st.spinner("جاري النسخ..."):
+            m = backup.create_backup(DB_PATH)
+        st.success(f"{os.path.basename(m['path'])}: {m['bytes'] / 2**20:.1f} MB في {m['total_s']} ث")
+    snapshots = backup.list_backups(DB_PATH)
+    if snapshots:
+        st.dataframe(pd.DataFrame(snapshots)[["name", "created_at", "bytes", "db_bytes", "archive_files"]])
+        pick = st.selectbox("لقطة", [b["name"] for b in snapshots])
+        if st.button("تحقق من اللقطة"):
+            with st.spinner("جاري التحقق..."):
+                result = backup.verify_backup(next(b["path"] for b in snapshots if b["name"] == pick))
+            if result["ok"]:
+                st.success(f"سليمة ({result['ms']:.0f} ms)")
+            else:
+                st.error("\n".join(result["problems"]))
+
+    cache = report_cache.cache_for(DB_PATH).stats()
+    st.markdown(f"**التقارير الجاهزة** — {cache['dir']}")
+    st.caption(f"{cache['files']} ملف ({cache['bytes'] / 2**20:.1f} MB من {report_cache.MAX_MB:g}) — "
+               f"من الجاهز {cache['hits']} / بناء جديد {cache['misses']} في هذه العملية؛ "
+               f"البناء الليلي في الساعات {report_cache.PREBUILD_HOURS}")
+
+profiling.record("page", f"streamlit: {menu}", (time.perf_counter() - page_start) * 1000)
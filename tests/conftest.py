@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import connect  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "store.sqlite3")
+
+
+@pytest.fixture
+def conn(db_path):
+    """قاعدة بيانات جديدة بآخر نسخة من المخطط."""
+    c = connect(db_path)
+    migrate(c)
+    yield c
+    c.close()
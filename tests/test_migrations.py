@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+from migrations import SCHEMA_VERSION, migrate, schema_version
+from sales_rollup import rebuild_sales_rollup
+from sales_search import search_clause
+
+
+def make_baseline(path):
+    """قاعدة بيانات بجداول النسخة الأصلية: products + sales (سطح المكتب) و orders (Streamlit)، بدون user_version."""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE products (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, description TEXT, qty INTEGER,
+                               cost_price REAL, sell_price REAL, image_path TEXT);
+        CREATE TABLE sales (id INTEGER PRIMARY KEY AUTOINCREMENT, sold_at TEXT, product_id INTEGER, product_name TEXT,
+                            quantity INTEGER, unit_sell REAL, unit_cost REAL, total REAL, cost_total REAL,
+                            net_profit REAL, customer_name TEXT, customer_phone TEXT, customer_address TEXT);
+        CREATE TABLE orders (id INTEGER PRIMARY KEY AUTOINCREMENT, customer TEXT, product TEXT, qty INTEGER,
+                             total REAL, date TEXT);
+    """)
+    conn.executemany("INSERT INTO products (name, description, qty, cost_price, sell_price) VALUES (?,?,?,?,?)",
+                     [("عطر الورد", "", 20, 5.0, 12.0), ("عطر العود", "", 8, 20.0, 45.0)])
+    # two lines of one basket (same time + customer), then a single sale
+    conn.executemany("""INSERT INTO sales (sold_at, product_id, product_name, quantity, unit_sell, unit_cost, total,
+                                           cost_total, net_profit, customer_name, customer_phone, customer_address)
+                        VALUES (?,?,?,?,?,?,?,?,?,?,?,?)""", [
+        ("2024-03-01 10:00:00", 1, "عطر الورد", 2, 12.0, 5.0, 24.0, 10.0, 14.0, "سارة", "0791111111", "عمان"),
+        ("2024-03-01 10:00:00", 2, "عطر العود", 1, 45.0, 20.0, 45.0, 20.0, 25.0, "سارة", "0791111111", "عمان"),
+        ("2024-03-02 18:30:00", 1, "عطر الورد", 1, 12.0, 5.0, 12.0, 5.0, 7.0, "ليلى", "", ""),
+    ])
+    conn.executemany("INSERT INTO orders (customer, product, qty, total, date) VALUES (?,?,?,?,?)", [
+        ("أحمد", "عطر العود", 2, 90.0, "2024-03-03 12:00"),
+        ("منى", "عطر غير مسجل", 1, 15.0, "2024-03-04 09:15"),
+    ])
+    conn.commit()
+    return conn
+
+
+def test_baseline_database_migrates_to_latest(db_path):
+    conn = make_baseline(db_path)
+    assert schema_version(conn) == 0
+    assert migrate(conn) == SCHEMA_VERSION
+    assert schema_version(conn) == SCHEMA_VERSION
+
+    cur = conn.cursor()
+    assert cur.execute("SELECT type FROM sqlite_master WHERE name = 'sales'").fetchone()[0] == "view"
+    # desktop lines keep their ids; the basket becomes one order, each Streamlit order stays one order
+    assert cur.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 4
+    assert cur.execute("SELECT COUNT(*) FROM order_lines").fetchone()[0] == 5
+    assert cur.execute("SELECT order_id FROM sales WHERE id IN (1, 2)").fetchall() == [(3,), (3,)]
+    assert cur.execute("SELECT customer_phone, customer_address FROM sales WHERE id = 1").fetchone() == \
+        ("0791111111", "عمان")
+    assert cur.execute("SELECT product_name, total FROM sales WHERE customer_name = 'منى'").fetchone() == \
+        ("عطر غير مسجل", 15.0)
+    assert cur.execute("SELECT SUM(total) FROM sales").fetchone()[0] == 186.0
+    assert cur.execute("SELECT SUM(ops), SUM(revenue) FROM sales_daily").fetchone() == (5, 186.0)
+    where, params = search_clause(cur, "ليلى")
+    assert cur.execute(f"SELECT id FROM sales WHERE {where}", params).fetchall() == [(3,)]
+
+
+def test_migrate_is_idempotent(conn):
+    assert migrate(conn) == SCHEMA_VERSION
+    before = conn.execute("SELECT type, name FROM sqlite_master ORDER BY name").fetchall()
+    assert migrate(conn) == SCHEMA_VERSION
+    assert conn.execute("SELECT type, name FROM sqlite_master ORDER BY name").fetchall() == before
+
+
+def test_rollup_after_migration_matches_rebuild(db_path):
+    conn = make_baseline(db_path)
+    migrate(conn)
+    migrated = conn.execute("SELECT * FROM sales_daily_product ORDER BY day, product_id").fetchall()
+    rebuild_sales_rollup(conn)
+    assert conn.execute("SELECT * FROM sales_daily_product ORDER BY day, product_id").fetchall() == migrated
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import order_import
+import services
+from db import run_in_transaction
+
+CSV = """order_id,customer,product,qty,total,date
+A-1,سارة,عطر الورد,2,24,2025-05-01 10:00
+A-1,سارة,عطر العود,1,45,2025-05-01 10:00
+A-2,أحمد,عطر الورد,1,12,2025-05-02 11:30
+A-3,منى,عطر غير مسجل,3,30,2025-05-03 09:00
+A-2,أحمد,عطر الورد,1,12,2025-05-02 11:30
+A-4,ليلى,عطر الورد,0,12,2025-05-03 09:00
+"""
+
+
+@pytest.fixture
+def csv_path(conn, tmp_path):
+    run_in_transaction(conn, lambda cur: [services.add_product(cur, "عطر الورد", price=12, qty=50, cost_price=5),
+                                          services.add_product(cur, "عطر العود", price=45, qty=50, cost_price=20)])
+    path = tmp_path / "orders.csv"
+    path.write_text(CSV, encoding="utf-8")
+    return str(path)
+
+
+def state(conn):
+    return (conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0],
+            conn.execute("SELECT COUNT(*), SUM(total) FROM order_lines").fetchone(),
+            conn.execute("SELECT name, qty FROM products ORDER BY id").fetchall(),
+            conn.execute("SELECT SUM(ops), SUM(revenue) FROM sales_daily").fetchone())
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, order_import.BATCH_SIZE])
+def test_first_import(conn, csv_path, batch_size):
+    # A-2 repeated later in the file is a duplicate whether or not it falls in the same batch
+    report = order_import.import_orders(conn, order_import.read_rows(csv_path), batch_size=batch_size)
+    assert (report["read"], report["inserted"], report["duplicates"], report["invalid"]) == (6, 4, 1, 1)
+    assert report["errors"][0][0] == 6
+    assert state(conn) == (3, (4, 111.0), [("عطر الورد", 47), ("عطر العود", 49)], (4, 111.0))
+    assert conn.execute("SELECT external_id FROM orders ORDER BY id").fetchall() == [("A-1",), ("A-2",), ("A-3",)]
+
+
+def test_reimport_changes_nothing(conn, csv_path):
+    order_import.import_orders(conn, order_import.read_rows(csv_path))
+    before = state(conn)
+    for batch_size in (1, 2, order_import.BATCH_SIZE):
+        report = order_import.import_orders(conn, order_import.read_rows(csv_path), batch_size=batch_size)
+        assert (report["inserted"], report["duplicates"]) == (0, 5)
+        assert state(conn) == before
+
+
+def test_reimport_after_archiving(conn, csv_path):
+    pytest.importorskip("numpy")
+    from sales_archive import archive_due
+    order_import.import_orders(conn, order_import.read_rows(csv_path))
+    archive_due(conn, keep_months=1)
+    assert conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 0
+    report = order_import.import_orders(conn, order_import.read_rows(csv_path))
+    assert report["inserted"] == 0
+    assert conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 0
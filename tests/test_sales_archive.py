@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import pytest
+
+import services
+from db import run_in_transaction
+from sales_archive import SalesQuery, archive_due, partitions, sales_query
+from sales_rollup import rebuild_sales_rollup
+
+pytest.importorskip("numpy")
+
+OLD_MONTHS = ["2024-01", "2024-02", "2024-03"]
+
+
+@pytest.fixture
+def sales(conn):
+    """أسطر في ثلاثة أشهر قديمة (تُؤرشف) وفي الشهر الحالي: {id: (customer, product, sold_at, total)}."""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    days = [f"{m}-{d:02d} 1{d % 10}:00:00" for m in OLD_MONTHS for d in (3, 17)] + [now] * 4
+    customers = ["سارة", "ليلى", "أحمد"]
+
+    def fill(cur):
+        rose = services.add_product(cur, "عطر الورد", price=12, qty=1000, cost_price=5)
+        oud = services.add_product(cur, "عطر العود", price=45, qty=1000, cost_price=20)
+        for i, day in enumerate(days):
+            services.create_order(cur, [{"product_id": rose, "quantity": 1 + i % 3},
+                                        {"product_id": oud, "quantity": 1}], customers[i % 3], sold_at=day)
+        cur.execute("SELECT id, customer_name, product_name, sold_at, total FROM sales")
+        return {r[0]: r[1:] for r in cur.fetchall()}
+    return run_in_transaction(conn, fill)
+
+
+def page_ids(cur, query, size):
+    ids = []
+    while True:
+        rows = query.fetch(cur, ("offset", len(ids), size))
+        ids += [r[0] for r in rows]
+        if len(rows) < size:
+            return ids
+
+
+def test_archive_keeps_totals(conn, sales):
+    daily = conn.execute("SELECT * FROM sales_daily ORDER BY day").fetchall()
+    done = archive_due(conn, keep_months=3)
+    assert [p["month"] for p in done] == OLD_MONTHS
+    assert conn.execute("SELECT COUNT(*) FROM order_lines").fetchone()[0] == 8
+    assert conn.execute("SELECT COUNT(*) FROM archive_guard").fetchone()[0] == 0
+    assert conn.execute("SELECT * FROM sales_daily ORDER BY day").fetchall() == daily
+    rebuild_sales_rollup(conn)
+    assert conn.execute("SELECT * FROM sales_daily ORDER BY day").fetchall() == daily
+
+
+def test_count_and_fetch_across_live_and_archive(conn, sales):
+    archive_due(conn, keep_months=3)
+    cur = conn.cursor()
+    assert len(partitions(cur)) == 3
+    query = SalesQuery(("customer_name", "total"))
+    assert query.count(cur) == len(sales)
+    assert page_ids(cur, query, 5) == sorted(sales, reverse=True)
+    rows = {r[0]: r[1:] for chunk in query.iter_rows(cur, chunk_size=7) for r in chunk}
+    assert rows == {i: (v[0], v[3]) for i, v in sales.items()}
+
+
+@pytest.mark.parametrize("q, f_from, f_to", [
+    ("ساره", "", ""),              # normalized: ة / ه
+    ("احمد العود", "", ""),        # every word, in any of the columns
+    ("", "2024-02-01", "2024-03-03"),
+    ("ليلى", "2024-01-01", ""),
+])
+def test_filters_match_on_both_sources(conn, sales, q, f_from, f_to):
+    archive_due(conn, keep_months=3)
+    cur = conn.cursor()
+
+    def expected(row):
+        customer, product, sold_at, _total = row
+        text = (customer + " " + product).replace("ة", "ه").replace("أ", "ا").replace("ى", "ي")
+        words = q.replace("ة", "ه").replace("أ", "ا").replace("ى", "ي").split()
+        return (all(w in text for w in words) and (not f_from or sold_at >= f_from)
+                and (not f_to or sold_at[:10] <= f_to))
+    want = sorted((i for i, row in sales.items() if expected(row)), reverse=True)
+    assert want
+    query = sales_query(cur, ("customer_name",), q, f_from, f_to)
+    assert query.count(cur) == len(want)
+    assert page_ids(cur, query, 3) == want
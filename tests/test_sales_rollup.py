@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import services
+from db import run_in_transaction
+from sales_rollup import rebuild_sales_rollup
+
+
+def rollup(conn):
+    def rows(table, key):
+        return [r[:-2] + (round(r[-2], 6), round(r[-1], 6))
+                for r in conn.execute(f"SELECT * FROM {table} ORDER BY {key}").fetchall()]
+    return rows("sales_daily", "day"), rows("sales_daily_product", "day, product_id")
+
+
+def assert_matches_rebuild(conn):
+    """الجداول التي حدّثتها الـ Triggers = نفس الجداول بعد rebuild_sales_rollup."""
+    maintained = rollup(conn)
+    rebuild_sales_rollup(conn)
+    assert rollup(conn) == maintained
+
+
+@pytest.fixture
+def products(conn):
+    return run_in_transaction(conn, lambda cur: [
+        services.add_product(cur, "عطر الورد", price=12, qty=100, cost_price=5),
+        services.add_product(cur, "عطر العود", price=45, qty=100, cost_price=20),
+    ])
+
+
+def test_insert(conn, products):
+    rose, oud = products
+    run_in_transaction(conn, lambda cur: services.create_order(
+        cur, [{"product_id": rose, "quantity": 2}, {"product_id": oud, "quantity": 1}], "سارة",
+        sold_at="2025-05-01 10:00:00"))
+    run_in_transaction(conn, lambda cur: services.add_order(cur, "أحمد", "عطر العود", 3, date="2025-05-02 11:00"))
+    run_in_transaction(conn, lambda cur: services.add_order(cur, "منى", "منتج غير مسجل", 1, total=9.5))
+    assert conn.execute("SELECT SUM(ops) FROM sales_daily").fetchone()[0] == 4
+    assert_matches_rebuild(conn)
+
+
+def test_update(conn, products):
+    rose, oud = products
+    order_id, (line, _other) = run_in_transaction(conn, lambda cur: services.create_order(
+        cur, [{"product_id": rose, "quantity": 2}, {"product_id": oud, "quantity": 1}], "سارة",
+        sold_at="2025-05-01 10:00:00"))
+    run_in_transaction(conn, lambda cur: services.update_sale(cur, line, "سارة", "", "", 5, 11.0))
+    assert_matches_rebuild(conn)
+    # moving the order to another day moves all its lines
+    run_in_transaction(conn, lambda cur: cur.execute("UPDATE orders SET sold_at = '2025-05-07 09:00:00' WHERE id = ?",
+                                                     (order_id,)))
+    assert [r[0] for r in conn.execute("SELECT day FROM sales_daily")] == ["2025-05-07"]
+    assert_matches_rebuild(conn)
+
+
+def test_delete(conn, products):
+    rose, oud = products
+    _order_id, (line, other) = run_in_transaction(conn, lambda cur: services.create_order(
+        cur, [{"product_id": rose, "quantity": 2}, {"product_id": oud, "quantity": 1}], "سارة",
+        sold_at="2025-05-01 10:00:00"))
+    run_in_transaction(conn, lambda cur: services.add_sale(cur, rose, 1, "ليلى", sold_at="2025-05-02 12:00:00"))
+    run_in_transaction(conn, lambda cur: services.delete_sale(cur, line))
+    assert_matches_rebuild(conn)
+    run_in_transaction(conn, lambda cur: services.delete_sale(cur, other))
+    # the emptied day is removed, not left with zero ops
+    assert [r[0] for r in conn.execute("SELECT day FROM sales_daily")] == ["2025-05-02"]
+    assert_matches_rebuild(conn)